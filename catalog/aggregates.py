@@ -0,0 +1,93 @@
+from django.db.models import Avg, Case, Count, ExpressionWrapper, F, FloatField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from catalog.models import Item, UserInteraction
+
+
+def interaction_contribution(interaction_type, rating):
+    """
+    (notes, somme des notes) apportées par une interaction.
+    """
+    if interaction_type == UserInteraction.InteractionType.RATING and rating is not None:
+        return 1, float(rating)
+    return 0, 0.0
+
+
+def apply_interaction_changes(changes):
+    """
+    Répercute sur la note des items des changements d'interactions
+    (état précédent, état courant), états sous forme de tuples
+    (item_id, type, note) ou None si absente. Mise à jour relative par `F()`,
+    un UPDATE par variation distincte (nombre de notes, somme des notes), à
+    exécuter dans la transaction de l'écriture des interactions. La popularité
+    est tenue à jour par `catalog.popularity`.
+    """
+    deltas = {}
+    for previous, current in changes:
+        for state, sign in ((previous, -1), (current, 1)):
+            if state is None:
+                continue
+            item_id, interaction_type, rating = state
+            count, rating_sum = interaction_contribution(interaction_type, rating)
+            total = deltas.setdefault(str(item_id), [0, 0.0])
+            total[0] += sign * count
+            total[1] += sign * rating_sum
+
+    # Un envoi groupé de notes ne produit que quelques variations distinctes
+    groups = {}
+    for item_id, (count, rating_sum) in deltas.items():
+        if count or rating_sum:
+            groups.setdefault((count, rating_sum), []).append(item_id)
+
+    ratings = F("number_of_ratings")
+    for (count, rating_sum), item_ids in groups.items():
+        Item.objects.filter(pk__in=item_ids).update(
+            number_of_ratings=Case(
+                When(number_of_ratings__lte=-count, then=Value(0)),
+                default=ratings + count,
+            ),
+            # Dans un UPDATE, F() désigne les valeurs d'avant la mise à jour
+            rating=Case(
+                When(number_of_ratings__lte=-count, then=Value(0.0)),
+                default=ExpressionWrapper(
+                    (F("rating") * ratings + rating_sum) / (ratings + count), output_field=FloatField()
+                ),
+            ),
+        )
+
+
+def apply_interaction_change(previous, current):
+    apply_interaction_changes([(previous, current)])
+
+
+def expected_aggregates():
+    """
+    Expressions (note moyenne, nombre de notes) d'un item recalculées depuis
+    ses interactions : sous-requêtes corrélées sur `OuterRef("pk")`, 0 sans note.
+    """
+    is_rating = Q(interaction_type=UserInteraction.InteractionType.RATING, rating__isnull=False)
+    ratings = UserInteraction.objects.filter(is_rating, item_id=OuterRef("pk")).order_by().values("item_id")
+    average = Subquery(ratings.annotate(average=Avg("rating", output_field=FloatField())).values("average"))
+    count = Subquery(ratings.annotate(count=Count("id")).values("count"))
+    return Coalesce(average, Value(0.0)), Coalesce(count, Value(0))
+
+
+def stale_items():
+    """
+    Items dont la note ou le nombre de notes stockés ont dérivé des interactions.
+    """
+    average, count = expected_aggregates()
+    return Item.objects.alias(expected_rating=average, expected_count=count).filter(
+        ~Q(number_of_ratings=F("expected_count"))
+        | Q(rating__gt=F("expected_rating") + 1e-9)
+        | Q(rating__lt=F("expected_rating") - 1e-9)
+    )
+
+
+def reconcile_aggregates():
+    """
+    Réécrit, en un seul UPDATE, les agrégats des items qui ont dérivé.
+    Retourne le nombre d'items corrigés.
+    """
+    average, count = expected_aggregates()
+    return stale_items().update(rating=average, number_of_ratings=count)
@@ -1,12 +1,19 @@
 from django_filters import rest_framework as filters
 from catalog.models import Item
-from django.db.models import JSONField
+from catalog.tags import ALL, ANY, NONE, filter_tags
 
 class UUIDInFilter(filters.BaseInFilter, filters.UUIDFilter):
     pass
 
+class CharInFilter(filters.BaseInFilter, filters.CharFilter):
+    pass
+
 class ItemFilter(filters.FilterSet):
     categories = UUIDInFilter(field_name="category", lookup_expr="in")
+    # ?tags=a,b : au moins un des tags ; ?tags__all=a,b : tous ; ?tags__not=a,b : aucun
+    tags = CharInFilter(method="filter_tags_any")
+    tags__all = CharInFilter(method="filter_tags_all")
+    tags__not = CharInFilter(method="filter_tags_not")
 
     class Meta:
         model = Item
@@ -16,8 +23,12 @@ class ItemFilter(filters.FilterSet):
             'tags', 'rating', 'popularity_score', 'number_of_ratings',
             'created_at', 'updated_at'
         ]
-        filter_overrides = {
-            JSONField: {
-                'filter_class': filters.CharFilter,
-            }
-        }
+
+    def filter_tags_any(self, queryset, name, value):
+        return filter_tags(queryset, value, ANY)
+
+    def filter_tags_all(self, queryset, name, value):
+        return filter_tags(queryset, value, ALL)
+
+    def filter_tags_not(self, queryset, name, value):
+        return filter_tags(queryset, value, NONE)
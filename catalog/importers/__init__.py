@@ -0,0 +1,17 @@
+from catalog.importers.base import ApiClient, ImporterError, Source, fetch_results
+from catalog.importers.cache import ResponseCache
+from catalog.importers.checkpoint import Checkpoint
+from catalog.importers.comicvine import ComicVineClient, ComicVineError, ComicVineSource, to_record
+from catalog.importers.http import TokenBucket, make_session
+from catalog.importers.marvel import MarvelClient, MarvelError, MarvelSource
+from catalog.importers.openlibrary import OpenLibraryClient, OpenLibrarySource
+from catalog.importers.persist import save_items
+from catalog.importers.persons import PersonResolver
+from catalog.importers.pipeline import Deduplicator, import_records
+
+__all__ = [
+    "ApiClient", "Checkpoint", "ComicVineClient", "ComicVineError", "ComicVineSource", "Deduplicator",
+    "ImporterError", "MarvelClient", "MarvelError", "MarvelSource", "OpenLibraryClient", "OpenLibrarySource",
+    "PersonResolver", "ResponseCache", "Source", "TokenBucket", "fetch_results", "import_records",
+    "make_session", "save_items", "to_record",
+]
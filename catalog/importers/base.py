@@ -0,0 +1,122 @@
+import json
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from catalog.importers.http import TokenBucket, make_session
+
+
+class ImporterError(Exception):
+    """
+    Erreur signalée dans le corps d'une réponse d'API (hors erreurs HTTP).
+    """
+
+
+class ApiClient:
+    """
+    Client JSON d'une API source, sûr entre threads : session, limiteur et
+    cache sont partagés. Avec un `ResponseCache`, une réponse en cache ne coûte
+    ni requête ni jeton du limiteur.
+    """
+
+    # Taille de page maximale acceptée par l'API (None : pas de limite)
+    max_page_size = None
+
+    def __init__(self, session=None, limiter=None, timeout=25, cache=None):
+        self.session = session or make_session(1, settings.IMPORTER_USER_AGENT)
+        self.limiter = limiter or TokenBucket(rate=0)
+        self.cache = cache
+        self.timeout = timeout
+
+    def get_json(self, url, params=None):
+        if self.cache is not None:
+            return json.loads(
+                self.cache.get(self.session, url, params, timeout=self.timeout, before_request=self.limiter.acquire)
+            )
+        self.limiter.acquire()
+        response = self.session.get(url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def search(self, query, page=1, page_size=10):
+        """
+        Une page de résultats : (nombre total de résultats, résultats).
+        """
+        raise NotImplementedError
+
+
+def fetch_results(client, query, limit, page_size=10, workers=4, offset=0):
+    """
+    Résultats d'indices [offset, limit[ de la recherche, dans l'ordre : la
+    première page utile donne le total, les suivantes sont récupérées en
+    parallèle (`workers` requêtes à la fois, au plus, sous le débit du limiteur).
+    """
+    if offset >= limit:
+        return
+    first = offset // page_size + 1
+    total, results = client.search(query, first, page_size)
+    end = min(total, limit)
+
+    def in_range(page, page_results):
+        start = (page - 1) * page_size
+        return page_results[max(offset - start, 0):max(end - start, 0)]
+
+    yield from in_range(first, results)
+    if not results:
+        return
+
+    pages = range(first + 1, math.ceil(end / page_size) + 1)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Fenêtre de pages en vol bornée : mémoire constante quel que soit `limit`
+        for start in range(0, len(pages), workers * 2):
+            window = pages[start:start + workers * 2]
+            fetched = pool.map(lambda page: client.search(query, page, page_size), window)
+            for page, (_, page_results) in zip(window, fetched):
+                yield from in_range(page, page_results)
+
+
+def creator_relation(role):
+    """
+    Relation many-to-many de l'item pour un rôle de créateur ("writer, cover"...).
+    """
+    role = (role or "").lower()
+    if "writer" in role or "author" in role:
+        return "authors"
+    if "editor" in role or "producer" in role:
+        return "producers"
+    return "contributors"
+
+
+class Source:
+    """
+    Source d'import : un client paginé et la conversion de ses résultats en
+    enregistrements normalisés pour `save_items` :
+    {"title", "description", "url", "image", "tags", "credits", "isbn"},
+    `credits` étant une liste de (nom, relation).
+
+    Les sous-classes définissent `name`, `category` (nom de la catégorie des
+    items importés) et `to_record`.
+    """
+
+    name = None
+    category = None
+
+    def __init__(self, client):
+        self.client = client
+
+    def checkpoint_key(self, query):
+        return f"{self.name}:{query}"
+
+    def to_record(self, result):
+        raise NotImplementedError
+
+    def records(self, query, limit, page_size=10, workers=4, offset=0):
+        """
+        Enregistrements normalisés des résultats [offset, limit[ de la recherche,
+        produits au fil de la récupération des pages.
+        """
+        if self.client.max_page_size:
+            page_size = min(page_size, self.client.max_page_size)
+        for result in fetch_results(self.client, query, limit, page_size, workers, offset):
+            yield self.to_record(result)
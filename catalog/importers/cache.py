@@ -0,0 +1,90 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# Paramètres sans effet sur la réponse, exclus de la clé (et jamais stockés)
+IGNORED_PARAMS = {"api_key", "apikey", "ts", "hash"}
+
+
+class ResponseCache:
+    """
+    Cache disque (SQLite) des réponses HTTP des imports, par URL et paramètres.
+
+    Une réponse de moins de `ttl` secondes est servie sans réseau ; au-delà,
+    elle est revalidée par une requête conditionnelle (If-None-Match /
+    If-Modified-Since) : un 304 la prolonge sans retransférer le corps.
+    Partagé entre threads (une connexion, un verrou).
+    """
+
+    def __init__(self, path, ttl):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, url TEXT NOT NULL, body BLOB NOT NULL,"
+            " etag TEXT, last_modified TEXT, fetched_at REAL NOT NULL)"
+        )
+
+    @staticmethod
+    def key(url, params):
+        kept = sorted((name, str(value)) for name, value in (params or {}).items() if name not in IGNORED_PARAMS)
+        return hashlib.sha256(json.dumps([url, kept]).encode()).hexdigest()
+
+    def _read(self, key):
+        with self._lock:
+            return self._connection.execute(
+                "SELECT body, etag, last_modified, fetched_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+    def _write(self, key, url, body, etag, last_modified):
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, url, body, etag, last_modified, fetched_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, url, body, etag, last_modified, time.time()),
+            )
+
+    def _touch(self, key):
+        with self._lock:
+            self._connection.execute("UPDATE responses SET fetched_at = ? WHERE key = ?", (time.time(), key))
+
+    def get(self, session, url, params=None, timeout=25, before_request=None):
+        """
+        Corps de la réponse (octets) à `GET url?params`, depuis le cache si
+        possible. `before_request` est appelé avant chaque accès réseau (limiteur).
+        """
+        key = self.key(url, params)
+        cached = self._read(key)
+        if cached is not None and time.time() - cached[3] < self.ttl:
+            return cached[0]
+
+        headers = {}
+        if cached is not None:
+            if cached[1]:
+                headers["If-None-Match"] = cached[1]
+            if cached[2]:
+                headers["If-Modified-Since"] = cached[2]
+        if before_request is not None:
+            before_request()
+        response = session.get(url, params=params, headers=headers, timeout=timeout)
+        if response.status_code == 304 and cached is not None:
+            self._touch(key)
+            return cached[0]
+        response.raise_for_status()
+        self._write(key, url, response.content, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        return response.content
+
+    def clear(self):
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
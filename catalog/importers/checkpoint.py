@@ -0,0 +1,40 @@
+import json
+import os
+import threading
+from pathlib import Path
+
+
+class Checkpoint:
+    """
+    Avancement des imports en cours, dans un fichier JSON : nombre de résultats
+    déjà enregistrés par requête (clé libre, ex. "comicvine:marvel:iron man").
+    Une requête terminée est retirée ; un import interrompu reprend à son offset.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        try:
+            self._offsets = json.loads(self.path.read_text())
+        except (FileNotFoundError, ValueError):
+            self._offsets = {}
+
+    def offset(self, key):
+        return self._offsets.get(key, 0)
+
+    def save(self, key, offset):
+        with self._lock:
+            self._offsets[key] = offset
+            self._flush()
+
+    def done(self, key):
+        with self._lock:
+            if self._offsets.pop(key, None) is not None:
+                self._flush()
+
+    def _flush(self):
+        # Écriture atomique : un arrêt brutal laisse l'ancien fichier intact
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self._offsets, indent=2, sort_keys=True))
+        os.replace(tmp, self.path)
@@ -0,0 +1,85 @@
+from django.conf import settings
+
+from catalog.importers.base import ApiClient, ImporterError, Source, creator_relation
+from catalog.importers.http import make_session
+
+UNIVERSES = ("marvel", "dc")
+EXAMPLES = {
+    "marvel": ["iron man", "spider-man", "x-men", "captain america", "doctor strange"],
+    "dc": ["batman", "superman", "wonder woman", "flash", "green lantern"],
+}
+
+
+class ComicVineError(ImporterError):
+    pass
+
+
+class ComicVineClient(ApiClient):
+    """
+    Recherche ComicVine (`/search/`, ressource "issue"), paginée par `page`.
+    """
+
+    def __init__(self, session=None, limiter=None, base_url=None, api_key=None, timeout=25, cache=None):
+        super().__init__(
+            session=session or make_session(1, settings.COMICVINE_USER_AGENT),
+            limiter=limiter, timeout=timeout, cache=cache,
+        )
+        self.base_url = (base_url or settings.COMICVINE_BASE_URL).rstrip("/")
+        self.api_key = api_key or settings.COMICVINE_API_KEY
+
+    def search(self, query, page=1, page_size=10):
+        params = {
+            "api_key": self.api_key,
+            "format": "json",
+            "resources": "issue",
+            "query": query,
+            "limit": page_size,
+            "page": page,
+        }
+        data = self.get_json(f"{self.base_url}/search/", params)
+        # status_code 1 = OK (l'API répond 200 même en cas d'erreur)
+        if data.get("status_code", 1) != 1:
+            raise ComicVineError(data.get("error") or f"status_code {data.get('status_code')}")
+        return data.get("number_of_total_results", 0), data.get("results") or []
+
+
+def to_record(data, universe):
+    """
+    Résultat ComicVine -> enregistrement normalisé pour `save_items`.
+    """
+    image = data.get("image") or {}
+    creators = data.get("person_credits") or (data.get("creators") or {}).get("items") or []
+    credits = []
+    for creator in creators:
+        name = creator.get("name") if isinstance(creator, dict) else str(creator)
+        role = creator.get("role") if isinstance(creator, dict) else ""
+        if name:
+            credits.append((name, creator_relation(role)))
+    return {
+        "title": (data.get("name") or (data.get("volume") or {}).get("name") or "Untitled")[:255],
+        "description": data.get("deck") or data.get("description") or "No description available.",
+        "url": data.get("site_detail_url"),
+        "image": image.get("super_url") or image.get("thumb_url"),
+        "tags": [universe],
+        "credits": credits,
+        "isbn": None,
+    }
+
+
+class ComicVineSource(Source):
+    """
+    Numéros ComicVine d'un univers, dans la catégorie "<Univers> Comics".
+    """
+
+    name = "comicvine"
+
+    def __init__(self, client, universe="marvel"):
+        super().__init__(client)
+        self.universe = universe
+        self.category = f"{universe.capitalize()} Comics"
+
+    def checkpoint_key(self, query):
+        return f"{self.name}:{self.universe}:{query}"
+
+    def to_record(self, result):
+        return to_record(result, self.universe)
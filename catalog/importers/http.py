@@ -0,0 +1,55 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class TokenBucket:
+    """
+    Limiteur de débit partagé entre threads : `rate` requêtes par seconde en
+    moyenne, rafales d'au plus `burst` requêtes. `rate <= 0` : pas de limite.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def make_session(pool_size, user_agent, retries=3):
+    """
+    Session partagée par les threads d'import : connexions keep-alive réutilisées
+    (un pool de `pool_size` par hôte) et nouvelles tentatives avec attente
+    exponentielle sur 429 / 5xx (en-tête Retry-After respecté).
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=1,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",),
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"User-Agent": user_agent, "Accept": "application/json"})
+    return session
@@ -0,0 +1,57 @@
+from django.conf import settings
+
+from catalog.importers.base import ApiClient, Source
+
+COVERS_URL = "https://covers.openlibrary.org/b/id"
+# Champs demandés à la recherche (réponses plus légères)
+SEARCH_FIELDS = "key,title,subtitle,author_name,cover_i,isbn,first_sentence"
+
+
+class OpenLibraryClient(ApiClient):
+    """
+    Recherche de livres Open Library (`/search.json`), paginée par `page`.
+    L'API est publique : ni clé ni signature.
+    """
+
+    def __init__(self, session=None, limiter=None, base_url=None, timeout=25, cache=None):
+        super().__init__(session=session, limiter=limiter, timeout=timeout, cache=cache)
+        self.base_url = (base_url or settings.OPEN_LIBRARY_BASE_URL).rstrip("/")
+
+    def search(self, query, page=1, page_size=10):
+        params = {"q": query, "page": page, "limit": page_size, "fields": SEARCH_FIELDS}
+        data = self.get_json(f"{self.base_url}/search.json", params)
+        return data.get("numFound", 0), data.get("docs") or []
+
+
+def _isbn(isbns):
+    # ISBN-13 de préférence, pour comparer les éditions entre sources
+    isbns = [isbn for isbn in isbns or [] if isbn]
+    return next((isbn for isbn in isbns if len(isbn) == 13), isbns[0] if isbns else None)
+
+
+class OpenLibrarySource(Source):
+    """
+    Livres Open Library, dans la catégorie "Books" ; les auteurs sont crédités
+    sur `authors`.
+    """
+
+    name = "openlibrary"
+    category = "Books"
+
+    def to_record(self, result):
+        title = result.get("title") or "Untitled"
+        if result.get("subtitle"):
+            title = f"{title}: {result['subtitle']}"
+        sentence = result.get("first_sentence")
+        if isinstance(sentence, list):
+            sentence = sentence[0] if sentence else None
+        cover = result.get("cover_i")
+        return {
+            "title": title[:255],
+            "description": sentence or "No description available.",
+            "url": f"{self.client.base_url}{result['key']}" if result.get("key") else None,
+            "image": f"{COVERS_URL}/{cover}-L.jpg" if cover else None,
+            "tags": ["books"],
+            "credits": [(name, "authors") for name in result.get("author_name") or [] if name],
+            "isbn": _isbn(result.get("isbn")),
+        }
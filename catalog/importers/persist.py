@@ -0,0 +1,78 @@
+import random
+
+from django.db import transaction
+
+from catalog.importers.persons import PersonResolver
+from catalog.models import Item
+from catalog.signals import items_changed
+from catalog.tags import normalize_tags, sync_item_tags
+
+CREATOR_RELATIONS = ("authors", "producers", "contributors")
+# Champs réécrits sur un item existant : note, nombre de notes et popularité
+# sont tenus à jour depuis les interactions et ne sont jamais écrasés
+ITEM_FIELDS = ("description", "created_by", "url", "isbn", "image", "tags")
+
+
+def save_items(records, category, user, persons=None):
+    """
+    Enregistre un lot d'enregistrements normalisés (titre, description, url,
+    isbn, image, tags, crédits (nom, relation)) dans `category`, par requêtes
+    groupées : les items sont identifiés par (titre, catégorie) comme avec
+    `update_or_create`, les créateurs ne sont qu'ajoutés (comme `.add()`).
+
+    `bulk_create` / `bulk_update` n'émettent pas de signaux : tags, journal de
+    l'index, documents de recherche et facettes sont mis à jour explicitement.
+    `persons` (un `PersonResolver`) est à partager entre les lots d'un même
+    import. Retourne (créés, mis à jour).
+    """
+    # Même titre deux fois dans le lot : le dernier l'emporte
+    records = {record["title"]: record for record in records}
+    if not records:
+        return 0, 0
+
+    with transaction.atomic():
+        existing = {}
+        matches = Item.objects.filter(category=category, title__in=records).only("id", "title", "isbn").order_by("created_at")
+        for item in matches:
+            existing.setdefault(item.title, item)
+
+        created, updated = [], []
+        for title, record in records.items():
+            item = existing.get(title)
+            if item is None:
+                item = Item(title=title, category=category)
+                # Notes de démonstration, à la création seulement
+                item.rating = round(random.uniform(3.0, 5.0), 2)
+                item.number_of_ratings = random.randint(10, 300)
+                item.popularity_score = item.number_of_ratings * item.rating / 10
+            item.description = record["description"]
+            item.created_by = user
+            item.url = record["url"]
+            # Une source sans ISBN n'efface pas celui d'une autre
+            item.isbn = record.get("isbn") or item.isbn
+            item.image = record["image"]
+            item.tags = normalize_tags(record["tags"])
+            (updated if title in existing else created).append(item)
+
+        Item.objects.bulk_create(created)
+        Item.objects.bulk_update(updated, ITEM_FIELDS)
+        items = {item.title: item for item in created + updated}
+
+        names = {name for record in records.values() for name, _ in record["credits"]}
+        person_pks = (persons or PersonResolver()).resolve(names) if names else {}
+        for relation in CREATOR_RELATIONS:
+            through = getattr(Item, relation).through
+            links = {
+                (items[title].pk, person_pks[name])
+                for title, record in records.items()
+                for name, credit_relation in record["credits"]
+                if credit_relation == relation and name in person_pks
+            }
+            through.objects.bulk_create(
+                [through(item_id=item_id, person_id=person_id) for item_id, person_id in links],
+                ignore_conflicts=True,
+            )
+
+        sync_item_tags(items.values())
+        items_changed([item.pk for item in items.values()])
+    return len(created), len(updated)
@@ -0,0 +1,58 @@
+from collections import OrderedDict
+
+from catalog.models import Person, person_name_key
+
+
+class PersonResolver:
+    """
+    Résout des noms de créateurs en personnes, par clé normalisée
+    (`person_name_key`) : "Stan Lee" et "stan  lée" donnent la même personne.
+
+    Les clés déjà résolues sont gardées dans un cache LRU (au plus `max_size`
+    entrées) partagé par tous les lots d'un import ; pour les autres, une
+    requête sur `name_key` puis un `bulk_create(ignore_conflicts=True)` des
+    absentes, relu pour obtenir les pk quand un autre import a créé la même
+    personne entre-temps.
+    """
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._pks = OrderedDict()
+
+    def resolve(self, names):
+        """
+        {nom: pk} pour ces noms (les noms vides sont ignorés).
+        """
+        keys = {}
+        for name in names:
+            key = person_name_key(name)
+            if key:
+                keys.setdefault(key, name.strip())
+
+        pks = {}
+        for key in keys:
+            if key in self._pks:
+                self._pks.move_to_end(key)
+                pks[key] = self._pks[key]
+
+        missing = [key for key in keys if key not in pks]
+        if missing:
+            found = dict(Person.objects.filter(name_key__in=missing).values_list("name_key", "pk"))
+            absent = [key for key in missing if key not in found]
+            if absent:
+                # Le premier nom rencontré donne l'orthographe enregistrée
+                Person.objects.bulk_create(
+                    [Person(name=keys[key], name_key=key) for key in absent], ignore_conflicts=True
+                )
+                found.update(Person.objects.filter(name_key__in=absent).values_list("name_key", "pk"))
+            for key, pk in found.items():
+                self._remember(key, pk)
+            pks.update(found)
+
+        return {name: pks[person_name_key(name)] for name in names if person_name_key(name) in pks}
+
+    def _remember(self, key, pk):
+        self._pks[key] = pk
+        self._pks.move_to_end(key)
+        while len(self._pks) > self.max_size:
+            self._pks.popitem(last=False)
@@ -0,0 +1,118 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.db.models import Q
+
+from catalog.importers.persist import CREATOR_RELATIONS, save_items
+from catalog.models import Item, person_name_key
+
+
+def _creator_key(record):
+    # Premier auteur (dans l'ordre alphabétique des clés) à défaut, premier crédit
+    names = [name for name, relation in record["credits"] if relation == "authors"]
+    names = names or [name for name, _ in record["credits"]]
+    keys = [person_name_key(name) for name in names if person_name_key(name)]
+    return min(keys) if keys else None
+
+
+def record_keys(record):
+    """
+    Clés d'identité d'un enregistrement, comparables entre sources : URL, ISBN
+    et (titre, créateur) normalisés.
+    """
+    keys = []
+    if record.get("url"):
+        keys.append(("url", record["url"]))
+    if record.get("isbn"):
+        keys.append(("isbn", record["isbn"]))
+    creator = _creator_key(record)
+    if creator:
+        keys.append(("title", person_name_key(record["title"]), creator))
+    return keys
+
+
+class Deduplicator:
+    """
+    Écarte les doublons d'un import multi-sources : enregistrements dont une clé
+    (`record_keys`) a déjà été vue pendant l'import, ou dont l'URL, l'ISBN ou le
+    couple (titre, créateur) appartient déjà en base à un item d'une autre
+    catégorie.
+    Dans la même catégorie, `save_items` met l'item à jour sur place.
+
+    Les clés vues sont gardées dans un cache LRU d'au plus `max_keys` entrées :
+    la mémoire reste bornée quelle que soit la taille de l'import (au-delà, seule
+    la vérification en base s'applique).
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._seen = OrderedDict()
+
+    def filter(self, records, category):
+        """
+        Enregistrements du lot à garder, dans l'ordre.
+        """
+        known = self._stored_keys(records, category)
+        kept = []
+        for record in records:
+            keys = record_keys(record)
+            duplicate = False
+            for key in keys:
+                if key in self._seen:
+                    self._seen.move_to_end(key)
+                    duplicate = True
+                elif key in known:
+                    duplicate = True
+            if not duplicate:
+                kept.append(record)
+            for key in keys:
+                self._seen[key] = True
+        while len(self._seen) > self.max_keys:
+            self._seen.popitem(last=False)
+        return kept
+
+    @staticmethod
+    def _stored_keys(records, category):
+        # Deux requêtes pour tout le lot : URLs et ISBN, puis créateurs des titres (UNION des trois relations)
+        urls = {record["url"] for record in records if record.get("url")}
+        isbns = {record["isbn"] for record in records if record.get("isbn")}
+        titles = {record["title"] for record in records}
+        other_items = Item.objects.exclude(category=category)
+
+        known = set()
+        for url, isbn in other_items.filter(Q(url__in=urls) | Q(isbn__in=isbns)).values_list("url", "isbn"):
+            known.update({("url", url), ("isbn", isbn)})
+        matches = other_items.filter(title__in=titles)
+        rows = [
+            getattr(Item, relation).through.objects.filter(item__in=matches).values_list(
+                "item__title", "person__name_key"
+            )
+            for relation in CREATOR_RELATIONS
+        ]
+        known.update(
+            ("title", person_name_key(title), name_key) for title, name_key in rows[0].union(*rows[1:])
+        )
+        return known
+
+
+def _next_batch(records, batch_size):
+    return list(islice(records, batch_size))
+
+
+def import_records(records, category, user, batch_size=500, persons=None, dedupe=None):
+    """
+    Enregistre un flux d'enregistrements normalisés par lots de `batch_size`.
+    Le lot suivant est lu (pages récupérées) pendant l'écriture du lot courant ;
+    au plus deux lots en mémoire quelle que soit la taille de l'import.
+
+    Produit pour chaque lot (lus, créés, mis à jour, doublons écartés). Les
+    erreurs de la source remontent au lot où elles surviennent.
+    """
+    with ThreadPoolExecutor(max_workers=1) as reader:
+        pending = reader.submit(_next_batch, records, batch_size)
+        while batch := pending.result():
+            pending = reader.submit(_next_batch, records, batch_size)
+            kept = dedupe.filter(batch, category) if dedupe is not None else batch
+            created, updated = save_items(kept, category, user, persons)
+            yield len(batch), created, updated, len(batch) - len(kept)
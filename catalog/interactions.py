@@ -0,0 +1,172 @@
+from django.conf import settings
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from catalog import toggles
+from catalog.models import Item, UserInteraction
+from catalog.recommendations import cache as recommendation_cache
+from catalog.serializers.write import UserInteractionBulkRowSerializer
+from catalog.signals import interactions_bulk_written
+
+CREATED = "created"
+UPDATED = "updated"
+UNCHANGED = "unchanged"
+DUPLICATE = "duplicate"
+INVALID = "invalid"
+
+
+def ingest_interactions(user_id, rows, batch_size=1000):
+    """
+    Enregistre un lot d'interactions de l'utilisateur (likes, favoris, notes) :
+    validation ligne par ligne sans requête, une requête pour les items et une
+    pour les interactions déjà présentes, puis un `bulk_create(ignore_conflicts=True)`
+    des nouvelles lignes et un `bulk_update` des notes. Le statut de chaque ligne
+    vient des lignes effectivement insérées (relues par id), pas de la première
+    lecture : une ligne écrite entre-temps par une autre requête est mise à jour.
+
+    Retourne un résultat par ligne, dans l'ordre : {"index", "status", "id"}
+    ou {"index", "status", "errors"}. Pour un même (item, type), seule la
+    dernière ligne est appliquée, les précédentes sont "duplicate".
+    """
+    results = [None] * len(rows)
+    validator = UserInteractionBulkRowSerializer()
+    latest = {}
+    for index, row in enumerate(rows):
+        try:
+            data = validator.run_validation(row)
+        except ValidationError as e:
+            results[index] = {"index": index, "status": INVALID, "errors": e.detail}
+            continue
+        key = (data["item"], data["interaction_type"])
+        if key in latest:
+            results[latest[key][0]] = {"index": latest[key][0], "status": DUPLICATE}
+        latest[key] = (index, data["rating"])
+
+    item_ids = {item_id for item_id, _ in latest}
+    known_items = set(Item.objects.filter(pk__in=item_ids).values_list("pk", flat=True))
+
+    # Bascules de likes / favoris en attente écrites avant de lire l'état en base
+    toggles.flush_user(user_id)
+
+    with transaction.atomic():
+        existing = {
+            (row["item_id"], row["interaction_type"]): row
+            for row in UserInteraction.objects.filter(user_id=user_id, item_id__in=item_ids).values(
+                "id", "item_id", "interaction_type", "rating", "created_at"
+            )
+        }
+
+        inserts, updates = [], []
+        for (item_id, interaction_type), (index, rating) in latest.items():
+            if item_id not in known_items:
+                results[index] = {"index": index, "status": INVALID, "errors": {"item": ["Unknown item."]}}
+                continue
+            stored = existing.get((item_id, interaction_type))
+            if stored is not None and stored["rating"] == rating:
+                results[index] = {"index": index, "status": UNCHANGED, "id": str(stored["id"])}
+                continue
+            interaction = UserInteraction(
+                user_id=user_id, item_id=item_id, interaction_type=interaction_type, rating=rating
+            )
+            (inserts if stored is None else updates).append((index, interaction))
+
+        # Nouvelles lignes : une ligne écrite entre-temps par une autre requête
+        # n'est pas écrasée, elle passe dans les mises à jour (ids générés côté client)
+        UserInteraction.objects.bulk_create(
+            [interaction for _, interaction in inserts], batch_size=batch_size, ignore_conflicts=True
+        )
+        inserted = set(
+            UserInteraction.objects.filter(pk__in=[interaction.pk for _, interaction in inserts]).values_list(
+                "pk", flat=True
+            )
+        )
+        changes = []
+        for index, interaction in inserts:
+            if interaction.pk in inserted:
+                results[index] = {"index": index, "status": CREATED, "id": str(interaction.pk)}
+                changes.append((None, interaction))
+            else:
+                updates.append((index, interaction))
+
+        # Lignes existantes verrouillées puis relues : la note remplacée est celle en base
+        current = {}
+        if updates:
+            current = {
+                (row["item_id"], row["interaction_type"]): row
+                for row in UserInteraction.objects.select_for_update().filter(
+                    user_id=user_id, item_id__in={interaction.item_id for _, interaction in updates}
+                ).values("id", "item_id", "interaction_type", "rating", "created_at")
+            }
+        rewritten = []
+        for index, interaction in updates:
+            stored = current.get((interaction.item_id, interaction.interaction_type))
+            if stored is None:
+                # Supprimée par une autre requête entre l'insertion et la relecture
+                results[index] = {
+                    "index": index, "status": INVALID, "errors": {"item": ["Deleted concurrently, retry."]},
+                }
+                continue
+            results[index] = {"index": index, "status": UNCHANGED, "id": str(stored["id"])}
+            if stored["rating"] == interaction.rating:
+                continue
+            interaction.pk, interaction.created_at = stored["id"], stored["created_at"]
+            results[index]["status"] = UPDATED
+            rewritten.append(interaction)
+            changes.append(((stored["item_id"], stored["interaction_type"], stored["rating"]), interaction))
+        UserInteraction.objects.bulk_update(rewritten, ["rating"], batch_size=batch_size)
+
+        # bulk_create / bulk_update n'émettent pas de signaux : agrégats, popularité, caches
+        interactions_bulk_written(changes)
+
+    return results
+
+
+# ────────────────────────────────────────────────────────
+# État de l'utilisateur sur une liste d'items
+# ────────────────────────────────────────────────────────
+def _interacted_items(user_id):
+    item_ids = recommendation_cache.get_interacted_items(user_id)
+    if item_ids is None:
+        item_ids = frozenset(
+            str(pk) for pk in UserInteraction.objects.filter(user_id=user_id).values_list("item_id", flat=True)
+        )
+        recommendation_cache.set_interacted_items(user_id, item_ids)
+    return item_ids
+
+
+def user_states(user_id, item_ids):
+    """
+    {item_id: {"liked", "bookmarked", "rating"}} de l'utilisateur pour chacun
+    des items demandés, bascules de likes / favoris en attente comprises.
+
+    Une requête sur l'index (user, item, interaction_type), limitée aux items
+    avec lesquels l'utilisateur a interagi quand cet ensemble est en cache
+    (INTERACTION_STATE_CACHE) : aucune requête pour une page sans interaction.
+    """
+    item_ids = [str(item_id) for item_id in item_ids]
+    states = {item_id: {"liked": False, "bookmarked": False, "rating": None} for item_id in item_ids}
+
+    wanted = item_ids
+    if settings.INTERACTION_STATE_CACHE:
+        interacted = _interacted_items(user_id)
+        wanted = [item_id for item_id in item_ids if item_id in interacted]
+    if wanted:
+        rows = UserInteraction.objects.filter(user_id=user_id, item_id__in=wanted).values_list(
+            "item_id", "interaction_type", "rating"
+        )
+        for item_id, interaction_type, rating in rows:
+            state = states[str(item_id)]
+            if interaction_type == UserInteraction.InteractionType.LIKE:
+                state["liked"] = True
+            elif interaction_type == UserInteraction.InteractionType.BOOKMARK:
+                state["bookmarked"] = True
+            elif interaction_type == UserInteraction.InteractionType.RATING:
+                state["rating"] = rating
+
+    fields = {UserInteraction.InteractionType.LIKE: "liked", UserInteraction.InteractionType.BOOKMARK: "bookmarked"}
+    entries = [f"{item_id}:{interaction_type}" for item_id in states for interaction_type in fields]
+    for key, (present, _) in toggles.pending_states(user_id, entries).items():
+        item_id, interaction_type = key.rsplit(":", 1)
+        if item_id in states:
+            states[item_id][fields[interaction_type]] = present
+    return states
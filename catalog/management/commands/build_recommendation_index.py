@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from catalog.recommendations.cache import bump_version
+from catalog.recommendations.collaborative import CollaborativeIndex, is_stale, reset_collaborative_index
+from catalog.recommendations.index import index_dir, reset_index
+from catalog.recommendations.sync import full_rebuild, persist_changes
+from catalog.search import get_search_backend
+from catalog.search.inverted import snapshot_lag
+
+
+class Command(BaseCommand):
+    help = "Construit l'index TF-IDF des items utilisé par les recommandations"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sync",
+            action="store_true",
+            help="Applique seulement les modifications en attente (sans refit complet)",
+        )
+        parser.add_argument(
+            "--collaborative",
+            action="store_true",
+            help=(
+                "Reconstruit aussi les voisins du filtrage collaboratif (depuis les interactions) ; "
+                "sans cette option, ils le sont quand ils ont plus de RECOMMENDER_CF_MAX_AGE"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if options["sync"]:
+            self.stdout.write("🔄 Application des modifications du catalogue à l'index...")
+            index = persist_changes()
+        else:
+            self.stdout.write("🔧 Construction de l'index TF-IDF...")
+            index = full_rebuild()
+        reset_index()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Index à jour : {len(index)} items, {len(index.vocabulary)} termes → {index_dir()}"
+        ))
+
+        # Instantané de l'index inversé trop en retard sur le journal : les
+        # processus rejouent ce retard et le journal ne peut pas être purgé
+        lag = snapshot_lag()
+        if lag > settings.SEARCH_INVERTED_MAX_LAG:
+            self.stdout.write(f"🔎 Index inversé en retard de {lag} changements, nouvel instantané...")
+            count = get_search_backend("inverted").rebuild()
+            self.stdout.write(self.style.SUCCESS(f"✅ Index inversé : {count} items"))
+
+        if options["collaborative"] or is_stale():
+            self.stdout.write("🤝 Construction des voisins du filtrage collaboratif...")
+            cf_index = CollaborativeIndex.build()
+            cf_index.save()
+            reset_collaborative_index()
+            bump_version()
+            self.stdout.write(self.style.SUCCESS(f"✅ Filtrage collaboratif : {len(cf_index)} items"))
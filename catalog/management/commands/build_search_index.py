@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from catalog.search import get_search_backend
+from catalog.search.backends import BACKENDS
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les documents de recherche plein texte de tous les items"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--backend",
+            choices=sorted(BACKENDS),
+            help="Backend à reconstruire (par défaut SEARCH_BACKEND, ou celui de la base) ; "
+                 "\"inverted\" écrit un nouvel instantané de l'index inversé",
+        )
+
+    def handle(self, *args, **options):
+        backend = get_search_backend(options["backend"])
+        self.stdout.write(f"🔎 Construction de l'index de recherche ({backend.name})...")
+        count = backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"✅ Index de recherche à jour : {count} items"))
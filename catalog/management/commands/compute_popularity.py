@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from catalog.popularity import compute_scores, rescale_scores, write_scores
+from catalog.search.facets import invalidate_facets
+
+
+class Command(BaseCommand):
+    help = "Recalcule la popularité amortie (demi-vie POPULARITY_HALF_LIFE) de tous les items"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Lignes par bulk_update")
+        parser.add_argument("--chunk-size", type=int, default=100000, help="Interactions par bloc vectorisé")
+        parser.add_argument(
+            "--rescale", action="store_true",
+            help="Ramène seulement les scores à maintenant (un UPDATE), sans relire les interactions",
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        if options["rescale"]:
+            updated = rescale_scores(now)
+            self.stdout.write(self.style.SUCCESS(f"✅ Référence de popularité déplacée : {updated} items"))
+            return
+
+        self.stdout.write("📈 Calcul de la popularité depuis les interactions...")
+        keys, scores = compute_scores(now, chunk_size=options["chunk_size"])
+        self.stdout.write(f"🧮 {len(keys)} items avec au moins une interaction")
+
+        updated = write_scores(keys, scores, now, batch_size=options["batch_size"])
+        invalidate_facets()
+        self.stdout.write(self.style.SUCCESS(f"✅ Popularité à jour : {updated} items"))
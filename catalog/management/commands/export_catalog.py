@@ -0,0 +1,33 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from catalog.snapshot import FORMATS, NDJSON, consistent_read, export_table, snapshot_tables, write_manifest
+
+
+class Command(BaseCommand):
+    help = "Exporte le catalogue (catégories, personnes, items, liens, interactions) en NDJSON ou Parquet"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Dossier de l'instantané (un fichier par table et manifest.json)")
+        parser.add_argument("--format", choices=FORMATS, default=NDJSON)
+        parser.add_argument("--chunk-size", type=int, default=10000, help="Lignes lues et écrites par bloc")
+
+    def handle(self, *args, **options):
+        path, fmt = Path(options["path"]), options["format"]
+        path.mkdir(parents=True, exist_ok=True)
+        self.stdout.write(f"📦 Export du catalogue vers {path} ({fmt})...")
+
+        counts = {}
+        # Une seule transaction : les tables forment un instantané cohérent
+        with consistent_read():
+            for table in snapshot_tables():
+                try:
+                    counts[table.name] = export_table(table, path / f"{table.name}.{fmt}", fmt, options["chunk_size"])
+                except RuntimeError as e:
+                    self.stderr.write(f"❌ {e}")
+                    return
+                self.stdout.write(f"  💾 {table.name} : {counts[table.name]} lignes")
+
+        write_manifest(path, fmt, counts)
+        self.stdout.write(self.style.SUCCESS(f"✅ Instantané écrit : {sum(counts.values())} lignes"))
@@ -0,0 +1,54 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts.models import Account
+from catalog.aggregates import reconcile_aggregates
+from catalog.search.facets import invalidate_facets
+from catalog.snapshot import MANIFEST, import_table, read_manifest, snapshot_tables
+
+
+class Command(BaseCommand):
+    help = "Charge un instantané du catalogue écrit par export_catalog (COPY sous PostgreSQL)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Dossier de l'instantané")
+        parser.add_argument("--chunk-size", type=int, default=10000, help="Lignes lues et insérées par bloc")
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        if not (path / MANIFEST).exists():
+            self.stderr.write(f"❌ {MANIFEST} introuvable dans {path}.")
+            return
+        manifest = read_manifest(path)
+        fmt = manifest["format"]
+        self.stdout.write(f"📥 Import de l'instantané {path} ({fmt})...")
+
+        # Les comptes ne sont pas exportés : seuls ceux de cette base sont référencés
+        account_ids = {str(pk) for pk in Account.objects.values_list("pk", flat=True)}
+        person_ids = {}
+        try:
+            # Une seule transaction : un import interrompu ne laisse rien
+            with transaction.atomic():
+                for table in snapshot_tables():
+                    if table.name not in manifest["tables"]:
+                        continue
+                    count = import_table(
+                        table, path / f"{table.name}.{fmt}", fmt, options["chunk_size"], account_ids, person_ids
+                    )
+                    self.stdout.write(f"  💾 {table.name} : {count} lignes")
+                if person_ids:
+                    self.stdout.write(f"  🔗 {len(person_ids)} personnes rattachées à une personne existante")
+                # Notes des interactions ignorées (compte absent) retirées des agrégats des items
+                corrected = reconcile_aggregates()
+                self.stdout.write(f"  🧮 Agrégats recalculés : {corrected} items corrigés")
+        except RuntimeError as e:
+            self.stderr.write(f"❌ {e}")
+            return
+
+        invalidate_facets()
+        self.stdout.write(self.style.SUCCESS("✅ Instantané chargé (lignes déjà présentes ignorées)."))
+        self.stdout.write(
+            "ℹ️ Reconstruire ensuite les index : build_search_index, build_recommendation_index."
+        )
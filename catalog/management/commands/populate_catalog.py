@@ -1,36 +1,111 @@
-import requests, random
+from pathlib import Path
+
+import requests
 from django.core.management.base import BaseCommand
 from django.conf import settings
-from catalog.models import Category, Item, Person
+from catalog.importers import (
+    Checkpoint, ComicVineClient, ComicVineSource, Deduplicator, ImporterError, MarvelClient, MarvelSource,
+    OpenLibraryClient, OpenLibrarySource, PersonResolver, ResponseCache, TokenBucket, import_records,
+    make_session,
+)
+from catalog.importers.comicvine import EXAMPLES, UNIVERSES
+from catalog.models import Category
 from accounts.models import Account
 
+# Sources disponibles : nom de l'option -> nom affiché
+SOURCES = {"comicvine": "ComicVine", "openlibrary": "Open Library", "marvel": "Marvel API"}
+
 
 class Command(BaseCommand):
-    help = "Populate the catalog with comics (Marvel/DC) using ComicVine API"
+    help = "Populate the catalog from ComicVine, Open Library and the Marvel API"
+
+    def add_arguments(self, parser):
+        # Sans --query : mode interactif (questions dans le terminal, 25 items au plus)
+        parser.add_argument(
+            "--query", action="append", help="Search term (repeatable); enables non-interactive mode"
+        )
+        parser.add_argument(
+            "--source", action="append", choices=SOURCES,
+            help="Source to import from (repeatable, default comicvine); duplicates across sources are skipped",
+        )
+        parser.add_argument("--universe", choices=UNIVERSES, default="marvel", help="ComicVine universe")
+        parser.add_argument("--limit", type=int, default=100, help="Items per query")
+        parser.add_argument("--page-size", type=int, default=10, help="Results per API request")
+        parser.add_argument("--workers", type=int, default=4, help="Concurrent requests")
+        parser.add_argument(
+            "--rate", type=float, default=1.0, help="Requests per second across workers (0 = unlimited)"
+        )
+        parser.add_argument("--batch-size", type=int, default=500, help="Items per database batch")
+        parser.add_argument(
+            "--cache-ttl", type=int, default=settings.IMPORTER_CACHE_TTL,
+            help="Seconds before a cached API response is revalidated",
+        )
+        parser.add_argument("--no-cache", action="store_true", help="Always fetch from the APIs")
+        parser.add_argument("--restart", action="store_true", help="Ignore checkpoints of interrupted imports")
 
     def handle(self, *args, **opts):
-        # ─────────── Check ComicVine API Key ───────────
-        if not getattr(settings, "COMICVINE_API_KEY", None):
+        # Mode interactif : ComicVine seulement
+        names = list(dict.fromkeys(opts["source"] or ["comicvine"])) if opts["query"] else ["comicvine"]
+
+        # ─────────── Check API keys ───────────
+        if "comicvine" in names and not getattr(settings, "COMICVINE_API_KEY", None):
             self.stderr.write("❌ ComicVine API key missing in .env.")
             return
+        if "marvel" in names and not (settings.MARVEL_PUBLIC_KEY and settings.MARVEL_PRIVATE_KEY):
+            self.stderr.write("❌ Marvel API keys missing in .env.")
+            return
+
+        if opts["query"]:
+            queries, universe, limit = opts["query"], opts["universe"], opts["limit"]
+        else:
+            queries, universe, limit = self._ask()
+
+        # ─────────── Populate from each source ───────────
+        cache_dir = Path(settings.IMPORTER_CACHE_DIR)
+        cache = None if opts["no_cache"] else ResponseCache(cache_dir / "responses.sqlite3", opts["cache_ttl"])
+        checkpoint = Checkpoint(cache_dir / "checkpoints.json")
+        session = make_session(opts["workers"] * len(names), settings.IMPORTER_USER_AGENT)
+        sources = [self._make_source(name, session, cache, universe, opts) for name in names]
 
+        # Créateurs déjà résolus et doublons vus, partagés par toutes les recherches de l'import
+        persons, dedupe = PersonResolver(), Deduplicator()
+        try:
+            for query in queries:
+                for source in sources:
+                    self._populate(source, checkpoint, persons, dedupe, query, limit, opts)
+        finally:
+            if cache is not None:
+                cache.close()
+
+    @staticmethod
+    def _make_source(name, session, cache, universe, opts):
+        # Un limiteur par API : chacune a son propre quota
+        client_options = {
+            "session": session, "limiter": TokenBucket(opts["rate"], burst=opts["workers"]), "cache": cache,
+        }
+        if name == "comicvine":
+            return ComicVineSource(ComicVineClient(**client_options), universe)
+        if name == "openlibrary":
+            return OpenLibrarySource(OpenLibraryClient(**client_options))
+        return MarvelSource(MarvelClient(**client_options))
+
+    # ────────────────────────────────────────────────────────
+    # Interactive mode
+    # ────────────────────────────────────────────────────────
+    def _ask(self):
         # ─────────── Select Universe ───────────
-        available = ["marvel", "dc"]
         print("\n📚 Available universes:")
-        for i, lib in enumerate(available, 1):
+        for i, lib in enumerate(UNIVERSES, 1):
             print(f"  {i}. {lib.capitalize()}")
 
         while True:
-            universe = input(f"Select a universe ({'/'.join(available)}): ").strip().lower()
-            if universe in available:
+            universe = input(f"Select a universe ({'/'.join(UNIVERSES)}): ").strip().lower()
+            if universe in UNIVERSES:
                 break
             print("⚠️ Invalid choice. Try again.")
 
         # ─────────── Example Searches ───────────
-        examples = {
-            "marvel": ["iron man", "spider-man", "x-men", "captain america", "doctor strange"],
-            "dc": ["batman", "superman", "wonder woman", "flash", "green lantern"],
-        }[universe]
+        examples = EXAMPLES[universe]
 
         print("\n💡 Example searches:")
         for ex in examples:
@@ -48,96 +123,45 @@ class Command(BaseCommand):
             except ValueError:
                 print("⚠️ Please enter a valid number.")
 
-        # ─────────── Populate via ComicVine ───────────
-        self._populate_comicvine(query, limit, universe)
+        return [query], universe, limit
 
     # ────────────────────────────────────────────────────────
-    # ComicVine population logic
+    # Population logic
     # ────────────────────────────────────────────────────────
-    def _populate_comicvine(self, query, limit, universe="marvel"):
-        base_url = settings.COMICVINE_BASE_URL.rstrip("/")
-        url = f"{base_url}/search/"
-        params = {
-            "api_key": settings.COMICVINE_API_KEY,
-            "format": "json",
-            "resources": "issue",
-            "query": query,
-            "limit": limit,
-        }
-        headers = {
-            "User-Agent": getattr(settings, "COMICVINE_USER_AGENT", "django-catalog-bot/1.0"),
-            "Accept": "application/json",
-        }
-
-        self.stdout.write(f"🔎 Searching ComicVine for '{query}' ({universe}) ...")
-        try:
-            r = requests.get(url, params=params, headers=headers, timeout=25)
-            r.raise_for_status()
-            data = r.json()
-        except Exception as e:
-            self.stderr.write(f"❌ ComicVine request failed: {e}")
-            return
+    def _populate(self, source, checkpoint, persons, dedupe, query, limit, opts):
+        label = SOURCES[source.name]
+        self.stdout.write(f"🔎 Searching {label} for '{query}' ({source.category}) ...")
 
-        results = data.get("results", [])
-        if not results:
-            self.stderr.write(f"⚠️ No results found for '{query}' on ComicVine.")
-            return
+        # Import interrompu : reprise après le dernier lot enregistré
+        key = source.checkpoint_key(query)
+        offset = 0 if opts["restart"] else checkpoint.offset(key)
+        if offset:
+            self.stdout.write(f"⏩ Resuming after {offset} items saved by a previous run")
 
         user, _ = Account.objects.get_or_create(username="admin", defaults={"role": "admin"})
-        cat, _ = Category.objects.get_or_create(name=f"{universe.capitalize()} Comics")
-
-        imported = 0
-        for res in results:
-            if self._save_item(res, cat, user, universe):
-                imported += 1
+        cat, _ = Category.objects.get_or_create(name=source.category)
 
-        self.stdout.write(f"✅ {imported} comics imported successfully from ComicVine ({universe}).")
-
-    # ────────────────────────────────────────────────────────
-    # Shared save logic
-    # ────────────────────────────────────────────────────────
-    def _save_item(self, data, category, user, universe):
+        # Pages récupérées en parallèle, enregistrées par lots
+        records = source.records(query, limit, opts["page_size"], opts["workers"], offset)
+        created = updated = skipped = consumed = 0
         try:
-            title = data.get("name") or data.get("volume", {}).get("name")
-            desc = data.get("deck") or data.get("description") or "No description available."
-            url = data.get("site_detail_url")
-            image = data.get("image", {}).get("super_url") or data.get("image", {}).get("thumb_url")
-
-            creators = data.get("person_credits", []) or data.get("creators", {}).get("items", [])
-            rating = round(random.uniform(3.0, 5.0), 2)
-            nratings = random.randint(10, 300)
-            popularity = nratings * rating / 10
-
-            item, _ = Item.objects.update_or_create(
-                title=title or "Untitled",
-                category=category,
-                defaults={
-                    "description": desc,
-                    "created_by": user,
-                    "url": url,
-                    "image": image,
-                    "tags": [universe],
-                    "rating": rating,
-                    "number_of_ratings": nratings,
-                    "popularity_score": popularity,
-                },
-            )
-
-            for c in creators:
-                name = c.get("name") if isinstance(c, dict) else str(c)
-                role = (c.get("role") if isinstance(c, dict) else "").lower()
-                if not name:
-                    continue
-                person, _ = Person.objects.get_or_create(name=name)
-                if "writer" in role or "author" in role:
-                    item.authors.add(person)
-                elif "editor" in role or "producer" in role:
-                    item.producers.add(person)
-                else:
-                    item.contributors.add(person)
-
-            return True
-
-        except Exception as e:
-            self.stderr.write(f"⚠️ Error saving item: {e}")
-            return False
+            batches = import_records(records, cat, user, opts["batch_size"], persons, dedupe)
+            for batch_consumed, batch_created, batch_updated, batch_skipped in batches:
+                created += batch_created
+                updated += batch_updated
+                skipped += batch_skipped
+                consumed += batch_consumed
+                checkpoint.save(key, offset + consumed)
+                self.stdout.write(f"  💾 {offset + consumed} items saved...")
+        except (requests.RequestException, ImporterError) as e:
+            self.stderr.write(f"❌ {label} request failed: {e}")
+            return
+
+        checkpoint.done(key)
+        if not offset + consumed:
+            self.stderr.write(f"⚠️ No results found for '{query}' on {label}.")
+            return
+        message = f"✅ {created} items imported, {updated} updated from {label} ({source.category})"
+        if skipped:
+            message += f", {skipped} duplicates skipped"
+        self.stdout.write(f"{message}.")
@@ -0,0 +1,91 @@
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts.models import Account
+from catalog.models import PrecomputedRecommendation, UserInteraction
+from catalog.recommendations.batch import init_worker, score_block
+from catalog.recommendations.index import index_dir
+from catalog.recommendations.sync import persist_changes
+
+
+class Command(BaseCommand):
+    help = "Précalcule les recommandations de tous les comptes actifs (emails, blocs de la home)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=20, help="Nombre d'items par utilisateur")
+        parser.add_argument(
+            "--block-size", type=int, default=128,
+            help="Utilisateurs par bloc (mémoire d'un bloc ≈ block-size x nombre d'items x 4 octets)",
+        )
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processus du pool")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Lignes par bulk_create")
+
+    def handle(self, *args, **options):
+        # Index sur disque à jour : c'est lui que chargent les workers
+        self.stdout.write("🔄 Mise à jour de l'index des items...")
+        index = persist_changes()
+
+        # Items aimés ou favoris de chaque compte actif, convertis en lignes de l'index
+        active_users = Account.objects.filter(is_active=True).values("id")
+        pairs = list(
+            UserInteraction.objects.filter(
+                user_id__in=active_users, interaction_type__in=["like", "bookmark"]
+            ).values_list("user_id", "item_id")
+        )
+        rows = index.row_of([item_id for _, item_id in pairs])
+        rows_per_user = defaultdict(set)
+        for (user_id, _), row in zip(pairs, rows):
+            if row >= 0:
+                rows_per_user[str(user_id)].add(int(row))
+
+        users = list(rows_per_user)
+        if not users:
+            self.stdout.write("⚠️ Aucun utilisateur avec des interactions.")
+            return
+
+        block_size = options["block_size"]
+        tasks = [
+            (
+                users[start:start + block_size],
+                [np.array(sorted(rows_per_user[user_id]), dtype=np.int64) for user_id in users[start:start + block_size]],
+                options["top"],
+            )
+            for start in range(0, len(users), block_size)
+        ]
+
+        self.stdout.write(
+            f"🧮 {len(users)} utilisateurs, {len(tasks)} blocs, {options['workers']} processus..."
+        )
+        written = 0
+        pending = []
+        with ProcessPoolExecutor(
+            max_workers=options["workers"], initializer=init_worker, initargs=(str(index_dir()), index.version)
+        ) as executor:
+            for results in executor.map(score_block, tasks):
+                computed_at = timezone.now()
+                pending += [
+                    PrecomputedRecommendation(user_id=user_id, item_ids=item_ids, computed_at=computed_at)
+                    for user_id, item_ids in results
+                ]
+                if len(pending) >= options["batch_size"]:
+                    written += self._write(pending)
+                    pending = []
+        written += self._write(pending)
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Recommandations précalculées pour {written} utilisateurs"))
+
+    def _write(self, rows):
+        if not rows:
+            return 0
+        PrecomputedRecommendation.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=["user"],
+            update_fields=["item_ids", "computed_at"],
+        )
+        return len(rows)
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from catalog.aggregates import reconcile_aggregates, stale_items
+from catalog.search.facets import invalidate_facets
+
+
+class Command(BaseCommand):
+    help = "Recalcule note moyenne et nombre de notes des items depuis les interactions"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Affiche le nombre d'items à corriger sans les modifier"
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("🧮 Recalcul des agrégats depuis les interactions...")
+
+        if options["dry_run"]:
+            self.stdout.write(f"🔎 {stale_items().count()} items à corriger (aucune modification)")
+            return
+
+        # Seuls les items dont les agrégats ont dérivé sont réécrits, en un seul UPDATE
+        with transaction.atomic():
+            corrected = reconcile_aggregates()
+        if corrected:
+            invalidate_facets()
+        self.stdout.write(self.style.SUCCESS(f"✅ Agrégats à jour : {corrected} items corrigés"))
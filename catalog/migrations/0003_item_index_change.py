@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0002_alter_item_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemIndexChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_id', models.UUIDField()),
+                ('action', models.CharField(choices=[('upsert', 'Upsert'), ('delete', 'Delete')], max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterModelOptions(
+            name='item',
+            options={'ordering': ['-popularity_score', '-created_at']},
+        ),
+    ]
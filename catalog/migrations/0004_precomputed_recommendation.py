@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_fill_uuid_and_swap'),
+        ('catalog', '0003_item_index_change'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrecomputedRecommendation',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='precomputed_recommendations', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('item_ids', models.JSONField(default=list)),
+                ('computed_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0004_precomputed_recommendation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['-popularity_score', '-created_at', '-id'], name='item_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:18
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def create_search_structures(apps, schema_editor):
+    # Index GIN sous PostgreSQL, table FTS5 sous SQLite (voir catalog.search.backends)
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(
+            "CREATE INDEX item_search_vector_idx ON catalog_item USING gin (search_vector)"
+        )
+    elif schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE catalog_item_fts USING fts5("
+            "item_id UNINDEXED, title, keywords, description, "
+            "tokenize = 'porter unicode61 remove_diacritics 2')"
+        )
+
+
+def drop_search_structures(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS item_search_vector_idx")
+    elif schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS catalog_item_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0005_item_feed_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_structures, drop_search_structures),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_item_tags(apps, schema_editor):
+    Item = apps.get_model("catalog", "Item")
+    ItemTag = apps.get_model("catalog", "ItemTag")
+    batch = []
+    for item_id, tags in Item.objects.values_list("id", "tags").iterator(chunk_size=2000):
+        for tag in dict.fromkeys(str(tag).strip()[:255] for tag in tags or []):
+            if tag:
+                batch.append(ItemTag(item_id=item_id, tag=tag))
+        if len(batch) >= 5000:
+            ItemTag.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    ItemTag.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def create_tags_index(apps, schema_editor):
+    # Index GIN (jsonb_ops : `@>` et `?|`) sous PostgreSQL uniquement
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("CREATE INDEX item_tags_gin_idx ON catalog_item USING gin (tags)")
+
+
+def drop_tags_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS item_tags_gin_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0006_item_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tag', models.CharField(max_length=255)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='item_tags', to='catalog.item')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('tag', 'item'), name='item_tag_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_item_tags, migrations.RunPython.noop),
+        migrations.RunPython(create_tags_index, drop_tags_index),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0007_item_tag'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['-popularity_score', '-rating'], name='item_popular_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['created_at'], name='item_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['updated_at'], name='item_updated_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['rating'], name='item_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['number_of_ratings'], name='item_number_of_ratings_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userinteraction',
+            index=models.Index(condition=models.Q(('interaction_type', 'like')), fields=['user', '-created_at'], name='interaction_user_likes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userinteraction',
+            index=models.Index(condition=models.Q(('interaction_type', 'bookmark')), fields=['user', '-created_at'], name='interaction_user_bookmarks_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0008_query_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='popularity_updated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
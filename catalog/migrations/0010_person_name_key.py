@@ -0,0 +1,66 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:50
+
+import unicodedata
+
+from django.db import migrations, models
+
+CREATOR_RELATIONS = ("authors", "producers", "contributors")
+
+
+def person_name_key(name):
+    # Copie de catalog.models.person_name_key (une migration ne dépend pas du code courant)
+    decomposed = unicodedata.normalize("NFKD", name or "")
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.casefold().split())[:255]
+
+
+def merge_duplicate_persons(apps, schema_editor):
+    """
+    Renseigne `name_key` et fusionne les personnes de même clé : les liens vers
+    les items des doublons passent sur la première personne, puis les doublons
+    sont supprimés.
+    """
+    Item = apps.get_model("catalog", "Item")
+    Person = apps.get_model("catalog", "Person")
+
+    survivors, duplicates = {}, {}
+    for pk, name in Person.objects.order_by("pk").values_list("pk", "name").iterator(chunk_size=2000):
+        key = person_name_key(name)
+        if key in survivors:
+            duplicates[pk] = survivors[key]
+        else:
+            survivors[key] = pk
+
+    for relation in CREATOR_RELATIONS:
+        through = Item._meta.get_field(relation).remote_field.through
+        links = through.objects.filter(person_id__in=list(duplicates)).values_list("item_id", "person_id")
+        through.objects.bulk_create(
+            [through(item_id=item_id, person_id=duplicates[person_id]) for item_id, person_id in links],
+            ignore_conflicts=True,
+        )
+    Person.objects.filter(pk__in=list(duplicates)).delete()
+
+    batch = []
+    for person in Person.objects.only("pk", "name").iterator(chunk_size=2000):
+        person.name_key = person_name_key(person.name)
+        batch.append(person)
+        if len(batch) >= 2000:
+            Person.objects.bulk_update(batch, ["name_key"])
+            batch = []
+    Person.objects.bulk_update(batch, ["name_key"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0009_item_popularity_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='person',
+            name='name_key',
+            field=models.CharField(editable=False, max_length=255, null=True),
+        ),
+        migrations.RunPython(merge_duplicate_persons, migrations.RunPython.noop),
+    ]
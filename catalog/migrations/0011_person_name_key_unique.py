@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Migration séparée : sous PostgreSQL, modifier la table dans la transaction
+    # qui vient d'écrire ses lignes échoue (pending trigger events)
+
+    dependencies = [
+        ('catalog', '0010_person_name_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='person',
+            name='name_key',
+            field=models.CharField(editable=False, max_length=255, unique=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0011_person_name_key_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='isbn',
+            field=models.CharField(blank=True, db_index=True, max_length=20, null=True),
+        ),
+    ]
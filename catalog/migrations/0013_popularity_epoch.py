@@ -0,0 +1,45 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:12
+
+import math
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, Max
+from django.utils import timezone
+
+
+def common_reference(apps, schema_editor):
+    """
+    Ramène les scores, jusqu'ici exprimés chacun à sa propre référence
+    (`popularity_updated_at`), à une référence commune : la plus récente.
+    """
+    Item = apps.get_model("catalog", "Item")
+    PopularityEpoch = apps.get_model("catalog", "PopularityEpoch")
+    rate = math.log(2) / settings.POPULARITY_HALF_LIFE.total_seconds()
+
+    reference = Item.objects.aggregate(latest=Max("popularity_updated_at"))["latest"] or timezone.now()
+    anchors = Item.objects.exclude(popularity_updated_at=None).values_list("popularity_updated_at", flat=True)
+    for anchor in anchors.distinct():
+        factor = math.exp(-rate * (reference - anchor).total_seconds())
+        Item.objects.filter(popularity_updated_at=anchor).update(
+            popularity_score=F("popularity_score") * factor, popularity_updated_at=reference
+        )
+    PopularityEpoch.objects.create(pk=1, reference=reference)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0012_item_isbn'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PopularityEpoch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reference', models.DateTimeField()),
+            ],
+        ),
+        migrations.RunPython(common_reference, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:05
+
+from itertools import chain
+
+from django.conf import settings
+from django.db import migrations
+
+CHUNK_SIZE = 1000
+
+
+def search_documents(Item):
+    """
+    (id, titre, mots-clés, description) de chaque item, comme
+    `catalog.search.backends.search_document` au moment de cette migration.
+    """
+    items = (
+        Item.objects.select_related("category")
+        .prefetch_related("authors", "contributors", "producers")
+        .order_by("id")
+    )
+    for item in items.iterator(chunk_size=CHUNK_SIZE):
+        keywords = chain(
+            item.tags or [],
+            [item.category.name] if item.category else [],
+            (person.name for person in chain(item.authors.all(), item.contributors.all(), item.producers.all())),
+        )
+        yield item.pk, item.title, " ".join(keywords), item.description
+
+
+def backfill_search_documents(apps, schema_editor):
+    """
+    Remplit les documents de recherche des items existants : la migration 0006
+    crée les structures vides, seules les écritures suivantes les alimentaient.
+    """
+    Item = apps.get_model("catalog", "Item")
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        sql = (
+            "UPDATE catalog_item SET search_vector = "
+            "setweight(to_tsvector(%s::regconfig, %s), 'A') || "
+            "setweight(to_tsvector(%s::regconfig, %s), 'B') || "
+            "setweight(to_tsvector(%s::regconfig, %s), 'C') WHERE id = %s"
+        )
+        config = settings.SEARCH_CONFIG
+
+        def params(pk, title, keywords, description):
+            return config, title, config, keywords, config, description, pk
+    elif vendor == "sqlite":
+        schema_editor.execute("DELETE FROM catalog_item_fts")
+        sql = (
+            "INSERT INTO catalog_item_fts (rowid, item_id, title, keywords, description) "
+            "SELECT rowid, %s, %s, %s, %s FROM catalog_item WHERE id = %s"
+        )
+
+        def params(pk, title, keywords, description):
+            return pk.hex, title, keywords, description, pk.hex
+    else:
+        return
+
+    batch = []
+    with schema_editor.connection.cursor() as cursor:
+        for document in search_documents(Item):
+            batch.append(params(*document))
+            if len(batch) == CHUNK_SIZE:
+                cursor.executemany(sql, batch)
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0013_popularity_epoch'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+    ]
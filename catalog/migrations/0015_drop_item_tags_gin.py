@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:30
+
+from django.db import migrations
+
+
+def drop_tags_index(apps, schema_editor):
+    # Le filtrage par tag passe par ItemTag sur toutes les bases (catalog.tags.filter_tags)
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS item_tags_gin_idx")
+
+
+def create_tags_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("CREATE INDEX item_tags_gin_idx ON catalog_item USING gin (tags)")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0014_backfill_search_documents'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_tags_index, create_tags_index),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:10
+
+from django.db import migrations
+
+
+def normalize_tags(tags):
+    # Copie de catalog.tags.normalize_tags (une migration ne dépend pas du code courant)
+    normalized = []
+    for tag in tags or []:
+        tag = str(tag).strip()[:255]
+        if tag and tag not in normalized:
+            normalized.append(tag)
+    return normalized
+
+
+def normalize_stored_tags(apps, schema_editor):
+    """
+    Normalise `Item.tags` déjà enregistrés : le filtrage PostgreSQL compare le
+    JSON tel quel aux tags demandés.
+    """
+    Item = apps.get_model("catalog", "Item")
+    batch = []
+    for item in Item.objects.only("pk", "tags").iterator(chunk_size=2000):
+        tags = normalize_tags(item.tags)
+        if tags != item.tags:
+            item.tags = tags
+            batch.append(item)
+        if len(batch) >= 2000:
+            Item.objects.bulk_update(batch, ["tags"])
+            batch = []
+    Item.objects.bulk_update(batch, ["tags"])
+
+
+def create_tags_index(apps, schema_editor):
+    # Supprimé par la migration 0015 : `@>` / `?|` sur `Item.tags` sous PostgreSQL
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("CREATE INDEX IF NOT EXISTS item_tags_gin_idx ON catalog_item USING gin (tags)")
+
+
+def drop_tags_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS item_tags_gin_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0015_drop_item_tags_gin'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_stored_tags, migrations.RunPython.noop),
+        migrations.RunPython(create_tags_index, drop_tags_index),
+    ]
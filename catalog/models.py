@@ -1,5 +1,7 @@
+import unicodedata
 import uuid
-from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
 from accounts.models import Account
 
 
@@ -11,15 +13,72 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+def person_name_key(name):
+    """
+    Clé d'unicité d'une personne : nom sans accents, casse ni espaces superflus
+    ("Stan  Lée" et "stan lee" désignent la même personne).
+    """
+    decomposed = unicodedata.normalize("NFKD", name or "")
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.casefold().split())[:255]
+
+
 class Person(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=255)
+    # Toujours dérivée de `name` (à renseigner soi-même avec `bulk_create`)
+    name_key = models.CharField(max_length=255, unique=True, editable=False)
     bio = models.TextField(blank=True)
     website = models.URLField(blank=True, null=True)
 
+    def save(self, *args, **kwargs):
+        self.name_key = person_name_key(self.name)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "name" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "name_key"}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.name
 
+class ItemQuerySet(models.QuerySet):
+    def for_listing(self):
+        """
+        Précharge tout ce que sérialise `ItemSerializer` (catégorie, créateur,
+        auteurs, contributeurs, producteurs) : nombre de requêtes constant par page.
+        """
+        return (
+            self.select_related("category", "created_by")
+            .prefetch_related(*listing_prefetches())
+            .defer("search_vector")
+        )
+
+    def listing_values(self):
+        """
+        Lignes (dicts) pour le chemin de sérialisation rapide `serialize_items` :
+        champs de l'item, de sa catégorie et de son créateur en une seule requête.
+        """
+        return self.values(*ITEM_LISTING_VALUES)
+
+
+ITEM_LISTING_VALUES = (
+    "id", "title", "description", "image", "url", "created_at", "updated_at",
+    "tags", "popularity_score", "rating", "number_of_ratings",
+    "category_id", "category__name", "category__description",
+    "created_by_id", "created_by__username", "created_by__first_name",
+    "created_by__last_name", "created_by__email", "created_by__role",
+)
+
+
+def listing_prefetches(prefix=""):
+    # Ordre stable des personnes (par nom), identique dans `serialize_items`
+    persons = Person.objects.only("id", "name", "bio", "website").order_by("name", "id")
+    return [
+        models.Prefetch(f"{prefix}{relation}", queryset=persons)
+        for relation in ("authors", "contributors", "producers")
+    ]
+
+
 class Item(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     title = models.CharField(max_length=255)
@@ -27,26 +86,67 @@ class Item(models.Model):
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, related_name='items')
     image = models.URLField(blank=True, null=True)
     url = models.URLField(blank=True, null=True)
+    # ISBN-13 (ou 10) sans tirets, renseigné par les imports : dédoublonnage entre sources
+    isbn = models.CharField(max_length=20, blank=True, null=True, db_index=True)
     created_by = models.ForeignKey(
         Account, on_delete=models.SET_NULL, null=True, related_name='items_created'
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Normalisés à l'écriture (`catalog.tags.normalize_tags`) ; index GIN sous
+    # PostgreSQL (migrations 0007 et 0016), lignes `ItemTag` ailleurs
     tags = models.JSONField(default=list, blank=True)
     popularity_score = models.FloatField(default=0.0)
+    # Référence à laquelle `popularity_score` est exprimé : celle de `PopularityEpoch`,
+    # sauf pendant un changement de référence (NULL : item créé depuis, référence courante)
+    popularity_updated_at = models.DateTimeField(null=True, blank=True, editable=False)
     rating = models.FloatField(default=0.0)
     number_of_ratings = models.PositiveIntegerField(default=0)
     authors = models.ManyToManyField(Person, blank=True, related_name="authored_items")
     producers = models.ManyToManyField(Person, blank=True, related_name="produced_items")
     contributors = models.ManyToManyField(Person, blank=True, related_name="contributed_items")
+    # Document plein texte (PostgreSQL), maintenu par catalog.search ; index GIN
+    # créé par la migration 0006 (sous SQLite, table FTS5 `catalog_item_fts`)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = ItemQuerySet.as_manager()
 
     class Meta:
         ordering = ["-popularity_score", "-created_at"]
+        indexes = [
+            # Tri du feed et de sa pagination par curseur (KeysetPagination), Meta.ordering
+            models.Index(fields=["-popularity_score", "-created_at", "-id"], name="item_feed_idx"),
+            # Items populaires (repli des recommandations)
+            models.Index(fields=["-popularity_score", "-rating"], name="item_popular_rating_idx"),
+            # `ordering_fields` de la recherche (un index se parcourt dans les deux sens)
+            models.Index(fields=["created_at"], name="item_created_at_idx"),
+            models.Index(fields=["updated_at"], name="item_updated_at_idx"),
+            models.Index(fields=["rating"], name="item_rating_idx"),
+            models.Index(fields=["number_of_ratings"], name="item_number_of_ratings_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Tags stockés normalisés : le filtrage `@>` / `?|` (PostgreSQL) compare
+        # les tags demandés, normalisés de la même façon, au JSON tel quel
+        from catalog.tags import normalize_tags
+
+        self.tags = normalize_tags(self.tags)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.title
 
 
+class UserInteractionQuerySet(models.QuerySet):
+    def for_listing(self):
+        """
+        Précharge l'utilisateur et l'item imbriqués de `UserInteractionSerializer`.
+        """
+        return self.select_related(
+            "user", "item__category", "item__created_by"
+        ).prefetch_related(*listing_prefetches("item__")).defer("item__search_vector")
+
+
 class UserInteraction(models.Model):
     class InteractionType(models.TextChoices):
         LIKE = "like", "Like"
@@ -64,11 +164,101 @@ class UserInteraction(models.Model):
     rating = models.PositiveIntegerField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = UserInteractionQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # État lu en base : les signaux en déduisent l'effet d'une modification
+        # sur les agrégats de l'item (note moyenne, nombre de notes, popularité)
+        loaded = dict(zip(field_names, values))
+        if {"item_id", "interaction_type", "rating"} <= loaded.keys():
+            instance._stored_state = (loaded["item_id"], loaded["interaction_type"], loaded["rating"])
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Les agrégats de l'item (signal post_save) sont mis à jour dans la même transaction
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
+
     class Meta:
         unique_together = ("user", "item", "interaction_type")
         indexes = [
             models.Index(fields=["user", "item", "interaction_type"]),
+            # Items likés / bookmarkés d'un utilisateur, du plus récent au plus ancien
+            models.Index(
+                fields=["user", "-created_at"],
+                condition=models.Q(interaction_type="like"),
+                name="interaction_user_likes_idx",
+            ),
+            models.Index(
+                fields=["user", "-created_at"],
+                condition=models.Q(interaction_type="bookmark"),
+                name="interaction_user_bookmarks_idx",
+            ),
         ]
 
     def __str__(self):
-        return f"{self.user.username} - {self.interaction_type} - {self.item.title}"
\ No newline at end of file
+        return f"{self.user.username} - {self.interaction_type} - {self.item.title}"
+
+class ItemTag(models.Model):
+    """
+    Tags d'un item, une ligne par tag, tenus à jour depuis `Item.tags`
+    (voir `catalog.tags`) : filtrage portable et comptage par tag.
+    """
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name="item_tags")
+    tag = models.CharField(max_length=255)
+
+    class Meta:
+        constraints = [
+            # Sert aussi d'index pour filtrer et compter par tag
+            models.UniqueConstraint(fields=["tag", "item"], name="item_tag_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.tag} - {self.item_id}"
+
+
+class ItemIndexChange(models.Model):
+    """
+    Journal des modifications d'items, consommé par micro-lots pour tenir
+    l'index des recommandations et l'index inversé de la recherche à jour sans
+    reconstruction complète.
+    """
+    class Action(models.TextChoices):
+        UPSERT = "upsert", "Upsert"
+        DELETE = "delete", "Delete"
+
+    item_id = models.UUIDField()
+    action = models.CharField(max_length=10, choices=Action.choices)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.action} - {self.item_id}"
+
+
+class PrecomputedRecommendation(models.Model):
+    """
+    Recommandations calculées hors ligne (`precompute_recommendations`),
+    servies par l'endpoint tant qu'elles sont fraîches.
+    """
+    user = models.OneToOneField(
+        Account, on_delete=models.CASCADE, primary_key=True, related_name="precomputed_recommendations"
+    )
+    item_ids = models.JSONField(default=list)
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.user.username} - {len(self.item_ids)} items"
+
+
+class PopularityEpoch(models.Model):
+    """
+    Référence commune des scores de popularité (un seul enregistrement) : chaque
+    `Item.popularity_score` est la popularité amortie ramenée à cet instant,
+    les scores de tous les items sont donc directement comparables.
+    """
+    reference = models.DateTimeField()
+
+    def __str__(self):
+        return self.reference.isoformat()
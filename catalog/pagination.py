@@ -1,7 +1,124 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+import uuid
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 # Pagination personnalisée pour catalog
 class CustomPageNumberPagination(PageNumberPagination):
     page_size = 20
     page_size_query_param = "limit"
     max_page_size = 100
+
+
+# Pagination par curseur (keyset) pour le feed
+class KeysetPagination(BasePagination):
+    """
+    Pagine sur un tri strict et unique : le curseur encode les valeurs du dernier
+    item de la page, et la page suivante est `WHERE (tri) < (curseur)`.
+    Contrairement à OFFSET, le coût d'une page ne dépend pas de sa position.
+    """
+    page_size = 20
+    page_size_query_param = "limit"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    # Même tri que Item.Meta.ordering, départagé par l'id (index item_feed_idx)
+    ordering = ("-popularity_score", "-created_at", "-id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        queryset = self.filter_queryset(queryset, request)
+        page = list(queryset[:self.page_size + 1])
+        self.has_next = len(page) > self.page_size
+        self.page = page[:self.page_size]
+        return self.page
+
+    def filter_queryset(self, queryset, request):
+        """
+        Trie le queryset et le positionne après le curseur de la requête (s'il y en a un).
+        """
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self._after(position))
+        return queryset
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def _fields(self):
+        return [(field.lstrip("-"), field.startswith("-")) for field in self.ordering]
+
+    def _after(self, position):
+        """
+        (a, b, c) "après" (pa, pb, pc) dans l'ordre du tri, développé en OR.
+        La première condition (a <= pa) est redondante mais donne au planner
+        une borne directement exploitable sur l'index.
+        """
+        fields = self._fields()
+        first, first_desc = fields[0]
+        condition = Q()
+        for depth, (name, descending) in enumerate(fields):
+            term = Q(**{f"{name}__{'lt' if descending else 'gt'}": position[depth]})
+            for (previous, _), value in zip(fields[:depth], position[:depth]):
+                term &= Q(**{previous: value})
+            condition |= term
+        return Q(**{f"{first}__{'lte' if first_desc else 'gte'}": position[0]}) & condition
+
+    # ────────────────────────────────────────────────────────
+    # Curseur
+    # ────────────────────────────────────────────────────────
+    def encode_cursor(self, obj):
+        values = []
+        for name, _ in self._fields():
+            value = obj[name] if isinstance(obj, dict) else getattr(obj, name)
+            values.append(value.isoformat() if isinstance(value, datetime) else str(value) if name == "id" else value)
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError
+            popularity, created_at, pk = values
+            return [float(popularity), datetime.fromisoformat(created_at), uuid.UUID(pk)]
+        except (AttributeError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
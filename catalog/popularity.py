@@ -0,0 +1,212 @@
+import math
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from catalog.models import Item, PopularityEpoch, UserInteraction
+from catalog.recommendations.ranking import uuid_array
+
+# Poids d'un événement dans la popularité ; une note r compte r / 10
+# (même échelle que `populate_catalog` : nombre de notes x note moyenne / 10)
+EVENT_WEIGHTS = {"like": 1.0, "bookmark": 1.0}
+RATING_FACTOR = 0.1
+
+
+def event_weight(interaction_type, rating=None):
+    if interaction_type == UserInteraction.InteractionType.RATING:
+        return (rating or 0) * RATING_FACTOR
+    return EVENT_WEIGHTS.get(interaction_type, 0.0)
+
+
+def decay_rate():
+    """
+    Taux de décroissance par seconde : un événement perd la moitié de son poids
+    toutes les POPULARITY_HALF_LIFE.
+    """
+    return math.log(2) / settings.POPULARITY_HALF_LIFE.total_seconds()
+
+
+# ────────────────────────────────────────────────────────
+# Référence commune des scores
+# ────────────────────────────────────────────────────────
+def current_epoch():
+    """
+    Instant auquel tous les scores de popularité sont exprimés.
+    """
+    epoch = PopularityEpoch.objects.filter(pk=1).values_list("reference", flat=True).first()
+    if epoch is None:
+        epoch = PopularityEpoch.objects.get_or_create(pk=1, defaults={"reference": timezone.now()})[0].reference
+    return epoch
+
+
+def _set_epoch(reference):
+    # Items créés depuis le dernier changement (référence NULL) : fixés à l'ancienne
+    # référence avant de la déplacer, leur score y est exprimé
+    Item.objects.filter(popularity_updated_at__isnull=True).update(popularity_updated_at=current_epoch())
+    PopularityEpoch.objects.update_or_create(pk=1, defaults={"reference": reference})
+
+
+def rescale_scores(now=None):
+    """
+    Déplace la référence commune à `now` et y ramène tous les scores :
+    score x exp(-taux x (now - ancienne référence)), un UPDATE par référence
+    distincte (une seule hors changement interrompu). Borne les scores stockés,
+    qui croissent avec l'écart entre les événements et la référence.
+    Retourne le nombre d'items mis à jour.
+    """
+    now = now or timezone.now()
+    rate = decay_rate()
+    _set_epoch(now)
+    updated = 0
+    anchors = Item.objects.exclude(popularity_updated_at=now).exclude(popularity_updated_at=None)
+    for anchor in anchors.values_list("popularity_updated_at", flat=True).distinct():
+        factor = math.exp(-rate * (now - anchor).total_seconds())
+        # Filtré sur l'ancienne référence : un événement concurrent (`record_events`) reste compté une fois
+        updated += Item.objects.filter(popularity_updated_at=anchor).update(
+            popularity_score=F("popularity_score") * factor, popularity_updated_at=now
+        )
+    return updated
+
+
+# ────────────────────────────────────────────────────────
+# Mise à jour en ligne (à chaque interaction)
+# ────────────────────────────────────────────────────────
+def record_events(events):
+    """
+    Ajoute (ou retire, poids négatif) des événements (item_id, poids, instant)
+    à la popularité des items.
+
+    Les scores sont exprimés à une référence commune (`PopularityEpoch`) : un
+    événement y est ramené, poids x exp(taux x (instant - référence)), et les
+    scores de tous les items restent comparables sans être réécrits. La
+    référence de l'item lui-même fait foi pendant un changement de référence en
+    cours. Mise à jour relative (`F()`), un UPDATE par couple (référence,
+    contribution) distinct.
+    """
+    now = timezone.now()
+    rate = decay_rate()
+    weights = {}
+    for item_id, weight, occurred_at in events:
+        if weight:
+            weights.setdefault(str(item_id), []).append((weight, occurred_at or now))
+    if not weights:
+        return
+
+    epoch = current_epoch()
+    groups = {}
+    anchors = Item.objects.filter(pk__in=weights).values_list("pk", "popularity_updated_at")
+    for item_id, anchor in anchors:
+        reference = anchor or epoch
+        contribution = sum(
+            weight * math.exp(rate * (occurred_at - reference).total_seconds())
+            for weight, occurred_at in weights[str(item_id)]
+        )
+        # Arrondi : les événements d'un même envoi partagent un UPDATE
+        groups.setdefault((anchor, round(contribution, 6)), []).append(item_id)
+
+    for (anchor, contribution), item_ids in groups.items():
+        score = Greatest(F("popularity_score") + contribution, Value(0.0))
+        if anchor is None:
+            # Item créé depuis le dernier changement : son score est exprimé à la référence courante
+            Item.objects.filter(pk__in=item_ids, popularity_updated_at__isnull=True).update(
+                popularity_score=score, popularity_updated_at=epoch
+            )
+        else:
+            # Référence changée entre-temps par un recalcul : lui (ou le suivant) fait foi
+            Item.objects.filter(pk__in=item_ids, popularity_updated_at=anchor).update(popularity_score=score)
+
+
+def apply_interaction_changes(changes):
+    """
+    Répercute sur la popularité des changements d'interactions
+    (état précédent, état courant, instant de l'interaction), états sous forme
+    de tuples (item_id, type, note) ou None si absente.
+    """
+    events = []
+    for previous, current, occurred_at in changes:
+        for state, sign in ((previous, -1), (current, 1)):
+            if state is not None:
+                item_id, interaction_type, rating = state
+                events.append((item_id, sign * event_weight(interaction_type, rating), occurred_at))
+    record_events(events)
+
+
+def apply_interaction_change(previous, current, occurred_at):
+    apply_interaction_changes([(previous, current, occurred_at)])
+
+
+# ────────────────────────────────────────────────────────
+# Recalcul complet (batch)
+# ────────────────────────────────────────────────────────
+def compute_scores(now=None, chunk_size=100000):
+    """
+    Popularité amortie de chaque item à `now`, depuis toutes les interactions :
+    somme des poids x exp(-taux x âge), vectorisée par blocs d'interactions.
+    Retourne (ids "S16" triés, scores).
+    """
+    now = now or timezone.now()
+    rate = decay_rate()
+    partial_ids, partial_scores = [], []
+
+    def reduce(rows):
+        item_ids, types, ratings, created = zip(*rows)
+        weights = np.array([event_weight(kind, rating) for kind, rating in zip(types, ratings)])
+        ages = np.array([(now - at).total_seconds() for at in created])
+        contributions = weights * np.exp(-rate * np.maximum(ages, 0.0))
+        keys, codes = np.unique(uuid_array(item_ids), return_inverse=True)
+        partial_ids.append(keys)
+        partial_scores.append(np.bincount(codes, weights=contributions, minlength=len(keys)))
+
+    rows = []
+    interactions = UserInteraction.objects.values_list("item_id", "interaction_type", "rating", "created_at")
+    for row in interactions.iterator(chunk_size=10000):
+        rows.append(row)
+        if len(rows) == chunk_size:
+            reduce(rows)
+            rows = []
+    if rows:
+        reduce(rows)
+
+    if not partial_ids:
+        return np.empty(0, dtype="S16"), np.empty(0)
+    keys, codes = np.unique(np.concatenate(partial_ids), return_inverse=True)
+    return keys, np.bincount(codes, weights=np.concatenate(partial_scores), minlength=len(keys))
+
+
+def write_scores(keys, scores, now, batch_size=1000):
+    """
+    Écrit les scores calculés à `now` (0 pour les items sans interaction) par
+    `bulk_update`, un lot par transaction, après avoir déplacé la référence
+    commune à `now`. Retourne le nombre d'items mis à jour.
+    """
+    _set_epoch(now)
+    items = Item.objects.only("id", "popularity_score", "popularity_updated_at").order_by("id")
+    total = 0
+    batch = []
+    for item in items.iterator(chunk_size=batch_size):
+        batch.append(item)
+        if len(batch) == batch_size:
+            total += _write_batch(batch, keys, scores, now)
+            batch = []
+    if batch:
+        total += _write_batch(batch, keys, scores, now)
+    return total
+
+
+def _write_batch(batch, keys, scores, now):
+    values = np.zeros(len(batch))
+    if len(keys):
+        wanted = uuid_array(item.pk for item in batch)
+        positions = np.minimum(np.searchsorted(keys, wanted), len(keys) - 1)
+        found = keys[positions] == wanted
+        values[found] = scores[positions[found]]
+    for item, value in zip(batch, values.tolist()):
+        item.popularity_score = value
+        item.popularity_updated_at = now
+    with transaction.atomic():
+        Item.objects.bulk_update(batch, ["popularity_score", "popularity_updated_at"])
+    return len(batch)
@@ -0,0 +1,3 @@
+from catalog.recommendations.index import ItemIndex, get_index, item_document, reset_index
+
+__all__ = ["ItemIndex", "get_index", "item_document", "reset_index"]
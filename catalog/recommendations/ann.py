@@ -0,0 +1,165 @@
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+from sklearn.decomposition import TruncatedSVD
+from sklearn.preprocessing import normalize
+
+from catalog.recommendations.ranking import top_k
+
+
+def embed(matrix, components):
+    """
+    Projette des vecteurs TF-IDF (creux) dans l'espace réduit, en float32 normalisés.
+    """
+    return normalize(np.asarray(matrix @ components.T, dtype=np.float32), copy=False)
+
+
+def spherical_kmeans(vectors, n_clusters, seed=0, iterations=10, sample_size=20000):
+    """
+    K-means sur la sphère (similarité cosinus), entraîné sur un échantillon.
+    """
+    rng = np.random.default_rng(seed)
+    if len(vectors) > sample_size:
+        vectors = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+    n_clusters = min(n_clusters, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+
+    for _ in range(iterations):
+        labels = np.argmax(vectors @ centroids.T, axis=1)
+        membership = sparse.csr_matrix(
+            (np.ones(len(labels), dtype=np.float32), (labels, np.arange(len(labels)))),
+            shape=(n_clusters, len(vectors)),
+        )
+        sums = np.asarray(membership @ vectors, dtype=np.float32)
+        filled = np.linalg.norm(sums, axis=1) > 0
+        # Un cluster vide garde son ancien centroïde
+        centroids[filled] = normalize(sums[filled])
+    return centroids
+
+
+class IVFIndex:
+    """
+    Index approché (IVF) des items : embeddings denses float32 obtenus par SVD
+    tronquée du TF-IDF, répartis en listes inversées par un k-means sphérique.
+    Une requête ne parcourt que les `nprobe` listes les plus proches.
+
+    Les lignes sont alignées sur celles de `ItemIndex.matrix`. Les lignes ajoutées
+    après la construction (mises à jour incrémentales) sont parcourues à chaque
+    requête jusqu'au prochain `compact()`.
+    """
+
+    FILE = "ann.npz"
+    ASSIGN_CHUNK = 10000
+
+    def __init__(self, components, centroids, embeddings, assignments):
+        self.components = np.asarray(components, dtype=np.float32)
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.embeddings = np.asarray(embeddings, dtype=np.float32)
+        self.assignments = np.asarray(assignments, dtype=np.int32)
+        self._build_lists()
+
+    def __len__(self):
+        return len(self.embeddings)
+
+    @classmethod
+    def build(cls, matrix, dim, n_lists=None, seed=0):
+        n_items, n_terms = matrix.shape
+        dim = max(1, min(dim, n_terms - 1, n_items - 1))
+        svd = TruncatedSVD(n_components=dim, random_state=seed)
+        svd.fit(matrix)
+        components = svd.components_.astype(np.float32)
+
+        embeddings = embed(matrix, components)
+        centroids = spherical_kmeans(embeddings, n_lists or max(1, int(np.sqrt(n_items))), seed=seed)
+        return cls(components, centroids, embeddings, cls._assign(embeddings, centroids))
+
+    @classmethod
+    def _assign(cls, embeddings, centroids):
+        # Par blocs, pour ne jamais matérialiser une matrice items x centroïdes complète
+        return np.concatenate([
+            np.argmax(embeddings[start:start + cls.ASSIGN_CHUNK] @ centroids.T, axis=1)
+            for start in range(0, len(embeddings), cls.ASSIGN_CHUNK)
+        ] or [np.empty(0, dtype=np.int32)]).astype(np.int32)
+
+    def _build_lists(self):
+        self._order = np.argsort(self.assignments, kind="stable").astype(np.int32)
+        self._offsets = np.searchsorted(self.assignments[self._order], np.arange(len(self.centroids) + 1))
+        self._indexed = len(self.assignments)
+
+    # ────────────────────────────────────────────────────────
+    # Mise à jour incrémentale
+    # ────────────────────────────────────────────────────────
+    def add(self, rows):
+        embeddings = embed(rows, self.components)
+        self.embeddings = np.vstack([self.embeddings, embeddings])
+        self.assignments = np.concatenate([self.assignments, self._assign(embeddings, self.centroids)])
+
+    def compact(self, keep):
+        self.embeddings = self.embeddings[keep]
+        self.assignments = self.assignments[keep]
+        self._build_lists()
+
+    # ────────────────────────────────────────────────────────
+    # Requêtes
+    # ────────────────────────────────────────────────────────
+    def candidates(self, query, nprobe):
+        """
+        Lignes des `nprobe` listes les plus proches de `query` (+ lignes non encore rangées).
+        """
+        n_lists = len(self.centroids)
+        if nprobe >= n_lists:
+            probes = np.arange(n_lists)
+        else:
+            probes = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate(
+            [self._order[self._offsets[c]:self._offsets[c + 1]] for c in probes]
+            + [np.arange(self._indexed, len(self.embeddings), dtype=np.int32)]
+        )
+
+    def search(self, vector, k, nprobe, alive, exclude_rows=(), matrix=None, rerank=0):
+        """
+        Lignes des `k` items les plus proches d'un profil TF-IDF dense `vector`.
+        Avec `rerank` > 0, les `k * rerank` meilleurs candidats approchés sont
+        re-classés par le produit scalaire exact avec `matrix`.
+        """
+        query = self.components @ vector
+        norm = np.linalg.norm(query)
+        if not norm:
+            return []
+        query /= norm
+
+        candidates = self.candidates(query, nprobe)
+        mask = alive[candidates]
+        if len(exclude_rows):
+            mask &= ~np.isin(candidates, exclude_rows)
+        candidates = candidates[mask]
+        if not len(candidates):
+            return []
+
+        scores = self.embeddings[candidates] @ query
+        if rerank and matrix is not None:
+            shortlist = top_k(scores, k * rerank)
+            candidates = candidates[shortlist]
+            scores = matrix[candidates] @ vector
+        return candidates[top_k(scores, k)].tolist()
+
+    # ────────────────────────────────────────────────────────
+    # Persistance
+    # ────────────────────────────────────────────────────────
+    def save(self, directory):
+        tmp = Path(directory) / f"{self.FILE}.tmp.npz"
+        np.savez(
+            tmp,
+            components=self.components,
+            centroids=self.centroids,
+            embeddings=self.embeddings,
+            assignments=self.assignments,
+        )
+        tmp.replace(Path(directory) / self.FILE)
+
+    @classmethod
+    def load(cls, directory):
+        with np.load(Path(directory) / cls.FILE) as data:
+            return cls(data["components"], data["centroids"], data["embeddings"], data["assignments"])
+
@@ -0,0 +1,59 @@
+"""
+Calcul des recommandations par blocs d'utilisateurs, exécuté dans les processus
+du pool de `precompute_recommendations`. Ce module n'importe aucun modèle :
+chaque worker charge seulement l'index depuis le disque.
+"""
+import numpy as np
+from scipy import sparse
+
+from catalog.recommendations.index import ItemIndex
+
+_worker_index = None
+
+
+def init_worker(directory, version):
+    """
+    Charge la version de l'index sur laquelle le processus parent a calculé les
+    lignes des utilisateurs, même si une version plus récente est publiée depuis.
+    """
+    global _worker_index
+    _worker_index = ItemIndex.load(directory, version=version)
+
+
+def score_block(task):
+    """
+    `task` = (user_ids, rows_per_user, top). Multiplie la matrice des profils du
+    bloc (utilisateurs x vocabulaire) par la matrice des items et garde, pour
+    chaque utilisateur, les `top` meilleurs items hors ceux déjà aimés.
+    Retourne une liste de (user_id, [item_id, ...]).
+    """
+    user_ids, rows_per_user, top = task
+    index = _worker_index
+
+    # Matrice utilisateurs x items (moyenne des lignes aimées = profil)
+    indptr = np.concatenate([[0], np.cumsum([len(rows) for rows in rows_per_user])])
+    indices = np.concatenate(rows_per_user)
+    weights = np.concatenate([np.full(len(rows), 1.0 / len(rows), dtype=np.float32) for rows in rows_per_user])
+    interactions = sparse.csr_matrix((weights, indices, indptr), shape=(len(user_ids), index.matrix.shape[0]))
+
+    profiles = interactions @ index.matrix
+    scores = (profiles @ index.matrix.T).toarray()
+
+    # Items supprimés et déjà aimés exclus
+    scores[:, ~index.alive] = -np.inf
+    scores[np.repeat(np.arange(len(user_ids)), np.diff(indptr)), indices] = -np.inf
+
+    top = min(top, scores.shape[1])
+    if not top:
+        return [(user_id, []) for user_id in user_ids]
+    best = np.argpartition(-scores, top - 1, axis=1)[:, :top]
+    best_scores = np.take_along_axis(scores, best, axis=1)
+    order = np.argsort(-best_scores, axis=1, kind="stable")
+    best = np.take_along_axis(best, order, axis=1)
+    best_scores = np.take_along_axis(best_scores, order, axis=1)
+
+    results = []
+    for user_id, rows, row_scores in zip(user_ids, best, best_scores):
+        rows = rows[np.isfinite(row_scores)]
+        results.append((user_id, [str(pk) for pk in index.rows_to_ids(rows)]))
+    return results
@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.core.cache import caches
+
+GLOBAL_VERSION_KEY = "reco:version"
+
+
+def _cache():
+    return caches[settings.RECOMMENDER_CACHE_ALIAS]
+
+
+def _user_version_key(user_id):
+    return f"reco:user:{user_id}:version"
+
+
+def _result_key(user_id, variant):
+    """
+    Clé versionnée : incrémenter la version globale ou celle de l'utilisateur
+    rend les anciennes entrées inaccessibles (elles expirent d'elles-mêmes).
+    """
+    cache = _cache()
+    user_key = _user_version_key(user_id)
+    versions = cache.get_many([GLOBAL_VERSION_KEY, user_key])
+    return f"reco:{versions.get(GLOBAL_VERSION_KEY, 0)}:{user_id}:{versions.get(user_key, 0)}:{variant}"
+
+
+def get_recommendations(user_id, variant):
+    """
+    Ids classés des items recommandés à l'utilisateur, ou None si absents du cache.
+    """
+    return _cache().get(_result_key(user_id, variant))
+
+
+def set_recommendations(user_id, variant, item_ids):
+    _cache().set(
+        _result_key(user_id, variant),
+        [str(pk) for pk in item_ids],
+        timeout=settings.RECOMMENDER_CACHE_TIMEOUT,
+    )
+
+
+def get_interacted_items(user_id):
+    """
+    Ids (chaînes) des items avec lesquels l'utilisateur a une interaction en base,
+    ou None si absents du cache. Invalidé avec ses recommandations, à la
+    validation de la transaction qui écrit l'interaction (voir `catalog.signals`).
+    """
+    return _cache().get(_result_key(user_id, "interacted"))
+
+
+def set_interacted_items(user_id, item_ids):
+    _cache().set(
+        _result_key(user_id, "interacted"),
+        frozenset(str(pk) for pk in item_ids),
+        timeout=settings.RECOMMENDER_CACHE_TIMEOUT,
+    )
+
+
+def _bump(key):
+    cache = _cache()
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Clé expulsée entre add() et incr()
+        cache.set(key, 1, timeout=None)
+
+
+def invalidate_user(user_id):
+    """
+    À appeler quand les interactions d'un utilisateur changent.
+    """
+    _bump(_user_version_key(user_id))
+
+
+def bump_version():
+    """
+    À appeler quand l'index des items est reconstruit : invalide tous les utilisateurs.
+    """
+    _bump(GLOBAL_VERSION_KEY)
@@ -0,0 +1,239 @@
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from scipy import sparse
+from sklearn.preprocessing import normalize
+
+from catalog.recommendations.index import current_version, index_dir, new_version_dir, publish_version, version_dir
+from catalog.recommendations.ranking import to_uuid, top_k, uuid_array
+
+logger = logging.getLogger(__name__)
+
+# Poids d'une interaction dans la matrice utilisateurs x items
+INTERACTION_WEIGHTS = {"like": 1.0, "bookmark": 1.0}
+
+
+def interaction_weight(interaction_type, rating=None):
+    if interaction_type == "rating":
+        return (rating or 0) / 5.0
+    return INTERACTION_WEIGHTS.get(interaction_type, 0.0)
+
+
+class CollaborativeIndex:
+    """
+    Filtrage collaboratif item-item : pour chaque item, ses `k` voisins les plus
+    proches (cosinus entre colonnes de la matrice creuse utilisateurs x items
+    construite depuis `UserInteraction`).
+
+    - `neighbours` : matrice creuse items x items, au plus `k` valeurs par ligne
+    - `item_ids` : UUID (16 octets) triés, alignés sur les lignes de `neighbours`
+    - `version` : version sur disque chargée ou sauvegardée (None si aucune)
+    """
+
+    DIRECTORY = "collaborative"
+    MATRIX_FILE = "neighbours.npz"
+    IDS_FILE = "item_ids.npy"
+    STATE_FILE = "state.json"
+    BLOCK_SIZE = 1024
+
+    def __init__(self, neighbours, item_ids, built_at=None):
+        self.neighbours = sparse.csr_matrix(neighbours, dtype=np.float32)
+        self.item_ids = np.asarray(item_ids, dtype="S16")
+        self.built_at = built_at or datetime.now(timezone.utc).isoformat()
+        self.version = None
+
+    def __len__(self):
+        return len(self.item_ids)
+
+    @classmethod
+    def build(cls, k=None):
+        from catalog.models import UserInteraction
+
+        k = k or settings.RECOMMENDER_CF_NEIGHBOURS
+        users, items, weights = [], [], []
+        interactions = UserInteraction.objects.values_list(
+            "user_id", "item_id", "interaction_type", "rating"
+        ).iterator(chunk_size=10000)
+        for user_id, item_id, interaction_type, rating in interactions:
+            weight = interaction_weight(interaction_type, rating)
+            if weight > 0:
+                users.append(user_id)
+                items.append(item_id)
+                weights.append(weight)
+
+        if not weights:
+            return cls(sparse.csr_matrix((0, 0)), np.empty(0, dtype="S16"))
+
+        item_ids, item_codes = np.unique(uuid_array(items), return_inverse=True)
+        _, user_codes = np.unique(uuid_array(users), return_inverse=True)
+        # Les doublons (like + bookmark sur un même item) sont additionnés
+        ratings = sparse.csr_matrix(
+            (np.asarray(weights, dtype=np.float32), (user_codes, item_codes)),
+            shape=(user_codes.max() + 1, len(item_ids)),
+        )
+        columns = normalize(ratings.tocsc(), axis=0)
+        by_item = columns.T.tocsr()
+
+        # Similarités calculées par blocs d'items, seuls les k meilleurs voisins sont gardés
+        indptr, indices, data = [0], [], []
+        for start in range(0, len(item_ids), cls.BLOCK_SIZE):
+            block = (by_item[start:start + cls.BLOCK_SIZE] @ columns).tocsr()
+            for offset in range(block.shape[0]):
+                row_start, row_end = block.indptr[offset], block.indptr[offset + 1]
+                cols, values = block.indices[row_start:row_end], block.data[row_start:row_end]
+                mask = cols != start + offset
+                cols, values = cols[mask], values[mask]
+                best = top_k(values, k)
+                indices.append(cols[best])
+                data.append(values[best])
+                indptr.append(indptr[-1] + len(best))
+
+        neighbours = sparse.csr_matrix(
+            (np.concatenate(data), np.concatenate(indices), np.array(indptr)),
+            shape=(len(item_ids), len(item_ids)),
+        )
+        return cls(neighbours, item_ids)
+
+    # ────────────────────────────────────────────────────────
+    # Requêtes
+    # ────────────────────────────────────────────────────────
+    def row_of(self, item_ids):
+        keys = uuid_array(item_ids)
+        rows = np.full(len(keys), -1, dtype=np.int64)
+        if len(keys) and len(self.item_ids):
+            positions = np.minimum(np.searchsorted(self.item_ids, keys), len(self.item_ids) - 1)
+            found = self.item_ids[positions] == keys
+            rows[found] = positions[found]
+        return rows
+
+    def scores(self, item_ids, weights):
+        """
+        Scores (vecteur creux 1 x items) d'un utilisateur : somme pondérée des
+        listes de voisins de ses quelques items, sans parcourir le catalogue.
+        """
+        rows = self.row_of(item_ids)
+        known = rows >= 0
+        selector = sparse.csr_matrix(
+            (np.asarray(weights, dtype=np.float32)[known], (np.zeros(known.sum(), dtype=np.int64), rows[known])),
+            shape=(1, len(self.item_ids)),
+        )
+        return (selector @ self.neighbours).tocsr()
+
+    def score_of(self, scores, item_ids):
+        """
+        Valeur de `scores` pour chaque item de `item_ids` (0 si absent).
+        """
+        rows = self.row_of(item_ids)
+        values = np.zeros(len(rows), dtype=np.float32)
+        known = rows >= 0
+        if known.any():
+            values[known] = scores[0, rows[known]].toarray().ravel()
+        return values
+
+    def top(self, scores, k, exclude_ids=()):
+        """
+        (ids, scores) des `k` meilleurs items d'un vecteur de scores creux.
+        """
+        cols, values = scores.indices, scores.data
+        excluded = self.row_of(exclude_ids)
+        mask = ~np.isin(cols, excluded[excluded >= 0]) & (values > 0)
+        cols, values = cols[mask], values[mask]
+        best = top_k(values, k)
+        return [to_uuid(raw) for raw in self.item_ids[cols[best]].tolist()], values[best]
+
+    # ────────────────────────────────────────────────────────
+    # Persistance
+    # ────────────────────────────────────────────────────────
+    @classmethod
+    def root(cls, directory=None):
+        return Path(directory or index_dir()) / cls.DIRECTORY
+
+    def save(self, directory=None):
+        """
+        Écrit les voisins dans une nouvelle version et la publie (même schéma
+        que l'index des items : pointeur `CURRENT` remplacé atomiquement).
+        """
+        root = self.root(directory)
+        root.mkdir(parents=True, exist_ok=True)
+        path = new_version_dir(root)
+        sparse.save_npz(path / self.MATRIX_FILE, self.neighbours)
+        np.save(path / self.IDS_FILE, self.item_ids)
+        (path / self.STATE_FILE).write_text(json.dumps({"built_at": self.built_at}))
+        publish_version(root, path)
+        self.version = path.name
+
+    @classmethod
+    def load(cls, directory=None):
+        path = version_dir(cls.root(directory))
+        state = json.loads((path / cls.STATE_FILE).read_text())
+        index = cls(sparse.load_npz(path / cls.MATRIX_FILE), np.load(path / cls.IDS_FILE), built_at=state["built_at"])
+        index.version = path.name
+        return index
+
+    @classmethod
+    def stored_version(cls, directory=None):
+        return current_version(cls.root(directory))
+
+    @classmethod
+    def stored_built_at(cls, directory=None):
+        """
+        Date de construction des voisins sur disque (None s'ils n'existent pas).
+        """
+        try:
+            path = version_dir(cls.root(directory))
+            return datetime.fromisoformat(json.loads((path / cls.STATE_FILE).read_text())["built_at"])
+        except FileNotFoundError:
+            return None
+
+
+def is_stale(directory=None):
+    """
+    Vrai si les voisins sur disque ont plus de RECOMMENDER_CF_MAX_AGE : les
+    interactions ont changé depuis, `build_recommendation_index` les reconstruit.
+    """
+    built_at = CollaborativeIndex.stored_built_at(directory)
+    return built_at is not None and datetime.now(timezone.utc) - built_at > settings.RECOMMENDER_CF_MAX_AGE
+
+
+# ────────────────────────────────────────────────────────
+# Index chargé une seule fois par processus
+# ────────────────────────────────────────────────────────
+_cf_index = None
+_cf_lock = threading.Lock()
+_cf_checked = 0.0
+
+
+def get_collaborative_index():
+    """
+    Retourne l'index collaboratif du processus, rechargé quand une nouvelle
+    version est publiée (vérifié toutes les RECOMMENDER_SYNC_INTERVAL secondes).
+    Il n'est jamais construit ici : tant que `build_recommendation_index
+    --collaborative` n'a pas été lancé, un index vide est servi.
+    """
+    global _cf_index, _cf_checked
+    if _cf_index is not None and time.monotonic() - _cf_checked < settings.RECOMMENDER_SYNC_INTERVAL:
+        return _cf_index
+
+    with _cf_lock:
+        version = CollaborativeIndex.stored_version()
+        if _cf_index is None or (version is not None and version != _cf_index.version):
+            try:
+                _cf_index = CollaborativeIndex.load()
+            except FileNotFoundError:
+                logger.warning("No collaborative index, run build_recommendation_index --collaborative")
+                _cf_index = CollaborativeIndex(sparse.csr_matrix((0, 0)), np.empty(0, dtype="S16"))
+        _cf_checked = time.monotonic()
+    return _cf_index
+
+
+def reset_collaborative_index():
+    global _cf_index, _cf_checked
+    with _cf_lock:
+        _cf_index = None
+        _cf_checked = 0.0
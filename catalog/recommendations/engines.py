@@ -0,0 +1,54 @@
+from django.conf import settings
+
+
+class SimilarityEngine:
+    """
+    Stratégie de recherche des items les plus proches d'un profil utilisateur.
+    """
+    name = None
+
+    def search(self, index, vector, k, exclude_rows=(), **params):
+        raise NotImplementedError
+
+
+class ExactEngine(SimilarityEngine):
+    """
+    Parcours complet de la matrice TF-IDF (référence pour valider l'approché).
+    """
+    name = "exact"
+
+    def search(self, index, vector, k, exclude_rows=(), **params):
+        similarities = index.similarities(vector)
+        return index.rows_to_ids(index.top_rows(similarities, k, exclude_rows))
+
+
+class IVFEngine(SimilarityEngine):
+    """
+    Recherche approchée dans les listes inversées de `index.ann`.
+    Paramètres par requête : `nprobe` (rappel / latence) et `rerank`.
+    Sans structure approchée (petit catalogue), bascule sur le parcours exact.
+    """
+    name = "ivf"
+
+    def search(self, index, vector, k, exclude_rows=(), nprobe=None, rerank=None, **params):
+        if index.ann is None:
+            return ExactEngine().search(index, vector, k, exclude_rows)
+        rows = index.ann.search(
+            vector, k,
+            nprobe=nprobe or settings.RECOMMENDER_ANN_NPROBE,
+            alive=index.alive,
+            exclude_rows=exclude_rows,
+            matrix=index.matrix,
+            rerank=settings.RECOMMENDER_ANN_RERANK if rerank is None else rerank,
+        )
+        return index.rows_to_ids(rows)
+
+
+ENGINES = {engine.name: engine for engine in (ExactEngine(), IVFEngine())}
+
+
+def get_engine(name=None):
+    """
+    Moteur par nom (KeyError si inconnu), RECOMMENDER_ENGINE par défaut.
+    """
+    return ENGINES[name or settings.RECOMMENDER_ENGINE]
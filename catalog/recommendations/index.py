@@ -0,0 +1,473 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+from itertools import chain
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
+from sklearn.preprocessing import normalize
+
+from catalog.recommendations.ann import IVFIndex
+from catalog.recommendations.ranking import to_uuid, top_k, uuid_array
+
+logger = logging.getLogger(__name__)
+
+
+def item_document(item):
+    """
+    Texte utilisé pour vectoriser un item (titre, description, tags, catégorie, créateurs).
+    Les relations `category`, `authors`, `contributors` et `producers` doivent être
+    préchargées par l'appelant (voir `indexable_items`).
+    """
+    tags_text = " ".join(item.tags or [])
+    category_name = item.category.name if item.category else ""
+    creators = " ".join(
+        person.name for person in chain(item.authors.all(), item.contributors.all(), item.producers.all())
+    )
+    return f"{item.title} {item.description} {tags_text} {category_name} {creators}"
+
+
+def indexable_items(item_ids=None):
+    """
+    Queryset des items à vectoriser, avec les relations utilisées par `item_document`.
+    """
+    from catalog.models import Item
+
+    queryset = (
+        Item.objects.select_related("category")
+        .only("id", "title", "description", "tags", "category__name")
+        .prefetch_related("authors", "contributors", "producers")
+        .order_by("id")
+    )
+    if item_ids is not None:
+        queryset = queryset.filter(id__in=item_ids)
+    return queryset
+
+
+def index_dir():
+    return Path(settings.RECOMMENDER_INDEX_DIR)
+
+
+# ────────────────────────────────────────────────────────
+# Versions sur disque
+# ────────────────────────────────────────────────────────
+# Chaque sauvegarde écrit un répertoire `versions/<version>` complet, puis
+# remplace le fichier pointeur `CURRENT` (`os.replace`, atomique) : un lecteur
+# charge toujours les fichiers d'une seule et même version.
+CURRENT_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+# Versions gardées : un processus peut encore être en train de lire la précédente
+KEEP_VERSIONS = 3
+
+
+def current_version(root):
+    """
+    Version pointée par `CURRENT` dans `root` (None si aucune sauvegarde).
+    """
+    try:
+        return (Path(root) / CURRENT_FILE).read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def version_dir(root, version=None):
+    """
+    Répertoire de `version`, par défaut la version courante.
+    """
+    version = version or current_version(root)
+    if version is None:
+        raise FileNotFoundError(f"No index version in {root}")
+    return Path(root) / VERSIONS_DIR / version
+
+
+def new_version_dir(root):
+    # Horodatage en tête : l'ordre alphabétique est l'ordre de création
+    version = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S%f}-{os.getpid()}"
+    path = Path(root) / VERSIONS_DIR / version
+    path.mkdir(parents=True)
+    return path
+
+
+def publish_version(root, path):
+    """
+    Fait pointer `CURRENT` sur le répertoire `path`, complètement écrit, puis
+    supprime les versions plus anciennes que les KEEP_VERSIONS dernières.
+    """
+    root = Path(root)
+    tmp = root / f"{CURRENT_FILE}.{path.name}.tmp"
+    tmp.write_text(path.name)
+    os.replace(tmp, root / CURRENT_FILE)
+    versions = sorted(entry for entry in (root / VERSIONS_DIR).iterdir() if entry.is_dir())
+    for old in versions[:-KEEP_VERSIONS]:
+        if old.name != path.name:
+            shutil.rmtree(old, ignore_errors=True)
+
+
+class ItemIndex:
+    """
+    Index TF-IDF persistant des items.
+
+    - `matrix` : matrice creuse (CSR) items x vocabulaire, lignes normalisées L2
+    - `vocabulary` / `idf` : vocabulaire figé lors du fit, réutilisé pour vectoriser
+    - `item_ids` : tableau NumPy des UUID (16 octets) portés par chaque ligne
+    - `alive` : lignes encore valides (les lignes des items modifiés/supprimés
+      sont invalidées puis compactées à la sauvegarde)
+    - `watermark` : `ItemIndexChange` appliqués jusqu'à cet id (inclus), et
+      `recent_changes` : ids postérieurs déjà appliqués (fenêtre de relecture)
+    - `version` : version sur disque chargée ou sauvegardée (None si aucune)
+    """
+
+    MATRIX_FILE = "matrix.npz"
+    META_FILE = "vocabulary.json"
+    IDS_FILE = "item_ids.npy"
+    STATE_FILE = "state.json"
+
+    STOP_WORDS = "english"
+    MAX_FEATURES = 5000
+
+    def __init__(self, matrix, vocabulary, idf, item_ids, built_at=None, watermark=0, oov_rate=0.0,
+                 drift_tokens=0, drift_oov_tokens=0, recent_changes=()):
+        self.matrix = sparse.csr_matrix(matrix, dtype=np.float32)
+        self.vocabulary = vocabulary
+        self.idf = np.asarray(idf, dtype=np.float32)
+        self.item_ids = item_ids.astype("S16") if isinstance(item_ids, np.ndarray) else uuid_array(item_ids)
+        self.alive = np.ones(len(self.item_ids), dtype=bool)
+        self.built_at = built_at or datetime.now(timezone.utc).isoformat()
+        self.watermark = watermark
+        self.recent_changes = set(recent_changes)
+        self.version = None
+        # Part des tokens hors vocabulaire au moment du fit, et compteurs
+        # cumulés sur les documents modifiés depuis (dérive du vocabulaire)
+        self.oov_rate = oov_rate
+        self.drift_tokens = drift_tokens
+        self.drift_oov_tokens = drift_oov_tokens
+        self._index_rows()
+        # Structure approchée optionnelle (voir `catalog.recommendations.ann`)
+        self.ann = None
+
+    def __len__(self):
+        return int(self.alive.sum())
+
+    def _index_rows(self):
+        """
+        Correspondance compacte pk -> ligne : ids triés + lignes associées
+        (recherche dichotomique), plus un dict pour les lignes ajoutées depuis.
+        """
+        order = np.argsort(self.item_ids, kind="stable")
+        self._sorted_ids = self.item_ids[order]
+        self._sorted_rows = order.astype(np.int64)
+        self._recent = {}
+
+    # ────────────────────────────────────────────────────────
+    # Construction
+    # ────────────────────────────────────────────────────────
+    @classmethod
+    def build(cls, items=None, watermark=0):
+        """
+        Fit complet du vocabulaire sur tout le catalogue.
+        """
+        if items is None:
+            items = indexable_items().iterator(chunk_size=2000)
+
+        item_ids, corpus = [], []
+        for item in items:
+            item_ids.append(item.pk)
+            corpus.append(item_document(item))
+
+        if not corpus:
+            return cls(sparse.csr_matrix((0, 0)), {}, [], [], watermark=watermark)
+
+        try:
+            counter = CountVectorizer(stop_words=cls.STOP_WORDS)
+            counts = counter.fit_transform(corpus)
+        except ValueError:
+            # Corpus sans aucun terme utile (uniquement des stop words)
+            return cls(sparse.csr_matrix((len(corpus), 0)), {}, [], item_ids, watermark=watermark)
+
+        # Garde les MAX_FEATURES termes les plus fréquents (comme `max_features`)
+        term_freq = np.asarray(counts.sum(axis=0)).ravel()
+        keep = np.sort(np.argsort(-term_freq, kind="stable")[:cls.MAX_FEATURES])
+        terms = counter.get_feature_names_out()[keep]
+        counts = counts[:, keep]
+
+        transformer = TfidfTransformer()
+        matrix = transformer.fit_transform(counts)
+
+        vocabulary = {str(term): col for col, term in enumerate(terms)}
+        oov_rate = 1.0 - counts.sum() / max(term_freq.sum(), 1)
+        return cls(matrix, vocabulary, transformer.idf_, item_ids, watermark=watermark, oov_rate=float(oov_rate))
+
+    def build_ann(self):
+        """
+        Construit la structure approchée si le catalogue est assez grand pour qu'elle
+        soit utile (RECOMMENDER_ANN_MIN_ITEMS), sinon le parcours exact suffit.
+        """
+        self.compact()
+        if len(self) < max(settings.RECOMMENDER_ANN_MIN_ITEMS, 2) or len(self.vocabulary) < 2:
+            self.ann = None
+        else:
+            self.ann = IVFIndex.build(self.matrix, dim=settings.RECOMMENDER_ANN_DIM)
+
+    def transform(self, documents):
+        """
+        Vectorise des documents avec le vocabulaire figé (sans refit).
+        """
+        if not self.vocabulary:
+            return sparse.csr_matrix((len(documents), 0), dtype=np.float32)
+        counts = CountVectorizer(stop_words=self.STOP_WORDS, vocabulary=self.vocabulary).transform(documents)
+        tfidf = counts.astype(np.float32) @ sparse.diags(self.idf)
+        return normalize(tfidf, norm="l2", copy=False).tocsr()
+
+    # ────────────────────────────────────────────────────────
+    # Mise à jour incrémentale
+    # ────────────────────────────────────────────────────────
+    def apply(self, items, deleted_ids=()):
+        """
+        Met à jour les lignes des items modifiés (`items`, relations préchargées)
+        et supprimés (`deleted_ids`). Coût proportionnel au nombre d'items touchés :
+        les anciennes lignes sont invalidées, les nouvelles ajoutées en fin de matrice.
+        """
+        items = list(items)
+        for key in uuid_array(chain((item.pk for item in items), deleted_ids)).tolist():
+            self._discard(key)
+
+        if not items:
+            return
+
+        documents = [item_document(item) for item in items]
+        self._track_drift(documents)
+
+        start = self.matrix.shape[0]
+        new_rows = self.transform(documents)
+        if self.matrix.shape[1] != new_rows.shape[1]:
+            self.matrix = sparse.csr_matrix((start, new_rows.shape[1]), dtype=np.float32)
+        self.matrix = sparse.vstack([self.matrix, new_rows], format="csr", dtype=np.float32)
+        if self.ann is not None:
+            self.ann.add(new_rows)
+        self.alive = np.concatenate([self.alive, np.ones(len(items), dtype=bool)])
+        keys = uuid_array(item.pk for item in items)
+        self.item_ids = np.concatenate([self.item_ids, keys])
+        for offset, key in enumerate(keys.tolist()):
+            self._recent[key] = start + offset
+
+    def _discard(self, key):
+        row = self._lookup(np.array([key], dtype="S16"))[0]
+        self._recent.pop(key, None)
+        if row < 0:
+            return
+        self.alive[row] = False
+        start, end = self.matrix.indptr[row], self.matrix.indptr[row + 1]
+        self.matrix.data[start:end] = 0
+
+    def _track_drift(self, documents):
+        analyzer = CountVectorizer(stop_words=self.STOP_WORDS).build_analyzer()
+        for document in documents:
+            tokens = analyzer(document)
+            self.drift_tokens += len(tokens)
+            self.drift_oov_tokens += sum(1 for token in tokens if token not in self.vocabulary)
+
+    def drift(self):
+        """
+        Hausse de la part de tokens hors vocabulaire dans les documents modifiés
+        depuis le dernier fit, par rapport à celle mesurée lors du fit.
+        """
+        if not self.vocabulary:
+            # Index construit sur un catalogue vide : tout nouveau document impose un fit
+            return 1.0 if self.drift_tokens else 0.0
+        if self.drift_tokens < settings.RECOMMENDER_DRIFT_MIN_TOKENS:
+            return 0.0
+        return max(0.0, self.drift_oov_tokens / self.drift_tokens - self.oov_rate)
+
+    def compact(self):
+        """
+        Retire physiquement les lignes invalidées.
+        """
+        if self.alive.all():
+            return
+        keep = np.flatnonzero(self.alive)
+        self.matrix = self.matrix[keep]
+        if self.ann is not None:
+            self.ann.compact(keep)
+        self.item_ids = self.item_ids[keep]
+        self.alive = np.ones(len(self.item_ids), dtype=bool)
+        self._index_rows()
+
+    # ────────────────────────────────────────────────────────
+    # Requêtes
+    # ────────────────────────────────────────────────────────
+    def rows_for(self, item_ids):
+        """
+        Lignes (tableau trié, sans doublon) des items encore présents dans l'index.
+        """
+        rows = self.row_of(item_ids)
+        return np.unique(rows[rows >= 0])
+
+    def row_of(self, item_ids):
+        """
+        Ligne de chaque item, alignée sur `item_ids` (-1 si absent de l'index).
+        """
+        return self._lookup(uuid_array(item_ids))
+
+    def _lookup(self, keys):
+        rows = np.full(len(keys), -1, dtype=np.int64)
+        if len(keys) and len(self._sorted_ids):
+            positions = np.minimum(np.searchsorted(self._sorted_ids, keys), len(self._sorted_ids) - 1)
+            found = self._sorted_ids[positions] == keys
+            rows[found] = self._sorted_rows[positions[found]]
+            rows[(rows >= 0) & ~self.alive[rows]] = -1
+        if self._recent:
+            for position, key in enumerate(keys.tolist()):
+                if key in self._recent:
+                    rows[position] = self._recent[key]
+        return rows
+
+    def profile(self, rows):
+        """
+        Vecteur moyen (dense) représentant les préférences d'un utilisateur.
+        """
+        return np.asarray(self.matrix[rows].mean(axis=0), dtype=np.float32).ravel()
+
+    def similarities(self, vector):
+        """
+        Produit scalaire creux entre un profil et tous les items.
+        Les lignes étant normalisées, l'ordre est celui de la similarité cosinus.
+        """
+        return self.matrix @ vector
+
+    def top_rows(self, similarities, k, exclude_rows=()):
+        """
+        Lignes des `k` items les plus similaires, hors lignes invalidées et `exclude_rows`
+        (masquées à -inf plutôt que filtrées une à une).
+        """
+        scores = np.where(self.alive, similarities, -np.inf)
+        scores[np.asarray(exclude_rows, dtype=np.int64)] = -np.inf
+        top = top_k(scores, k)
+        return top[np.isfinite(scores[top])]
+
+    def rows_to_ids(self, rows):
+        return [to_uuid(raw) for raw in self.item_ids[rows].tolist()]
+
+    # ────────────────────────────────────────────────────────
+    # Persistance
+    # ────────────────────────────────────────────────────────
+    def save(self, directory=None):
+        """
+        Écrit l'index dans une nouvelle version de `directory` et la publie.
+        """
+        self.compact()
+        root = Path(directory or index_dir())
+        root.mkdir(parents=True, exist_ok=True)
+        path = new_version_dir(root)
+
+        sparse.save_npz(path / self.MATRIX_FILE, self.matrix)
+        np.save(path / self.IDS_FILE, self.item_ids)
+        (path / self.META_FILE).write_text(json.dumps({
+            "built_at": self.built_at,
+            "watermark": self.watermark,
+            "recent_changes": sorted(self.recent_changes),
+            "oov_rate": self.oov_rate,
+            "drift_tokens": self.drift_tokens,
+            "drift_oov_tokens": self.drift_oov_tokens,
+            "vocabulary": self.vocabulary,
+            "idf": self.idf.tolist(),
+        }))
+        (path / self.STATE_FILE).write_text(json.dumps({"built_at": self.built_at, "watermark": self.watermark}))
+        if self.ann is not None:
+            self.ann.save(path)
+        publish_version(root, path)
+        self.version = path.name
+
+    @classmethod
+    def load(cls, directory=None, version=None):
+        """
+        Charge `version` (par défaut la version courante) ; FileNotFoundError si
+        l'index n'a jamais été sauvegardé.
+        """
+        path = version_dir(directory or index_dir(), version)
+        meta = json.loads((path / cls.META_FILE).read_text())
+        matrix = sparse.load_npz(path / cls.MATRIX_FILE)
+        index = cls(
+            matrix, meta["vocabulary"], meta["idf"], np.load(path / cls.IDS_FILE),
+            built_at=meta["built_at"],
+            watermark=meta.get("watermark", 0),
+            oov_rate=meta.get("oov_rate", 0.0),
+            drift_tokens=meta.get("drift_tokens", 0),
+            drift_oov_tokens=meta.get("drift_oov_tokens", 0),
+            recent_changes=meta.get("recent_changes", ()),
+        )
+        index.version = path.name
+        try:
+            ann = IVFIndex.load(path)
+        except FileNotFoundError:
+            ann = None
+        if ann is not None and len(ann) == matrix.shape[0]:
+            index.ann = ann
+        return index
+
+    @classmethod
+    def stored_version(cls, directory=None):
+        return current_version(directory or index_dir())
+
+    @classmethod
+    def stored_watermark(cls, directory=None):
+        """
+        Watermark de l'index sur disque, sans charger la matrice (None si absent).
+        """
+        try:
+            path = version_dir(directory or index_dir())
+            return json.loads((path / cls.STATE_FILE).read_text())["watermark"]
+        except FileNotFoundError:
+            return None
+
+
+# ────────────────────────────────────────────────────────
+# Index chargé une seule fois par processus
+# ────────────────────────────────────────────────────────
+_index = None
+_index_lock = threading.Lock()
+_last_sync = 0.0
+
+
+def get_index():
+    """
+    Retourne l'index du processus, chargé depuis le disque au premier appel et
+    rechargé quand une nouvelle version y est publiée. L'index n'est jamais
+    construit ici : tant que `build_recommendation_index` n'a pas été lancé,
+    un index vide est servi.
+
+    Toutes les RECOMMENDER_SYNC_INTERVAL secondes, les modifications du catalogue
+    (journal `ItemIndexChange`) sont appliquées par micro-lots.
+    """
+    global _index, _last_sync
+    from catalog.recommendations.sync import sync_index
+
+    if _index is not None and time.monotonic() - _last_sync < settings.RECOMMENDER_SYNC_INTERVAL:
+        return _index
+
+    with _index_lock:
+        version = ItemIndex.stored_version()
+        if _index is None or (version is not None and version != _index.version):
+            # Nouvelle version publiée par la commande (ou un autre processus)
+            try:
+                _index = ItemIndex.load()
+            except FileNotFoundError:
+                logger.warning("No recommendation index in %s, run build_recommendation_index", index_dir())
+                _index = ItemIndex.build(items=[])
+        if _index.version is not None:
+            _index = sync_index(_index)
+        _last_sync = time.monotonic()
+    return _index
+
+
+def reset_index():
+    global _index, _last_sync
+    with _index_lock:
+        _index = None
+        _last_sync = 0.0
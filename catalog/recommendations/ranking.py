@@ -0,0 +1,30 @@
+import uuid
+
+import numpy as np
+
+
+def top_k(scores, k):
+    """
+    Positions des `k` meilleurs scores, triées par score décroissant.
+    `argpartition` puis tri des seuls `k` retenus : O(n + k log k).
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+def uuid_array(pks):
+    """
+    Tableau NumPy compact (16 octets par id) à partir d'UUID ou de leur forme texte.
+    """
+    return np.array(
+        [pk.bytes if isinstance(pk, uuid.UUID) else uuid.UUID(str(pk)).bytes for pk in pks],
+        dtype="S16",
+    )
+
+
+def to_uuid(raw):
+    # NumPy retire les octets nuls de fin des chaînes "S16"
+    return uuid.UUID(bytes=raw.ljust(16, b"\0"))
@@ -0,0 +1,77 @@
+import numpy as np
+from django.conf import settings
+
+from catalog.recommendations.collaborative import get_collaborative_index, interaction_weight
+from catalog.recommendations.index import get_index
+from catalog.recommendations.ranking import top_k
+
+CONTENT = "content"
+COLLABORATIVE = "cf"
+HYBRID = "hybrid"
+STRATEGIES = (CONTENT, COLLABORATIVE, HYBRID)
+
+
+def recommend(strategy, interactions, k, engine, nprobe=None, rerank=None):
+    """
+    Ids (UUID, classés) des `k` items recommandés à partir des interactions
+    d'un utilisateur, liste de (item_id, interaction_type, rating).
+    """
+    if strategy == CONTENT:
+        return _content(interactions, k, engine, nprobe, rerank)
+    if strategy == COLLABORATIVE:
+        return _collaborative(interactions, k)[0]
+    return _hybrid(interactions, k, engine, nprobe, rerank)
+
+
+def _liked_ids(interactions):
+    return [item_id for item_id, interaction_type, _ in interactions if interaction_type in ("like", "bookmark")]
+
+
+def _content(interactions, k, engine, nprobe, rerank):
+    # Vecteur moyen des items likés ou favoris, puis recherche des plus proches
+    # en excluant ces mêmes items
+    index = get_index()
+    rows = index.rows_for(_liked_ids(interactions))
+    if not len(rows):
+        return []
+    return engine.search(index, index.profile(rows), k, exclude_rows=rows, nprobe=nprobe, rerank=rerank)
+
+
+def _collaborative(interactions, k):
+    cf_index = get_collaborative_index()
+    item_ids = [item_id for item_id, _, _ in interactions]
+    weights = [interaction_weight(interaction_type, rating) for _, interaction_type, rating in interactions]
+    scores = cf_index.scores(item_ids, weights)
+    ids, _ = cf_index.top(scores, k, exclude_ids=item_ids)
+    return ids, scores
+
+
+def _hybrid(interactions, k, engine, nprobe, rerank):
+    """
+    Mélange des deux stratégies : chacune propose un lot de candidats, tous
+    sont notés par les deux (scores ramenés à [0, 1]) puis combinés avec
+    RECOMMENDER_HYBRID_ALPHA (poids du contenu).
+    """
+    pool = k * settings.RECOMMENDER_HYBRID_POOL
+    cf_ids, cf_scores = _collaborative(interactions, pool)
+    candidates = list(dict.fromkeys(_content(interactions, pool, engine, nprobe, rerank) + cf_ids))
+    if not candidates:
+        return []
+
+    index = get_index()
+    liked_rows = index.rows_for(_liked_ids(interactions))
+    content = np.zeros(len(candidates), dtype=np.float32)
+    if len(liked_rows):
+        rows = index.row_of(candidates)
+        known = rows >= 0
+        content[known] = index.matrix[rows[known]] @ index.profile(liked_rows)
+    collaborative = get_collaborative_index().score_of(cf_scores, candidates)
+
+    alpha = settings.RECOMMENDER_HYBRID_ALPHA
+    blended = alpha * _rescale(content) + (1 - alpha) * _rescale(collaborative)
+    return [candidates[position] for position in top_k(blended, k)]
+
+
+def _rescale(scores):
+    peak = scores.max() if len(scores) else 0
+    return scores / peak if peak > 0 else scores
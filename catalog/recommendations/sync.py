@@ -0,0 +1,146 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+
+from catalog.models import ItemIndexChange
+from catalog.recommendations.cache import bump_version
+from catalog.recommendations.index import ItemIndex, indexable_items
+
+logger = logging.getLogger(__name__)
+
+
+def record_item_changes(item_ids, action=ItemIndexChange.Action.UPSERT):
+    """
+    Ajoute des items au journal de l'index. À appeler explicitement pour les
+    écritures qui ne déclenchent pas de signaux (`bulk_create`, `update()`...).
+    """
+    ItemIndexChange.objects.bulk_create(
+        [ItemIndexChange(item_id=pk, action=action) for pk in item_ids]
+    )
+
+
+def _horizon():
+    return timezone.now() - timedelta(seconds=settings.RECOMMENDER_SYNC_LOOKBACK)
+
+
+def pending_changes(index):
+    """
+    Lots (ids modifiés, ids supprimés) du journal pas encore appliqués à `index`
+    (qui porte `watermark` et `recent_changes`), par RECOMMENDER_SYNC_BATCH_SIZE
+    changements ; pour un même item, seul le dernier changement du lot compte.
+
+    Les ids du journal ne sont pas validés dans l'ordre : une transaction plus
+    longue peut valider un id inférieur à ceux déjà lus. Le watermark n'avance
+    donc que sur les changements plus anciens que RECOMMENDER_SYNC_LOOKBACK ;
+    les plus récents sont relus à chaque synchronisation (ceux déjà appliqués,
+    gardés dans `recent_changes`, sont ignorés).
+    """
+    batch_size = settings.RECOMMENDER_SYNC_BATCH_SIZE
+    horizon = _horizon()
+    cursor, settled = index.watermark, True
+    while True:
+        changes = list(
+            ItemIndexChange.objects.filter(id__gt=cursor)
+            .order_by("id")
+            .values_list("id", "item_id", "action", "created_at")[:batch_size]
+        )
+        if not changes:
+            return
+        cursor = changes[-1][0]
+
+        latest = {
+            item_id: action for change_id, item_id, action, _ in changes if change_id not in index.recent_changes
+        }
+        if latest:
+            yield (
+                [pk for pk, action in latest.items() if action == ItemIndexChange.Action.UPSERT],
+                [pk for pk, action in latest.items() if action == ItemIndexChange.Action.DELETE],
+            )
+
+        for change_id, _, _, created_at in changes:
+            if settled and created_at <= horizon:
+                index.watermark = change_id
+            else:
+                settled = False
+                index.recent_changes.add(change_id)
+        index.recent_changes = {change_id for change_id in index.recent_changes if change_id > index.watermark}
+
+
+def settled_watermark():
+    """
+    Watermark d'un index construit maintenant : dernier changement plus ancien
+    que la fenêtre de relecture (les suivants seront réappliqués).
+    """
+    return ItemIndexChange.objects.filter(created_at__lte=_horizon()).aggregate(last=Max("id"))["last"] or 0
+
+
+def purge_changes():
+    """
+    Supprime les changements du journal couverts par tous les index sur disque
+    qui le consomment (recommandations et index inversé de la recherche).
+    """
+    from catalog.search.inverted import InvertedIndex
+
+    watermarks = [ItemIndex.stored_watermark(), InvertedIndex.stored_watermark()]
+    watermarks = [watermark for watermark in watermarks if watermark is not None]
+    if watermarks:
+        ItemIndexChange.objects.filter(id__lte=min(watermarks)).delete()
+
+
+def needs_refit(index):
+    return index.drift() > settings.RECOMMENDER_DRIFT_THRESHOLD
+
+
+def sync_index(index):
+    """
+    Applique au `index` les changements du journal qu'il n'a pas encore vus, par
+    micro-lots. Jamais de refit ici : au-delà de RECOMMENDER_DRIFT_THRESHOLD, le
+    refit est laissé à `build_recommendation_index --sync` (voir `persist_changes`).
+    """
+    for upserted, deleted in pending_changes(index):
+        # Un item supprimé entre-temps n'est simplement plus renvoyé
+        items = list(indexable_items(upserted))
+        found = {item.pk for item in items}
+        index.apply(items, deleted + [pk for pk in upserted if pk not in found])
+
+    if needs_refit(index):
+        logger.info(
+            "Vocabulary drift %.3f above threshold, run build_recommendation_index --sync to refit", index.drift()
+        )
+    return index
+
+
+def full_rebuild():
+    """
+    Refit complet, sauvegardé sur disque, puis purge du journal déjà couvert
+    (par cet index et par l'index inversé de la recherche).
+    Les changements de la fenêtre de relecture restent au-dessus du watermark :
+    ils seront réappliqués par la prochaine synchronisation.
+    """
+    index = ItemIndex.build(watermark=settled_watermark())
+    index.build_ann()
+    index.save()
+    purge_changes()
+    bump_version()
+    return index
+
+
+def persist_changes():
+    """
+    Applique le journal à l'index sur disque puis le sauvegarde (commande `--sync`),
+    ou le reconstruit entièrement si la dérive du vocabulaire dépasse le seuil.
+    """
+    try:
+        index = ItemIndex.load()
+    except FileNotFoundError:
+        return full_rebuild()
+
+    index = sync_index(index)
+    if needs_refit(index):
+        return full_rebuild()
+    index.save()
+    purge_changes()
+    return index
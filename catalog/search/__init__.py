@@ -0,0 +1,69 @@
+import threading
+
+from django.db import transaction
+
+from catalog.search.backends import active_backends, available_backends, get_search_backend, search_document
+
+__all__ = [
+    "available_backends", "delete_search_documents", "get_search_backend", "search_document",
+    "update_search_documents",
+]
+
+# Items dont le document est à réécrire ou à supprimer, par thread (donc par
+# connexion), vidés par `_write_pending` à la validation de la transaction
+_pending = threading.local()
+
+
+def _pending_ids():
+    if not hasattr(_pending, "item_ids"):
+        _pending.item_ids = set()
+    return _pending.item_ids
+
+
+def _write_pending():
+    """
+    Écrit en une passe les documents de tous les items en attente : réécrits
+    depuis la base s'ils existent encore, supprimés sinon. Relu à la validation,
+    l'état est celui qui a été validé, même après un rollback partiel
+    (savepoint) ou la suppression d'un item annulée.
+    """
+    from catalog.models import Item
+
+    item_ids = _pending_ids()
+    if not item_ids:
+        return
+    pending = sorted(item_ids, key=str)
+    item_ids.clear()
+    existing = set(Item.objects.filter(pk__in=pending).values_list("pk", flat=True))
+    deleted = [pk for pk in pending if pk not in existing]
+    for backend in active_backends():
+        backend.update([pk for pk in pending if pk in existing])
+        if deleted:
+            backend.delete(deleted)
+
+
+def update_search_documents(item_ids):
+    """
+    Réécrit les documents de ces items une fois la transaction validée, en une
+    seule passe pour toutes les écritures de la transaction (un import, le
+    renommage d'une catégorie...) plutôt qu'à chaque signal. Hors transaction,
+    immédiatement.
+    """
+    _schedule(item_ids)
+
+
+def delete_search_documents(item_ids):
+    """
+    Supprime les documents de ces items une fois la transaction validée :
+    une suppression annulée laisse le document en place.
+    """
+    _schedule(item_ids)
+
+
+def _schedule(item_ids):
+    item_ids = list(item_ids)
+    if not item_ids:
+        return
+    _pending_ids().update(item_ids)
+    # Les rappels suivants de la même transaction trouvent l'ensemble vide
+    transaction.on_commit(_write_pending)
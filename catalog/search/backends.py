@@ -0,0 +1,237 @@
+import re
+import uuid
+from itertools import chain
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.models import F, FloatField, IntegerField, TextField, Value
+from django.db.models.expressions import RawSQL
+
+from catalog.recommendations.index import indexable_items
+
+# Table FTS5 utilisée sous SQLite (créée par la migration 0006)
+FTS_TABLE = "catalog_item_fts"
+
+
+def search_document(item):
+    """
+    Document plein texte d'un item, en trois parties pondérées différemment :
+    titre, mots-clés (tags, catégorie, créateurs) et description.
+    Les relations doivent être préchargées (voir `indexable_items`).
+    """
+    keywords = chain(
+        item.tags or [],
+        [item.category.name] if item.category else [],
+        (person.name for person in chain(item.authors.all(), item.contributors.all(), item.producers.all())),
+    )
+    return item.title, " ".join(keywords), item.description
+
+
+def query_terms(query):
+    return re.findall(r"\w+", query.lower())
+
+
+class SearchBackend:
+    """
+    Recherche plein texte sur les items. `search` filtre un queryset d'items
+    (instances ou `listing_values()`) et le trie par pertinence (`search_rank`) ;
+    `update` / `delete` maintiennent les documents lors des écritures.
+    """
+    name = None
+    CHUNK_SIZE = 1000
+
+    def search(self, queryset, query):
+        raise NotImplementedError
+
+    def update(self, item_ids):
+        raise NotImplementedError
+
+    def delete(self, item_ids):
+        raise NotImplementedError
+
+    def rebuild(self):
+        from catalog.models import Item
+
+        item_ids = list(Item.objects.order_by("id").values_list("id", flat=True))
+        for start in range(0, len(item_ids), self.CHUNK_SIZE):
+            self.update(item_ids[start:start + self.CHUNK_SIZE])
+        return len(item_ids)
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    Colonne `Item.search_vector` (tsvector, index GIN) et tri par `ts_rank` :
+    titre (poids A), mots-clés (B), description (C).
+    """
+    name = "postgresql"
+
+    def search(self, queryset, query):
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        query = SearchQuery(query, search_type="websearch", config=settings.SEARCH_CONFIG)
+        return (
+            queryset.filter(search_vector=query)
+            .annotate(search_rank=SearchRank(F("search_vector"), query))
+            .order_by("-search_rank", "id")
+        )
+
+    def update(self, item_ids):
+        from django.contrib.postgres.search import SearchVector
+
+        from catalog.models import Item
+
+        items = list(indexable_items(item_ids))
+        for item in items:
+            title, keywords, description = search_document(item)
+            item.search_vector = (
+                SearchVector(Value(title, output_field=TextField()), weight="A", config=settings.SEARCH_CONFIG)
+                + SearchVector(Value(keywords, output_field=TextField()), weight="B", config=settings.SEARCH_CONFIG)
+                + SearchVector(Value(description, output_field=TextField()), weight="C", config=settings.SEARCH_CONFIG)
+            )
+        Item.objects.bulk_update(items, ["search_vector"], batch_size=self.CHUNK_SIZE)
+
+    def delete(self, item_ids):
+        # Le document est porté par la ligne de l'item : rien à faire
+        pass
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """
+    Table virtuelle FTS5 (`catalog_item_fts`, même rowid que la ligne de l'item),
+    tri par BM25 avec les mêmes poids relatifs que sous PostgreSQL. Les termes de
+    la requête sont tous requis, comme avec `websearch_to_tsquery`. Un VACUUM peut
+    renuméroter les rowid : relancer alors `build_search_index`.
+    """
+    name = "sqlite"
+    WEIGHTS = (0.0, 10.0, 4.0, 2.0)  # item_id, title, keywords, description
+
+    def search(self, queryset, query):
+        terms = query_terms(query)
+        if not terms:
+            return queryset.none()
+        table = queryset.model._meta.db_table
+        bm25 = ", ".join(str(weight) for weight in self.WEIGHTS)
+        match = " ".join(f'"{term}"' for term in terms)
+        # Pas de jointure : le queryset reste utilisable comme sous-requête
+        rank = RawSQL(
+            f"SELECT -bm25({FTS_TABLE}, {bm25}) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = {table}.rowid",
+            (match,),
+            output_field=FloatField(),
+        )
+        return (
+            queryset.filter(id__in=RawSQL(f"SELECT item_id FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", (match,)))
+            .annotate(search_rank=rank)
+            .order_by("-search_rank", "id")
+        )
+
+    def update(self, item_ids):
+        from catalog.models import Item
+
+        items = list(indexable_items(item_ids))
+        with connection.cursor() as cursor:
+            self._delete(cursor, [item.pk for item in items])
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, item_id, title, keywords, description) "
+                f"SELECT rowid, %s, %s, %s, %s FROM {Item._meta.db_table} WHERE id = %s",
+                [(item.pk.hex, *search_document(item), item.pk.hex) for item in items],
+            )
+
+    def delete(self, item_ids):
+        with connection.cursor() as cursor:
+            self._delete(cursor, list(item_ids))
+
+    def _delete(self, cursor, item_ids):
+        for start in range(0, len(item_ids), self.CHUNK_SIZE):
+            chunk = [uuid.UUID(str(pk)).hex for pk in item_ids[start:start + self.CHUNK_SIZE]]
+            placeholders = ", ".join(["%s"] * len(chunk))
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE item_id IN ({placeholders})", chunk)
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        return super().rebuild()
+
+
+class InvertedIndexBackend(SearchBackend):
+    """
+    Index inversé en mémoire (`catalog.search.inverted`), indépendant de la base :
+    BM25, complétion du dernier mot et tolérance aux fautes de frappe. Seuls les
+    SEARCH_INVERTED_MAX_RESULTS meilleurs items sont renvoyés.
+    """
+    name = "inverted"
+
+    def search(self, queryset, query):
+        from catalog.search.inverted import get_inverted_index
+
+        item_ids, _ = get_inverted_index().search(query, settings.SEARCH_INVERTED_MAX_RESULTS)
+        if not item_ids:
+            return queryset.none()
+        rank = self._rank(queryset.model, item_ids)
+        return queryset.filter(id__in=item_ids).annotate(search_rank=rank).order_by("-search_rank", "id")
+
+    def _rank(self, model, item_ids):
+        """
+        Opposé de la position de chaque ligne dans le classement de l'index : la
+        liste classée est passée en un seul paramètre (tableau sous PostgreSQL,
+        ids hexadécimaux de longueur fixe concaténés sous SQLite), sans
+        recalculer les scores ni générer une branche de CASE par item.
+        """
+        column = f"{model._meta.db_table}.id"
+        if connection.vendor == "postgresql":
+            return RawSQL(
+                f"-array_position(%s::uuid[], {column})", ([str(pk) for pk in item_ids],), output_field=IntegerField()
+            )
+        return RawSQL(f"-instr(%s, {column})", ("".join(pk.hex for pk in item_ids),), output_field=IntegerField())
+
+    def update(self, item_ids):
+        # Chaque processus applique le journal `ItemIndexChange` (voir `get_inverted_index`)
+        pass
+
+    def delete(self, item_ids):
+        pass
+
+    def rebuild(self):
+        from catalog.recommendations.sync import purge_changes, settled_watermark
+        from catalog.search.inverted import InvertedIndex, reset_inverted_index
+
+        index = InvertedIndex.build(watermark=settled_watermark())
+        index.save()
+        purge_changes()
+        reset_inverted_index()
+        return len(index)
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (PostgresSearchBackend(), SQLiteSearchBackend(), InvertedIndexBackend())
+}
+
+
+def get_search_backend(name=None):
+    """
+    Backend de recherche par nom, sinon SEARCH_BACKEND, sinon celui de la base.
+    """
+    name = name or settings.SEARCH_BACKEND or connection.vendor
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ImproperlyConfigured(
+            f"No search backend for '{name}'. Choose among: {', '.join(BACKENDS)}."
+        )
+
+
+def available_backends():
+    """
+    Backends utilisables avec la base courante : celui de la base et l'index inversé.
+    """
+    return [name for name in BACKENDS if name in (connection.vendor, InvertedIndexBackend.name)]
+
+
+def active_backends():
+    """
+    Backends dont les documents sont écrits lors des écritures : celui par défaut.
+    L'index inversé, lui, suit le journal `ItemIndexChange`.
+    """
+    return [get_search_backend()]
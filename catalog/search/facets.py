@@ -0,0 +1,115 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Q
+
+from catalog.models import Item
+from catalog.tags import tag_counts
+
+VERSION_KEY = "facets:version"
+# Tranches de notes : [min, max[, la dernière inclut la note maximale
+RATING_RANGES = ((0, 1), (1, 2), (2, 3), (3, 4), (4, 5))
+CREATOR_FACETS = ("authors", "producers", "contributors")
+# Paramètres sans effet sur l'ensemble des items filtrés (pagination, flux, tri, format)
+IGNORED_PARAMS = {"page", "page_size", "limit", "cursor", "stream", "ordering", "format"}
+
+
+def compute_facets(queryset, limit=None):
+    """
+    Comptes par catégorie, créateur, tag et tranche de notes des items de
+    `queryset` (déjà filtré), une requête groupée par facette.
+    """
+    limit = limit or settings.SEARCH_FACETS_LIMIT
+    item_ids = queryset.order_by().values("id")
+
+    categories = (
+        Item.objects.filter(id__in=item_ids, category__isnull=False)
+        .values("category_id", "category__name")
+        .annotate(count=Count("id"))
+        .order_by("-count", "category__name")[:limit]
+    )
+    facets = {
+        "categories": [
+            {"id": str(row["category_id"]), "name": row["category__name"], "count": row["count"]}
+            for row in categories
+        ],
+    }
+
+    for relation in CREATOR_FACETS:
+        persons = (
+            getattr(Item, relation).through.objects.filter(item_id__in=item_ids)
+            .values("person_id", "person__name")
+            .annotate(count=Count("item_id"))
+            .order_by("-count", "person__name")[:limit]
+        )
+        facets[relation] = [
+            {"id": str(row["person_id"]), "name": row["person__name"], "count": row["count"]}
+            for row in persons
+        ]
+
+    facets["tags"] = [{"value": tag, "count": count} for tag, count in tag_counts(queryset, limit)]
+
+    last = len(RATING_RANGES) - 1
+    ratings = Item.objects.filter(id__in=item_ids).aggregate(**{
+        f"rating_{position}": Count(
+            "id", filter=Q(rating__gte=low) & (Q(rating__lte=high) if position == last else Q(rating__lt=high))
+        )
+        for position, (low, high) in enumerate(RATING_RANGES)
+    })
+    facets["rating"] = [
+        {"min": low, "max": high, "count": ratings[f"rating_{position}"]}
+        for position, (low, high) in enumerate(RATING_RANGES)
+    ]
+    return facets
+
+
+# ────────────────────────────────────────────────────────
+# Cache par signature de filtres
+# ────────────────────────────────────────────────────────
+def _cache():
+    return caches[settings.SEARCH_FACETS_CACHE_ALIAS]
+
+
+def filter_signature(query_params):
+    """
+    Signature normalisée des filtres : ordre des paramètres et des valeurs
+    (listes séparées par des virgules) indifférent, pagination et tri ignorés.
+    """
+    normalized = {}
+    for name in sorted(set(query_params) - IGNORED_PARAMS):
+        values = sorted(
+            value.strip()
+            for raw in query_params.getlist(name)
+            for value in raw.split(",")
+            if value.strip()
+        )
+        if values:
+            normalized[name] = values
+    return hashlib.sha1(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+
+
+def _facets_key(signature):
+    return f"facets:{_cache().get(VERSION_KEY, 0)}:{signature}"
+
+
+def get_facets(signature):
+    return _cache().get(_facets_key(signature))
+
+
+def set_facets(signature, facets):
+    _cache().set(_facets_key(signature), facets, timeout=settings.SEARCH_FACETS_CACHE_TIMEOUT)
+
+
+def invalidate_facets():
+    """
+    À appeler quand des items (ou leurs catégories, créateurs, tags) changent.
+    """
+    cache = _cache()
+    cache.add(VERSION_KEY, 0, timeout=None)
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # Clé expulsée entre add() et incr()
+        cache.set(VERSION_KEY, 1, timeout=None)
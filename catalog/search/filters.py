@@ -0,0 +1,37 @@
+from rest_framework import filters
+from rest_framework.exceptions import ValidationError
+
+from catalog.search.backends import available_backends, get_search_backend
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    Même paramètre `?search=` que `SearchFilter`, mais résolu par le backend
+    plein texte (index GIN / FTS5) au lieu de `ILIKE '%terme%'`, avec un tri
+    par pertinence (remplacé par `?ordering=` s'il est fourni).
+
+    `?search_backend=inverted` interroge l'index inversé en mémoire à la place.
+    """
+    backend_param = "search_backend"
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, "").strip()
+        if not query:
+            return queryset
+        name = request.query_params.get(self.backend_param)
+        if name is not None and name not in available_backends():
+            raise ValidationError(
+                {self.backend_param: f"Unknown search backend. Choose among: {', '.join(available_backends())}."}
+            )
+        return get_search_backend(name).search(queryset, query)
+
+    def get_schema_operation_parameters(self, view):
+        return super().get_schema_operation_parameters(view) + [
+            {
+                "name": self.backend_param,
+                "required": False,
+                "in": "query",
+                "description": "Search backend (defaults to the database full-text search).",
+                "schema": {"type": "string", "enum": available_backends()},
+            },
+        ]
@@ -0,0 +1,541 @@
+import json
+import logging
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from catalog.recommendations.index import (
+    current_version, index_dir, indexable_items, new_version_dir, publish_version, version_dir,
+)
+from catalog.recommendations.ranking import to_uuid, top_k, uuid_array
+
+TOKEN_RE = re.compile(r"\w+")
+MAX_TERM_BYTES = 32
+# Poids (entiers) des champs dans la fréquence d'un terme : titre, mots-clés, description
+FIELD_WEIGHTS = (3, 2, 1)
+TYPO_ALPHABET = "abcdefghijklmnopqrstuvwxyz0123456789"
+MAX_FREQUENCY = np.iinfo(np.uint16).max
+
+logger = logging.getLogger(__name__)
+
+
+def tokenize(text):
+    return [
+        token for token in (raw.encode() for raw in TOKEN_RE.findall(text.lower()))
+        if len(token) <= MAX_TERM_BYTES
+    ]
+
+
+def term_counts(fields):
+    """
+    Fréquences pondérées (FIELD_WEIGHTS) des termes d'un document (titre,
+    mots-clés, description).
+    """
+    counts = {}
+    for weight, text in zip(FIELD_WEIGHTS, fields):
+        for token in tokenize(text or ""):
+            counts[token] = counts.get(token, 0) + weight
+    return {token: min(frequency, MAX_FREQUENCY) for token, frequency in counts.items()}
+
+
+# ────────────────────────────────────────────────────────
+# Listes de postings : écarts entre rangs encodés en varint (LEB128)
+# ────────────────────────────────────────────────────────
+def varint_sizes(values):
+    values = np.asarray(values, dtype=np.uint64)
+    sizes = np.ones(len(values), dtype=np.int64)
+    for shift in range(7, 64, 7):
+        sizes += values >= np.uint64(1 << shift)
+    return sizes
+
+
+def encode_varints(values):
+    values = np.asarray(values, dtype=np.uint64)
+    sizes = varint_sizes(values)
+    starts = np.cumsum(sizes) - sizes
+    owner = np.repeat(np.arange(len(values)), sizes)
+    position = np.arange(int(sizes.sum())) - starts[owner]
+    data = ((values[owner] >> (7 * position).astype(np.uint64)) & np.uint64(0x7F)).astype(np.uint8)
+    data[position < sizes[owner] - 1] |= 0x80
+    return data
+
+
+def decode_varints(data):
+    data = np.asarray(data, dtype=np.uint8)
+    ends = np.flatnonzero(data < 0x80)
+    if len(ends) == len(data):
+        # Liste dense : tous les écarts tiennent sur un octet
+        return data.astype(np.int64)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    owner = np.repeat(np.arange(len(ends)), ends - starts + 1)
+    position = np.arange(len(data)) - starts[owner]
+    # Les rangs tiennent sur 32 bits : la somme en float64 est exacte
+    parts = (data & 0x7F).astype(np.float64) * np.exp2(7 * position)
+    return np.bincount(owner, weights=parts, minlength=len(ends)).astype(np.int64)
+
+
+def edits(term):
+    """
+    Termes à une faute de frappe de `term` (suppression, transposition,
+    substitution, insertion), comme dans le correcteur de Norvig.
+    """
+    word = term.decode()
+    splits = [(word[:i], word[i:]) for i in range(len(word) + 1)]
+    candidates = set()
+    for left, right in splits:
+        if right:
+            candidates.add(left + right[1:])
+            for char in TYPO_ALPHABET:
+                candidates.add(left + char + right[1:])
+        if len(right) > 1:
+            candidates.add(left + right[1] + right[0] + right[2:])
+        for char in TYPO_ALPHABET:
+            candidates.add(left + char + right)
+    candidates.discard(word)
+    return [candidate.encode() for candidate in candidates if len(candidate.encode()) <= MAX_TERM_BYTES]
+
+
+class InvertedIndex:
+    """
+    Index inversé des items (titre, description, tags, catégorie, créateurs),
+    sans dépendance aux fonctions plein texte de la base.
+
+    - `terms` : vocabulaire trié (octets UTF-8), recherche dichotomique et par préfixe
+    - `postings` : rangs des documents par terme, en écarts varint, bornés par `offsets`
+    - `frequencies` : fréquence pondérée (uint16) de chaque posting, bornée par `cumsum(df)`
+    - `lengths` / `item_ids` : longueur pondérée et UUID de chaque document (triés par id)
+
+    L'instantané est construit par `build_search_index --backend inverted`,
+    sauvegardé en `.npy` (une version par construction, comme l'index des
+    recommandations) et rechargé en mmap. Les modifications du catalogue arrivent
+    par le journal `ItemIndexChange` (`watermark` / `recent_changes`, voir
+    `catalog.recommendations.sync.pending_changes`) : les rangs remplacés sont
+    masqués (`dead`) et les nouveaux documents gardés dans des postings en
+    mémoire (delta), mis à jour document par document. df, nombre de documents
+    et longueur moyenne de BM25 couvrent l'instantané vivant et le delta.
+    """
+
+    DIRECTORY = "search"
+    ARRAYS = ("terms", "offsets", "postings", "df", "frequencies", "lengths", "item_ids")
+    STATE_FILE = "state.json"
+
+    K1 = 1.2
+    B = 0.75
+    MIN_PREFIX = 2
+    MAX_EXPANSIONS = 32
+    PREFIX_WEIGHT = 0.8
+    TYPO_MIN_LENGTH = 4
+    TYPO_WEIGHT = 0.5
+    STOP_RATIO = 0.5
+
+    def __init__(self, terms, offsets, postings, df, frequencies, lengths, item_ids, built_at=None, watermark=0,
+                 recent_changes=()):
+        self.terms = terms
+        self.offsets = offsets
+        self.postings = postings
+        self.df = df
+        self.frequencies = frequencies
+        self.lengths = lengths
+        self.item_ids = item_ids
+        self._frequency_offsets = np.concatenate(([0], np.cumsum(df, dtype=np.int64)))
+        self.built_at = built_at or datetime.now(timezone.utc).isoformat()
+        self.watermark = watermark
+        self.recent_changes = set(recent_changes)
+        self.version = None
+        self.dead = np.empty(0, dtype=np.int64)
+        self._total_length = float(lengths.sum()) if len(lengths) else 0.0
+        # Delta : {clé: (longueur, fréquences)} et {terme: {clé: fréquence}}
+        self._delta_documents = {}
+        self._delta_postings = {}
+
+    def __len__(self):
+        return len(self.item_ids) - len(self.dead) + len(self._delta_documents)
+
+    @property
+    def avg_length(self):
+        return self._total_length / len(self) if len(self) else 0.0
+
+    # ────────────────────────────────────────────────────────
+    # Construction
+    # ────────────────────────────────────────────────────────
+    @classmethod
+    def build(cls, documents=None, chunk_size=10000, watermark=0):
+        """
+        Construit l'index depuis des couples (pk, (titre, mots-clés, description)),
+        par défaut tout le catalogue (voir `search_document`).
+        """
+        from catalog.search.backends import search_document
+
+        if documents is None:
+            documents = (
+                (item.pk, search_document(item))
+                for item in indexable_items().iterator(chunk_size=2000)
+            )
+
+        vocabulary = {}
+        item_ids, lengths = [], []
+        term_chunks, row_chunks, frequency_chunks = [], [], []
+        term_ids, rows, frequencies = [], [], []
+
+        for row, (pk, fields) in enumerate(documents):
+            counts = term_counts(fields)
+            item_ids.append(pk)
+            lengths.append(sum(counts.values()))
+            for token, frequency in counts.items():
+                term_ids.append(vocabulary.setdefault(token, len(vocabulary)))
+                rows.append(row)
+                frequencies.append(frequency)
+            if len(rows) >= chunk_size * 50:
+                term_chunks.append(np.array(term_ids, dtype=np.int64))
+                row_chunks.append(np.array(rows, dtype=np.int64))
+                frequency_chunks.append(np.array(frequencies, dtype=np.uint16))
+                term_ids, rows, frequencies = [], [], []
+        term_chunks.append(np.array(term_ids, dtype=np.int64))
+        row_chunks.append(np.array(rows, dtype=np.int64))
+        frequency_chunks.append(np.array(frequencies, dtype=np.uint16))
+        term_ids, rows = np.concatenate(term_chunks), np.concatenate(row_chunks)
+        frequencies = np.concatenate(frequency_chunks)
+
+        # Vocabulaire trié, postings regroupés par terme puis par rang
+        terms = np.array(list(vocabulary), dtype=f"S{MAX_TERM_BYTES}")
+        order = np.argsort(terms, kind="stable")
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        term_ids = rank[term_ids]
+        postings_order = np.lexsort((rows, term_ids))
+        term_ids, rows, frequencies = term_ids[postings_order], rows[postings_order], frequencies[postings_order]
+
+        df = np.bincount(term_ids, minlength=len(terms)).astype(np.int32)
+        starts = np.concatenate(([0], np.cumsum(df)[:-1])).astype(np.int64)
+        gaps = np.diff(rows, prepend=0)
+        gaps[starts[df > 0]] = rows[starts[df > 0]]
+        encoded = encode_varints(gaps)
+        # Taille en octets de chaque liste, pour la borner dans le flux varint
+        list_sizes = np.bincount(term_ids, weights=varint_sizes(gaps), minlength=len(terms))
+        offsets = np.concatenate(([0], np.cumsum(list_sizes))).astype(np.int64)
+
+        ids = uuid_array(item_ids)
+        # Rangs triés par id : permet de retrouver le rang d'un item par dichotomie
+        if len(ids) and np.any(ids[1:] < ids[:-1]):
+            raise ValueError("Documents must be ordered by primary key.")
+        return cls(
+            terms[order], offsets, encoded, df, frequencies,
+            np.asarray(lengths, dtype=np.float32), ids, watermark=watermark,
+        )
+
+    # ────────────────────────────────────────────────────────
+    # Requêtes
+    # ────────────────────────────────────────────────────────
+    def _lookup(self, keys):
+        keys = np.asarray(keys, dtype=f"S{MAX_TERM_BYTES}")
+        if not len(self.terms):
+            return np.full(len(keys), -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.terms, keys), len(self.terms) - 1)
+        return np.where(self.terms[positions] == keys, positions, -1)
+
+    def _expand(self, term, prefix):
+        """
+        Termes de l'instantané ou du delta qui correspondent à `term`, avec leur
+        poids : terme exact, complétions (dernier mot de la requête) puis fautes
+        de frappe.
+        """
+        variants = {}
+        if self._lookup([term])[0] >= 0 or term in self._delta_postings:
+            variants[term] = 1.0
+
+        if prefix and len(term) >= self.MIN_PREFIX:
+            start = np.searchsorted(self.terms, term)
+            end = np.searchsorted(self.terms, term + b"\xff")
+            completions = np.arange(start, end)
+            if len(completions) > self.MAX_EXPANSIONS:
+                completions = completions[top_k(self.df[completions].astype(np.float32), self.MAX_EXPANSIONS)]
+            completions = self.terms[completions].tolist()
+            completions += [candidate for candidate in self._delta_postings if candidate.startswith(term)]
+            for completion in completions:
+                variants.setdefault(completion, self.PREFIX_WEIGHT)
+
+        if not variants and len(term) >= self.TYPO_MIN_LENGTH:
+            candidates = edits(term)
+            found = self._lookup(candidates) >= 0
+            for candidate, in_snapshot in zip(candidates, found.tolist()):
+                if in_snapshot or candidate in self._delta_postings:
+                    variants[candidate] = self.TYPO_WEIGHT
+        return variants
+
+    def _postings(self, term):
+        """
+        (rangs vivants de l'instantané, fréquences) du terme, et ses postings du
+        delta {clé: fréquence}.
+        """
+        term_id = self._lookup([term])[0]
+        if term_id < 0:
+            rows, frequencies = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        else:
+            rows = np.cumsum(decode_varints(self.postings[self.offsets[term_id]:self.offsets[term_id + 1]]))
+            frequencies = self.frequencies[self._frequency_offsets[term_id]:self._frequency_offsets[term_id + 1]]
+            frequencies = frequencies.astype(np.float32)
+            if len(self.dead):
+                alive = ~np.isin(rows, self.dead)
+                rows, frequencies = rows[alive], frequencies[alive]
+        return rows, frequencies, self._delta_postings.get(term, {})
+
+    def _df(self, term):
+        # Borne haute (rangs masqués compris) : sert seulement à ordonner les termes
+        term_id = self._lookup([term])[0]
+        return (int(self.df[term_id]) if term_id >= 0 else 0) + len(self._delta_postings.get(term, ()))
+
+    def _bm25(self, weight, idf, frequencies, lengths):
+        norm = self.K1 * (1 - self.B + self.B * lengths / max(self.avg_length, 1e-6))
+        return weight * idf * frequencies * (self.K1 + 1) / (frequencies + norm)
+
+    def _match(self, variants, candidates, delta_candidates):
+        """
+        Documents qui contiennent l'une des `variants` {terme: poids} d'un terme :
+        (rangs, scores BM25) dans l'instantané et {clé: score} dans le delta,
+        restreints aux rangs triés `candidates` et aux clés `delta_candidates`
+        s'ils sont donnés. L'idf d'une variante compte ses documents vivants de
+        l'instantané et du delta.
+        """
+        n_documents = max(len(self), 1)
+        all_rows, all_scores, delta = [], [], {}
+        for term, weight in variants.items():
+            rows, frequencies, delta_frequencies = self._postings(term)
+            df = len(rows) + len(delta_frequencies)
+            if not df:
+                continue
+            idf = np.log(1.0 + (n_documents - df + 0.5) / (df + 0.5))
+            if candidates is not None and len(rows):
+                positions = np.minimum(np.searchsorted(rows, candidates), len(rows) - 1)
+                positions = positions[rows[positions] == candidates]
+                rows, frequencies = rows[positions], frequencies[positions]
+            all_rows.append(rows)
+            all_scores.append(self._bm25(weight, idf, frequencies, self.lengths[rows]))
+            for key, frequency in delta_frequencies.items():
+                if delta_candidates is not None and key not in delta_candidates:
+                    continue
+                score = float(self._bm25(weight, idf, frequency, self._delta_documents[key][0]))
+                delta[key] = max(score, delta.get(key, 0.0))
+
+        if not all_rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32), delta
+        if len(all_rows) == 1:
+            return all_rows[0], all_scores[0].astype(np.float32), delta
+        # Un document qui contient plusieurs variantes garde la meilleure :
+        # écritures par score croissant, la dernière (la plus haute) l'emporte
+        rows, inverse = np.unique(np.concatenate(all_rows), return_inverse=True)
+        all_scores = np.concatenate(all_scores)
+        order = np.argsort(all_scores, kind="stable")
+        scores = np.zeros(len(rows), dtype=np.float32)
+        scores[inverse[order]] = all_scores[order]
+        return rows, scores, delta
+
+    def _scores(self, terms):
+        """
+        Tous les termes de la requête sont requis (le dernier peut être un préfixe),
+        sauf les mots vides (présents dans plus de STOP_RATIO des documents) quand
+        la requête contient d'autres termes. Les termes sont traités du plus rare au
+        plus fréquent : les suivants ne sont évalués que sur les documents restants.
+        """
+        groups = [self._expand(term, position == len(terms) - 1) for position, term in enumerate(terms)]
+        if not all(groups):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32), {}
+        frequencies = [[self._df(term) for term in group] for group in groups]
+        order = sorted(range(len(groups)), key=lambda position: sum(frequencies[position]))
+        if len(groups) > 1:
+            common = [position for position in order if min(frequencies[position]) <= self.STOP_RATIO * len(self)]
+            order = common or order
+
+        rows = scores = delta = None
+        for position in order:
+            term_rows, term_scores, term_delta = self._match(groups[position], rows, delta)
+            if rows is None:
+                rows, scores, delta = term_rows, term_scores, term_delta
+            else:
+                scores = scores[np.searchsorted(rows, term_rows)] + term_scores
+                rows = term_rows
+                delta = {key: delta[key] + score for key, score in term_delta.items()}
+            if not len(rows) and not delta:
+                break
+        return rows, scores, delta
+
+    def search(self, query, limit):
+        """
+        (ids, scores) des `limit` items les plus pertinents pour `query`.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return [], np.empty(0, dtype=np.float32)
+        rows, scores, delta = self._scores(terms)
+        ids = self.item_ids[rows]
+        if delta:
+            ids = np.concatenate([ids, np.array(list(delta), dtype="S16")])
+            scores = np.concatenate([scores, np.fromiter(delta.values(), dtype=np.float32, count=len(delta))])
+        best = top_k(scores, limit)
+        return [to_uuid(raw) for raw in ids[best].tolist()], scores[best]
+
+    # ────────────────────────────────────────────────────────
+    # Mise à jour incrémentale
+    # ────────────────────────────────────────────────────────
+    def apply(self, documents, deleted_ids=()):
+        """
+        Remplace les documents des items modifiés (couples (pk, champs)) et retire
+        les items supprimés : leurs rangs de l'instantané sont masqués, leurs
+        postings du delta remplacés. Coût proportionnel aux documents touchés.
+        """
+        documents = list(documents)
+        keys = uuid_array([pk for pk, _ in documents] + list(deleted_ids))
+        if len(self.item_ids) and len(keys):
+            positions = np.minimum(np.searchsorted(self.item_ids, keys), len(self.item_ids) - 1)
+            found = np.setdiff1d(positions[self.item_ids[positions] == keys], self.dead)
+            self._total_length -= float(self.lengths[found].sum())
+            self.dead = np.union1d(self.dead, found)
+
+        keys = keys.tolist()
+        for key in keys[len(documents):]:
+            self._discard(key)
+        for key, (_, fields) in zip(keys, documents):
+            self._discard(key)
+            counts = term_counts(fields)
+            length = sum(counts.values())
+            self._delta_documents[key] = (length, counts)
+            for term, frequency in counts.items():
+                self._delta_postings.setdefault(term, {})[key] = frequency
+            self._total_length += length
+
+    def _discard(self, key):
+        document = self._delta_documents.pop(key, None)
+        if document is None:
+            return
+        length, counts = document
+        self._total_length -= length
+        for term in counts:
+            postings = self._delta_postings[term]
+            del postings[key]
+            if not postings:
+                del self._delta_postings[term]
+
+    # ────────────────────────────────────────────────────────
+    # Persistance (mmap)
+    # ────────────────────────────────────────────────────────
+    @classmethod
+    def root(cls, directory=None):
+        return Path(directory or index_dir()) / cls.DIRECTORY
+
+    def save(self, directory=None):
+        """
+        Écrit l'instantané dans une nouvelle version et la publie. Le delta
+        n'est pas sauvegardé : seul un index construit par `build` l'est.
+        """
+        root = self.root(directory)
+        root.mkdir(parents=True, exist_ok=True)
+        path = new_version_dir(root)
+        for name in self.ARRAYS:
+            np.save(path / f"{name}.npy", getattr(self, name))
+        (path / self.STATE_FILE).write_text(json.dumps({
+            "built_at": self.built_at,
+            "watermark": self.watermark,
+            "recent_changes": sorted(self.recent_changes),
+        }))
+        publish_version(root, path)
+        self.version = path.name
+
+    @classmethod
+    def load(cls, directory=None):
+        path = version_dir(cls.root(directory))
+        state = json.loads((path / cls.STATE_FILE).read_text())
+        arrays = {name: np.load(path / f"{name}.npy", mmap_mode="r") for name in cls.ARRAYS}
+        index = cls(
+            **arrays, built_at=state["built_at"], watermark=state.get("watermark", 0),
+            recent_changes=state.get("recent_changes", ()),
+        )
+        index.version = path.name
+        return index
+
+    @classmethod
+    def stored_version(cls, directory=None):
+        return current_version(cls.root(directory))
+
+    @classmethod
+    def stored_watermark(cls, directory=None):
+        try:
+            path = version_dir(cls.root(directory))
+            return json.loads((path / cls.STATE_FILE).read_text())["watermark"]
+        except FileNotFoundError:
+            return None
+
+
+def sync_inverted_index(index):
+    """
+    Applique à `index` les changements du journal `ItemIndexChange` qu'il n'a
+    pas encore vus (comme `catalog.recommendations.sync.sync_index`).
+    """
+    from catalog.recommendations.sync import pending_changes
+    from catalog.search.backends import search_document
+
+    for upserted, deleted in pending_changes(index):
+        items = list(indexable_items(upserted))
+        found = {item.pk for item in items}
+        index.apply(
+            [(item.pk, search_document(item)) for item in items],
+            deleted + [pk for pk in upserted if pk not in found],
+        )
+    return index
+
+
+def snapshot_lag():
+    """
+    Changements du journal postérieurs à l'instantané sur disque (0 sans
+    instantané) : chaque processus les rejoue, et le journal n'est purgé que
+    jusqu'au watermark de l'instantané.
+    """
+    from catalog.models import ItemIndexChange
+
+    watermark = InvertedIndex.stored_watermark()
+    if watermark is None:
+        return 0
+    return ItemIndexChange.objects.filter(id__gt=watermark).count()
+
+
+# ────────────────────────────────────────────────────────
+# Index chargé une seule fois par processus
+# ────────────────────────────────────────────────────────
+_inverted_index = None
+_inverted_lock = threading.Lock()
+_inverted_checked = 0.0
+
+
+def get_inverted_index():
+    """
+    Retourne l'index inversé du processus. Toutes les RECOMMENDER_SYNC_INTERVAL
+    secondes, une nouvelle version (`build_search_index --backend inverted`) est
+    rechargée si elle est apparue, puis le journal est appliqué. L'index n'est
+    jamais construit ici : tant que la commande n'a pas été lancée, il est vide.
+    """
+    global _inverted_index, _inverted_checked
+    if _inverted_index is not None and time.monotonic() - _inverted_checked < settings.RECOMMENDER_SYNC_INTERVAL:
+        return _inverted_index
+
+    with _inverted_lock:
+        version = InvertedIndex.stored_version()
+        if _inverted_index is None or (version is not None and version != _inverted_index.version):
+            try:
+                _inverted_index = InvertedIndex.load()
+            except FileNotFoundError:
+                logger.warning("No inverted search index, run build_search_index --backend inverted")
+                _inverted_index = InvertedIndex.build(documents=[])
+        if _inverted_index.version is not None:
+            sync_inverted_index(_inverted_index)
+        _inverted_checked = time.monotonic()
+    return _inverted_index
+
+
+def reset_inverted_index():
+    global _inverted_index, _inverted_checked
+    with _inverted_lock:
+        _inverted_index = None
+        _inverted_checked = 0.0
@@ -1,3 +1,4 @@
+from django.utils import timezone
 from rest_framework import serializers
 
 from accounts.serializers.read import AccountSerializer
@@ -23,7 +24,7 @@ class ItemSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Item
-        fields = '__all__'
+        exclude = ('search_vector', 'popularity_updated_at', 'isbn')
 
 class UserInteractionSerializer(serializers.ModelSerializer):
     user = AccountSerializer(read_only=True)
@@ -32,3 +33,92 @@ class UserInteractionSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserInteraction
         fields = '__all__'
+
+
+# ────────────────────────────────────────────────────────
+# Chemin rapide (lecture seule) pour les listes d'items
+# ────────────────────────────────────────────────────────
+def serialize_items(rows):
+    """
+    Même sortie que `ItemSerializer(many=True)`, construite directement depuis
+    des lignes `Item.objects.listing_values()` et une requête par relation
+    many-to-many (tables de correspondance item -> personnes), sans passer
+    par l'introspection champ par champ de DRF.
+    """
+    rows = list(rows)
+    item_ids = [row["id"] for row in rows]
+
+    persons = {}
+    credits = {}
+    for relation in ("authors", "contributors", "producers"):
+        credits[relation] = {pk: [] for pk in item_ids}
+        links = (
+            getattr(Item, relation).through.objects.filter(item_id__in=item_ids)
+            .order_by("person__name", "person__id")
+            .values_list("item_id", "person_id", "person__name", "person__bio", "person__website")
+        )
+        for item_id, person_id, name, bio, website in links:
+            person = persons.get(person_id)
+            if person is None:
+                person = persons[person_id] = {"id": str(person_id), "name": name, "bio": bio, "website": website}
+            credits[relation][item_id].append(person)
+
+    data = []
+    for row in rows:
+        pk = row["id"]
+        data.append({
+            "id": str(pk),
+            "category": {
+                "id": str(row["category_id"]),
+                "name": row["category__name"],
+                "description": row["category__description"],
+            } if row["category_id"] else None,
+            "created_by": {
+                "id": str(row["created_by_id"]),
+                "username": row["created_by__username"],
+                "first_name": row["created_by__first_name"],
+                "last_name": row["created_by__last_name"],
+                "email": row["created_by__email"],
+                "role": row["created_by__role"],
+            } if row["created_by_id"] else None,
+            "authors": [dict(person) for person in credits["authors"][pk]],
+            "contributors": [dict(person) for person in credits["contributors"][pk]],
+            "producers": [dict(person) for person in credits["producers"][pk]],
+            "title": row["title"],
+            "description": row["description"],
+            "image": row["image"],
+            "url": row["url"],
+            "created_at": _datetime(row["created_at"]),
+            "updated_at": _datetime(row["updated_at"]),
+            "tags": row["tags"],
+            "popularity_score": float(row["popularity_score"]),
+            "rating": float(row["rating"]),
+            "number_of_ratings": int(row["number_of_ratings"]),
+        })
+    return data
+
+
+def _datetime(value):
+    # Même format que serializers.DateTimeField (ISO 8601, "Z" pour UTC)
+    if value is None:
+        return None
+    value = timezone.localtime(value).isoformat()
+    if value.endswith("+00:00"):
+        value = value[:-6] + "Z"
+    return value
+
+
+class ItemFastListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        return serialize_items(data)
+
+
+class ItemFastSerializer(serializers.BaseSerializer):
+    """
+    Variante lecture seule de `ItemSerializer` à partir de lignes `listing_values()`.
+    """
+    class Meta:
+        list_serializer_class = ItemFastListSerializer
+
+    def to_representation(self, instance):
+        return serialize_items([instance])[0]
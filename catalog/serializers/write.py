@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from catalog.models import Category, Item, UserInteraction, Person
+from catalog.models import Category, Item, UserInteraction, Person, person_name_key
 
 
 class CategoryCreateSerializer(serializers.ModelSerializer):
@@ -17,11 +17,19 @@ class PersonCreateSerializer(serializers.ModelSerializer):
         model = Person
         fields = ('id', 'name', 'bio', 'website')
 
+    def validate_name(self, value):
+        # Unicité sur le nom normalisé (accents, casse, espaces)
+        duplicates = Person.objects.filter(name_key=person_name_key(value))
+        if self.instance is not None:
+            duplicates = duplicates.exclude(pk=self.instance.pk)
+        if duplicates.exists():
+            raise serializers.ValidationError("A person with this name already exists.")
+        return value
 
-class PersonUpdateSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Person
-        fields = ('id', 'name', 'bio', 'website')
+
+class PersonUpdateSerializer(PersonCreateSerializer):
+    class Meta(PersonCreateSerializer.Meta):
+        pass
 
 class ItemCreateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -43,6 +51,8 @@ class ItemUpdateSerializer(serializers.ModelSerializer):
             'authors', 'contributors', 'producers',
             'popularity_score', 'rating', 'number_of_ratings'
         )
+        # Tenus à jour à partir des interactions (catalog.aggregates, catalog.popularity)
+        read_only_fields = ('popularity_score', 'rating', 'number_of_ratings')
 
 class UserInteractionCreateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -84,3 +94,12 @@ class UserInteractionUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserInteraction
         fields = ('rating',)
+
+class UserInteractionBulkRowSerializer(serializers.Serializer):
+    """
+    Une ligne de `POST /interaction/bulk/` : validée sans requête, l'existence
+    des items et des interactions est vérifiée en une fois pour tout le lot.
+    """
+    item = serializers.UUIDField()
+    interaction_type = serializers.ChoiceField(choices=UserInteraction.InteractionType.choices)
+    rating = serializers.IntegerField(min_value=0, required=False, allow_null=True, default=None)
@@ -0,0 +1,164 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from catalog import popularity
+from catalog.aggregates import apply_interaction_change, apply_interaction_changes
+from catalog.models import Category, Item, ItemIndexChange, Person, PrecomputedRecommendation, UserInteraction
+from catalog.recommendations.cache import invalidate_user
+from catalog.recommendations.sync import record_item_changes
+from catalog.search import delete_search_documents, update_search_documents
+from catalog.search.facets import invalidate_facets
+from catalog.tags import sync_item_tags
+
+# Champs qui entrent dans le document TF-IDF et le document plein texte d'un item
+INDEXED_FIELDS = {"title", "description", "tags", "category"}
+
+
+def items_changed(item_ids):
+    """
+    Le texte de ces items a changé : journal de l'index TF-IDF (appliqué par
+    micro-lots) et documents de recherche (réécrits à la validation de la transaction).
+    """
+    item_ids = list(item_ids)
+    record_item_changes(item_ids)
+    update_search_documents(item_ids)
+    invalidate_facets()
+
+
+def interactions_bulk_written(changes):
+    """
+    Effets des signaux post_save pour des interactions écrites en masse
+    (`bulk_create` n'en émet pas) : `changes` est une liste de couples
+    (état précédent ou None, interaction écrite). À appeler dans la transaction
+    de l'écriture.
+    """
+    if not changes:
+        return
+    apply_interaction_changes([(previous, _interaction_state(interaction)) for previous, interaction in changes])
+    popularity.apply_interaction_changes([
+        (previous, _interaction_state(interaction), interaction.created_at) for previous, interaction in changes
+    ])
+    invalidate_users({interaction.user_id for _, interaction in changes})
+    invalidate_facets()
+
+
+# ────────────────────────────────────────────────────────
+# Index des recommandations et de la recherche
+# ────────────────────────────────────────────────────────
+@receiver(post_save, sender=Item)
+def item_saved(sender, instance, update_fields=None, **kwargs):
+    # Une sauvegarde partielle qui ne touche pas le texte (ex. popularité) est ignorée
+    if update_fields is not None and not INDEXED_FIELDS.intersection(update_fields):
+        return
+    items_changed([instance.pk])
+
+
+@receiver(post_save, sender=Item)
+def item_tags_saved(sender, instance, update_fields=None, **kwargs):
+    # Table ItemTag (filtrage portable, comptage par tag)
+    if update_fields is None or "tags" in update_fields:
+        sync_item_tags([instance])
+    # Toute écriture (notes comprises) peut changer les comptes des facettes
+    invalidate_facets()
+
+
+@receiver(post_delete, sender=Item)
+def item_deleted(sender, instance, **kwargs):
+    record_item_changes([instance.pk], ItemIndexChange.Action.DELETE)
+    delete_search_documents([instance.pk])
+    invalidate_facets()
+
+
+def item_creators_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        items_changed([instance.pk])
+    elif pk_set:
+        # Modifié depuis la personne : pk_set contient les items concernés
+        items_changed(pk_set)
+
+
+for through in (Item.authors.through, Item.contributors.through, Item.producers.through):
+    m2m_changed.connect(item_creators_changed, sender=through)
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, created, **kwargs):
+    if not created:
+        items_changed(instance.items.values_list("id", flat=True))
+
+
+@receiver(post_save, sender=Person)
+def person_saved(sender, instance, created, **kwargs):
+    if created:
+        return
+    item_ids = set(instance.authored_items.values_list("id", flat=True))
+    item_ids |= set(instance.contributed_items.values_list("id", flat=True))
+    item_ids |= set(instance.produced_items.values_list("id", flat=True))
+    items_changed(item_ids)
+
+
+# ────────────────────────────────────────────────────────
+# Cache des recommandations par utilisateur
+# ────────────────────────────────────────────────────────
+def invalidate_users(user_ids):
+    """
+    Recommandations en cache, items avec interaction et recommandations
+    précalculées de ces utilisateurs, invalidés à la validation de la transaction :
+    invalidés avant, une requête lirait encore l'état non validé et le mettrait
+    en cache sous la nouvelle version.
+    """
+    user_ids = set(user_ids)
+
+    def invalidate():
+        for user_id in user_ids:
+            invalidate_user(user_id)
+        # Les recommandations précalculées ne reflètent plus les goûts de l'utilisateur
+        PrecomputedRecommendation.objects.filter(user_id__in=user_ids).delete()
+
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=UserInteraction)
+@receiver(post_delete, sender=UserInteraction)
+def interaction_changed(sender, instance, **kwargs):
+    invalidate_users([instance.user_id])
+
+
+# ────────────────────────────────────────────────────────
+# Agrégats des items (note moyenne, nombre de notes) et popularité amortie
+# ────────────────────────────────────────────────────────
+def _interaction_state(instance):
+    return instance.item_id, instance.interaction_type, instance.rating
+
+
+@receiver(pre_save, sender=UserInteraction)
+def interaction_state_before_save(sender, instance, **kwargs):
+    # Instance modifiée sans avoir été lue en base : relire son état d'origine
+    if instance._state.adding or hasattr(instance, "_stored_state"):
+        return
+    instance._stored_state = (
+        UserInteraction.objects.filter(pk=instance.pk)
+        .values_list("item_id", "interaction_type", "rating")
+        .first()
+    )
+
+
+@receiver(post_save, sender=UserInteraction)
+def interaction_aggregates_saved(sender, instance, created, **kwargs):
+    previous = None if created else getattr(instance, "_stored_state", None)
+    apply_interaction_change(previous, _interaction_state(instance))
+    popularity.apply_interaction_change(previous, _interaction_state(instance), instance.created_at)
+    instance._stored_state = _interaction_state(instance)
+    invalidate_facets()
+
+
+@receiver(post_delete, sender=UserInteraction)
+def interaction_aggregates_deleted(sender, instance, **kwargs):
+    # Exécuté dans la transaction de la suppression (Collector.delete)
+    previous = getattr(instance, "_stored_state", _interaction_state(instance))
+    apply_interaction_change(previous, None)
+    popularity.apply_interaction_change(previous, None, instance.created_at)
+    invalidate_facets()
@@ -0,0 +1,350 @@
+import io
+import json
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import islice
+from uuid import UUID
+
+from django.db import connection, transaction
+from django.db.models.constants import OnConflict
+from django.utils import timezone
+
+from catalog.models import Category, Item, ItemTag, Person, UserInteraction, person_name_key
+from catalog.tags import normalize_tags
+
+NDJSON = "ndjson"
+PARQUET = "parquet"
+FORMATS = (NDJSON, PARQUET)
+
+MANIFEST = "manifest.json"
+
+
+# ────────────────────────────────────────────────────────
+# Tables d'un instantané
+# ────────────────────────────────────────────────────────
+class Table:
+    """
+    Table d'un instantané du catalogue : colonnes concrètes du modèle (clés
+    étrangères par leur colonne `*_id`), moins `excluded`. Les tables de
+    liaison many-to-many sont exportées sans leur id auto-incrémenté.
+    """
+
+    def __init__(self, name, model, excluded=()):
+        self.name = name
+        self.model = model
+        auto_id = model._meta.auto_created and model._meta.pk.name == "id"
+        self.fields = [
+            field for field in model._meta.concrete_fields
+            if field.name not in excluded and not (auto_id and field.primary_key)
+        ]
+        self.columns = [field.column for field in self.fields]
+
+    @property
+    def db_table(self):
+        return self.model._meta.db_table
+
+    def rows(self, chunk_size):
+        """
+        Lignes (tuples) de la table, lues par blocs sans cache du queryset.
+        """
+        queryset = self.model._default_manager.order_by().values_list(*[field.attname for field in self.fields])
+        return queryset.iterator(chunk_size=chunk_size)
+
+
+def snapshot_tables():
+    """
+    Tables d'un instantané, dans l'ordre de chargement (clés étrangères d'abord).
+    `ItemTag` n'en fait pas partie : ses lignes sont déduites de `Item.tags`.
+    """
+    return [
+        Table("categories", Category),
+        Table("persons", Person),
+        # Document plein texte : reconstruit par `build_search_index`
+        Table("items", Item, excluded=("search_vector",)),
+        Table("item_authors", Item.authors.through),
+        Table("item_producers", Item.producers.through),
+        Table("item_contributors", Item.contributors.through),
+        Table("interactions", UserInteraction),
+    ]
+
+
+@contextmanager
+def consistent_read():
+    """
+    Transaction de lecture : toutes les tables de l'instantané sont lues au même
+    instant (pas d'interaction exportée sans son item). Sous PostgreSQL,
+    REPEATABLE READ (le niveau par défaut, READ COMMITTED, prend un nouvel
+    instantané à chaque requête) ; SQLite isole déjà une transaction de lecture.
+    """
+    set_isolation = connection.vendor == "postgresql" and not connection.in_atomic_block
+    with transaction.atomic():
+        if set_isolation:
+            with connection.cursor() as cursor:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+        yield
+
+
+def read_manifest(path):
+    return json.loads((path / MANIFEST).read_text())
+
+
+def write_manifest(path, fmt, counts):
+    manifest = {"format": fmt, "created_at": timezone.now().isoformat(), "tables": counts}
+    (path / MANIFEST).write_text(json.dumps(manifest, indent=2))
+
+
+def _is_json(field):
+    return field.get_internal_type() == "JSONField"
+
+
+# ────────────────────────────────────────────────────────
+# Formats de fichier
+# ────────────────────────────────────────────────────────
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _parquet():
+    # pyarrow : moteur Parquet de pandas, non requis pour NDJSON
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise RuntimeError("Parquet snapshots require pyarrow (pip install pyarrow).") from e
+    return pyarrow, pyarrow.parquet
+
+
+def _parquet_schema(pa, table):
+    types = {
+        "FloatField": pa.float64(),
+        "IntegerField": pa.int64(),
+        "PositiveIntegerField": pa.int64(),
+        "BigAutoField": pa.int64(),
+        "AutoField": pa.int64(),
+        "BooleanField": pa.bool_(),
+        "DateTimeField": pa.timestamp("us", tz="UTC"),
+    }
+    # Clés étrangères : type de la clé primaire visée
+    internal_types = [
+        (field.target_field if field.is_relation else field).get_internal_type() for field in table.fields
+    ]
+    return pa.schema([
+        (field.column, types.get(internal_type, pa.string()))
+        for field, internal_type in zip(table.fields, internal_types)
+    ])
+
+
+def export_table(table, path, fmt, chunk_size=10000):
+    """
+    Écrit la table dans `path` par blocs de `chunk_size` lignes (mémoire
+    bornée) et retourne le nombre de lignes.
+    """
+    rows = table.rows(chunk_size)
+    json_columns = [index for index, field in enumerate(table.fields) if _is_json(field)]
+    count = 0
+    if fmt == NDJSON:
+        with open(path, "w", encoding="utf-8") as out:
+            for row in rows:
+                out.write(json.dumps(dict(zip(table.columns, row)), default=_json_default, ensure_ascii=False))
+                out.write("\n")
+                count += 1
+        return count
+
+    pa, pq = _parquet()
+    schema = _parquet_schema(pa, table)
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        while chunk := list(islice(rows, chunk_size)):
+            columns = [list(column) for column in zip(*chunk)]
+            for index in json_columns:
+                columns[index] = [None if value is None else json.dumps(value) for value in columns[index]]
+            for index, column_type in enumerate(schema.types):
+                if pa.types.is_string(column_type):
+                    columns[index] = [None if value is None else str(value) for value in columns[index]]
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+            count += len(chunk)
+    return count
+
+
+def read_table(table, path, fmt, chunk_size=10000):
+    """
+    Lignes du fichier (dicts colonne -> valeur Python), par blocs de `chunk_size`.
+    """
+    if fmt == NDJSON:
+        with open(path, encoding="utf-8") as source:
+            lines = (line for line in source if line.strip())
+            while chunk := list(islice(lines, chunk_size)):
+                yield [json.loads(line) for line in chunk]
+        return
+
+    _, pq = _parquet()
+    json_columns = [field.column for field in table.fields if _is_json(field)]
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=table.columns):
+        rows = batch.to_pylist()
+        for row in rows:
+            for column in json_columns:
+                if row[column] is not None:
+                    row[column] = json.loads(row[column])
+        yield rows
+
+
+# ────────────────────────────────────────────────────────
+# Chargement
+# ────────────────────────────────────────────────────────
+def _copy_text(value):
+    # Format texte de COPY : \N pour NULL, tabulations et fins de ligne échappées
+    if value is None:
+        return "\\N"
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    elif isinstance(value, (list, dict)):
+        value = json.dumps(value)
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+class Loader:
+    """
+    Insère des lignes dans une table en ignorant celles déjà présentes (même
+    clé primaire ou contrainte d'unicité) : un import se relance sans doublons.
+
+    Sous PostgreSQL, `COPY` dans une table temporaire puis
+    `INSERT ... SELECT ... ON CONFLICT DO NOTHING`. Ailleurs, INSERT par lots
+    (`executemany`) avec la clause d'insertion ignorant les conflits du
+    backend : `bulk_create` remplacerait les dates `auto_now` de l'instantané.
+    """
+
+    def __init__(self, db_table, fields):
+        self.db_table = db_table
+        self.fields = fields
+        self.columns = [field.column for field in fields]
+        self._staging = None
+
+    def load(self, rows):
+        """
+        Insère des lignes (dicts colonne -> valeur Python).
+        """
+        values = [[field.to_python(row.get(field.column)) for field in self.fields] for row in rows]
+        if not values:
+            return
+        if connection.vendor == "postgresql":
+            self._copy(values)
+        else:
+            self._insert(values)
+
+    def _insert(self, values):
+        ops, quote = connection.ops, connection.ops.quote_name
+        columns = ", ".join(quote(column) for column in self.columns)
+        placeholders = ", ".join(["%s"] * len(self.columns))
+        suffix = ops.on_conflict_suffix_sql(self.fields, OnConflict.IGNORE, None, None)
+        sql = (
+            f"{ops.insert_statement(on_conflict=OnConflict.IGNORE)} {quote(self.db_table)} ({columns})"
+            f" VALUES ({placeholders}) {suffix}"
+        )
+        params = [
+            [field.get_db_prep_save(value, connection) for field, value in zip(self.fields, row)] for row in values
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+
+    def _copy(self, values):
+        quote = connection.ops.quote_name
+        columns = ", ".join(quote(column) for column in self.columns)
+        staging = quote(f"snapshot_{self.db_table}")
+        buffer = io.StringIO()
+        for row in values:
+            buffer.write("\t".join(_copy_text(value) for value in row))
+            buffer.write("\n")
+        buffer.seek(0)
+
+        with connection.cursor() as cursor:
+            if self._staging is None:
+                # Mêmes types de colonnes, sans contraintes ni valeurs par défaut
+                cursor.execute(
+                    f"CREATE TEMPORARY TABLE {staging} ON COMMIT DROP AS"
+                    f" SELECT {columns} FROM {quote(self.db_table)} WITH NO DATA"
+                )
+                self._staging = staging
+            copy_sql = f"COPY {staging} ({columns}) FROM STDIN"
+            raw = cursor.cursor
+            if hasattr(raw, "copy_expert"):
+                raw.copy_expert(copy_sql, buffer)
+            else:
+                # psycopg 3
+                with raw.copy(copy_sql) as copy:
+                    copy.write(buffer.getvalue())
+            cursor.execute(
+                f"INSERT INTO {quote(self.db_table)} ({columns}) SELECT {columns} FROM {staging}"
+                " ON CONFLICT DO NOTHING"
+            )
+            cursor.execute(f"TRUNCATE {staging}")
+
+
+def import_table(table, path, fmt, chunk_size=10000, account_ids=None, person_ids=None):
+    """
+    Charge le fichier d'une table par blocs de `chunk_size` lignes et retourne
+    le nombre de lignes lues. À appeler dans une transaction.
+
+    `account_ids` (ids des comptes existants, en chaînes) : les comptes ne
+    font pas partie de l'instantané, les interactions d'un compte inconnu sont
+    ignorées et le créateur inconnu d'un item est vidé. Pour les items, les
+    lignes `ItemTag` sont déduites de `tags`, normalisés comme par `Item.save`.
+
+    `person_ids` ({id de l'instantané: id en base}, rempli par la table des
+    personnes) : une personne de l'instantané dont le `name_key` existe déjà
+    sous un autre id n'est pas insérée, les liens vers elle pointent sur la
+    personne existante.
+    """
+    loader = Loader(table.db_table, table.fields)
+    tag_fields = [ItemTag._meta.get_field("item"), ItemTag._meta.get_field("tag")]
+    tag_loader = Loader(ItemTag._meta.db_table, tag_fields) if table.model is Item else None
+    person_ids = {} if person_ids is None else person_ids
+    links_persons = table.model in (Item.authors.through, Item.producers.through, Item.contributors.through)
+
+    count = 0
+    for rows in read_table(table, path, fmt, chunk_size):
+        count += len(rows)
+        if account_ids is not None:
+            if table.model is UserInteraction:
+                rows = [row for row in rows if str(row["user_id"]) in account_ids]
+            elif table.model is Item:
+                for row in rows:
+                    if row["created_by_id"] is not None and str(row["created_by_id"]) not in account_ids:
+                        row["created_by_id"] = None
+        if table.model is Item:
+            for row in rows:
+                row["tags"] = normalize_tags(row["tags"])
+        elif table.model is Person:
+            rows = _merge_persons(rows, person_ids)
+        elif links_persons and person_ids:
+            for row in rows:
+                row["person_id"] = person_ids.get(str(row["person_id"]), row["person_id"])
+        loader.load(rows)
+        if tag_loader is not None:
+            tag_loader.load([
+                {"item_id": row["id"], "tag": tag} for row in rows for tag in row["tags"]
+            ])
+    return count
+
+
+def _merge_persons(rows, person_ids):
+    """
+    Lignes de personnes à insérer : celles dont le `name_key` (recalculé) est
+    déjà porté par une autre personne en base sont retirées et notées dans
+    `person_ids`, au lieu d'être ignorées en silence par `ON CONFLICT`.
+    """
+    for row in rows:
+        row["name_key"] = person_name_key(row["name"])
+    existing = dict(
+        Person.objects.filter(name_key__in=[row["name_key"] for row in rows]).values_list("name_key", "id")
+    )
+    kept = []
+    for row in rows:
+        person_id = existing.get(row["name_key"])
+        if person_id is not None and str(person_id) != str(row["id"]):
+            person_ids[str(row["id"])] = person_id
+        else:
+            kept.append(row)
+    return kept
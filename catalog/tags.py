@@ -0,0 +1,85 @@
+from django.db import connections
+from django.db.models import Count, Q
+
+from catalog.models import ItemTag
+
+ANY = "any"
+ALL = "all"
+NONE = "none"
+
+TAG_MAX_LENGTH = ItemTag._meta.get_field("tag").max_length
+
+
+def normalize_tags(tags):
+    """
+    Tags distincts (texte, sans espaces superflus), dans leur ordre d'origine.
+    """
+    normalized = []
+    for tag in tags or []:
+        tag = str(tag).strip()[:TAG_MAX_LENGTH]
+        if tag and tag not in normalized:
+            normalized.append(tag)
+    return normalized
+
+
+def sync_item_tags(items):
+    """
+    Aligne les lignes `ItemTag` sur `Item.tags` pour ces items. À appeler
+    explicitement pour les écritures qui ne déclenchent pas de signaux
+    (`bulk_create`, `update()`...).
+    """
+    items = list(items)
+    if not items:
+        return
+    wanted = {(item.pk, tag) for item in items for tag in normalize_tags(item.tags)}
+    existing = set(
+        ItemTag.objects.filter(item_id__in=[item.pk for item in items]).values_list("item_id", "tag")
+    )
+    stale = existing - wanted
+    if stale:
+        condition = Q()
+        for item_id, tag in stale:
+            condition |= Q(item_id=item_id, tag=tag)
+        ItemTag.objects.filter(condition).delete()
+    ItemTag.objects.bulk_create(
+        [ItemTag(item_id=item_id, tag=tag) for item_id, tag in wanted - existing],
+        ignore_conflicts=True,
+    )
+
+
+def filter_tags(queryset, tags, mode=ANY):
+    """
+    Items portant au moins un (`ANY`), tous (`ALL`) ou aucun (`NONE`) des `tags`.
+    Sous PostgreSQL, `@>` / `?|` sur `Item.tags` (index GIN) ; ailleurs, table
+    `ItemTag`. Tags demandés et tags stockés (`Item.save`, imports) passent par
+    la même normalisation (`normalize_tags`).
+    """
+    tags = normalize_tags(tags)
+    if not tags:
+        return queryset
+
+    if connections[queryset.db].vendor == "postgresql":
+        if mode == ALL:
+            return queryset.filter(tags__contains=tags)
+        condition = Q(tags__has_any_keys=tags)
+        return queryset.exclude(condition) if mode == NONE else queryset.filter(condition)
+
+    tagged = ItemTag.objects.filter(tag__in=tags)
+    if mode == ALL:
+        tagged = tagged.values("item_id").annotate(matched=Count("tag")).filter(matched=len(tags))
+    item_ids = tagged.values("item_id")
+    return queryset.exclude(id__in=item_ids) if mode == NONE else queryset.filter(id__in=item_ids)
+
+
+def tag_counts(queryset=None, limit=None):
+    """
+    Nombre d'items par tag (décroissant), sur tout le catalogue ou sur `queryset`.
+    Compté sur `ItemTag` (index (tag, item)), sans lire les documents JSON.
+    """
+    rows = ItemTag.objects.all()
+    if queryset is not None:
+        rows = rows.filter(item__in=queryset.order_by().values("id"))
+    rows = rows.values("tag").annotate(count=Count("item_id")).order_by("-count", "tag")
+    if limit is not None:
+        rows = rows[:limit]
+    return [(row["tag"], row["count"]) for row in rows]
@@ -0,0 +1,279 @@
+import atexit
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections, transaction
+from django.db.models import Q
+
+from catalog.models import Item, UserInteraction
+from catalog.signals import interactions_bulk_written
+
+TOGGLE_TYPES = (UserInteraction.InteractionType.LIKE, UserInteraction.InteractionType.BOOKMARK)
+
+
+# ────────────────────────────────────────────────────────
+# État en attente, dans le cache partagé (lecture de ses propres écritures)
+# ────────────────────────────────────────────────────────
+# Une clé par (utilisateur, item, type) : un compteur dont la parité donne la
+# présence de l'interaction. Une bascule est un `incr` atomique, deux bascules
+# simultanées ne se perdent pas ; la valeur du compteur sert de version. Il
+# démarre à une valeur dérivée de l'horloge (versions croissantes d'un cycle à
+# l'autre) et de même parité que l'état en base.
+#
+# Chaque utilisateur a aussi une liste de ses clés en attente (un compteur de
+# positions et une clé par position), pour écrire toutes ses bascules avant de
+# lire ses interactions en base.
+#
+# Avec plusieurs processus, INTERACTION_BUFFER_CACHE_ALIAS doit désigner un
+# cache partagé (Redis, Memcached) : un cache en mémoire locale ne garantit la
+# lecture de ses propres écritures que dans le processus qui a fait la bascule.
+def _cache():
+    return caches[settings.INTERACTION_BUFFER_CACHE_ALIAS]
+
+
+def _entry_key(item_id, interaction_type):
+    return f"{item_id}:{interaction_type}"
+
+
+def _counter_key(user_id, entry):
+    return f"toggle:{user_id}:{entry}"
+
+
+def _slots_key(user_id):
+    return f"toggles:{user_id}:slots"
+
+
+def _slot_key(user_id, slot):
+    return f"toggles:{user_id}:slot:{slot}"
+
+
+def _is_present(version):
+    return version % 2 == 1
+
+
+def _incr(key, initial):
+    """
+    Incrément atomique d'un compteur créé à `initial` s'il n'existe pas ;
+    retourne (nouvelle valeur, créé par cet appel).
+    """
+    cache, timeout = _cache(), settings.INTERACTION_BUFFER_PENDING_TIMEOUT
+    created = cache.add(key, initial, timeout=timeout)
+    try:
+        value = cache.incr(key)
+    except ValueError:
+        # Expirée entre `add` et `incr`
+        created = cache.add(key, initial + 1, timeout=timeout)
+        value = cache.incr(key) if not created else initial + 1
+    cache.touch(key, timeout)
+    return value, created
+
+
+def _register(user_id, entry):
+    slot, _ = _incr(_slots_key(user_id), 0)
+    _cache().set(_slot_key(user_id, slot), entry, timeout=settings.INTERACTION_BUFFER_PENDING_TIMEOUT)
+
+
+def pending_states(user_id, entries=None):
+    """
+    Bascules pas encore écrites en base de l'utilisateur :
+    {"item_id:type": (présente, version)}. Sans `entries`, toutes celles de sa
+    liste ; sinon seulement celles-ci ("item_id:type").
+    """
+    cache = _cache()
+    if entries is None:
+        slots = cache.get(_slots_key(user_id)) or 0
+        entries = cache.get_many([_slot_key(user_id, slot) for slot in range(1, slots + 1)]).values()
+    entries = set(entries)
+    keys = {_counter_key(user_id, entry): entry for entry in entries}
+    versions = cache.get_many(list(keys))
+    return {keys[key]: (_is_present(version), version) for key, version in versions.items()}
+
+
+def interaction_state(user_id, item_id, interaction_type):
+    """
+    Présence de l'interaction telle que l'utilisateur l'a demandée en dernier
+    (bascule en attente, sinon base).
+    """
+    version = _cache().get(_counter_key(user_id, _entry_key(item_id, interaction_type)))
+    if version is not None:
+        return _is_present(version)
+    return UserInteraction.objects.filter(
+        user_id=user_id, item_id=item_id, interaction_type=interaction_type
+    ).exists()
+
+
+def toggle_state(user_id, item_id, interaction_type):
+    """
+    Inverse l'interaction dans le cache partagé : (présente, version).
+    Seule la première bascule d'un cycle lit la base.
+    """
+    entry = _entry_key(item_id, interaction_type)
+    key = _counter_key(user_id, entry)
+    if _cache().get(key) is None:
+        present = interaction_state(user_id, item_id, interaction_type)
+        initial = time.time_ns() // 2 * 2 + (1 if present else 0)
+    else:
+        initial = 0
+    version, created = _incr(key, initial)
+    if created:
+        _register(user_id, entry)
+    return _is_present(version), version
+
+
+# ────────────────────────────────────────────────────────
+# Écriture groupée
+# ────────────────────────────────────────────────────────
+def write_states(states):
+    """
+    Applique en base des états {(user_id, item_id, type): présente}, ids en
+    chaînes : une requête d'existence, un `bulk_create(ignore_conflicts=True)`
+    et un DELETE groupé.
+    """
+    if not states:
+        return
+    keys = Q()
+    for user_id, item_id, interaction_type in states:
+        keys |= Q(user_id=user_id, item_id=item_id, interaction_type=interaction_type)
+
+    with transaction.atomic():
+        existing = {
+            (str(user_id), str(item_id), interaction_type)
+            for user_id, item_id, interaction_type in UserInteraction.objects.filter(keys).values_list(
+                "user_id", "item_id", "interaction_type"
+            )
+        }
+        to_create = [key for key, present in states.items() if present and key not in existing]
+        # Items supprimés depuis la bascule
+        item_ids = {item_id for _, item_id, _ in to_create}
+        live_items = {str(pk) for pk in Item.objects.filter(pk__in=item_ids).values_list("pk", flat=True)}
+        created = [
+            UserInteraction(user_id=user_id, item_id=item_id, interaction_type=interaction_type)
+            for user_id, item_id, interaction_type in to_create
+            if item_id in live_items
+        ]
+        UserInteraction.objects.bulk_create(created, ignore_conflicts=True)
+        # Lignes écrites entre-temps par une autre requête : ignorées par l'insertion,
+        # elles ne sont pas comptées une seconde fois (ids générés côté client)
+        inserted = set(
+            UserInteraction.objects.filter(pk__in=[interaction.pk for interaction in created]).values_list(
+                "pk", flat=True
+            )
+        )
+        interactions_bulk_written([(None, interaction) for interaction in created if interaction.pk in inserted])
+
+        removed = Q()
+        for key, present in states.items():
+            if not present and key in existing:
+                user_id, item_id, interaction_type = key
+                removed |= Q(user_id=user_id, item_id=item_id, interaction_type=interaction_type)
+        if removed:
+            # Les signaux post_delete mettent à jour popularité, recommandations et facettes
+            UserInteraction.objects.filter(removed).delete()
+
+
+class ToggleBuffer:
+    """
+    Tampon d'écriture différée des likes / favoris d'un processus : les bascules
+    sont fusionnées par (utilisateur, item, type) et écrites par lots, quand le
+    tampon atteint INTERACTION_BUFFER_SIZE entrées ou que la plus ancienne a
+    INTERACTION_BUFFER_MAX_DELAY secondes.
+
+    L'état de chaque bascule vit dans le cache partagé (voir plus haut) :
+    l'utilisateur relit ses propres bascules depuis n'importe quel processus, et
+    un processus n'écrit pas en base une bascule remplacée par une plus récente
+    faite ailleurs.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._timer = None
+
+    def toggle(self, user_id, item_id, interaction_type):
+        """
+        Inverse l'interaction et retourne son nouvel état (présente ou non).
+        """
+        user_id, item_id = str(user_id), str(item_id)
+        present, version = toggle_state(user_id, item_id, interaction_type)
+
+        delay = settings.INTERACTION_BUFFER_MAX_DELAY
+        with self._lock:
+            self._entries[(user_id, item_id, interaction_type)] = (present, version)
+            full = delay <= 0 or len(self._entries) >= settings.INTERACTION_BUFFER_SIZE
+            if not full and self._timer is None:
+                self._timer = threading.Timer(delay, self._flush_from_timer)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+        return present
+
+    def flush(self):
+        """
+        Écrit les bascules du tampon qui n'ont pas été remplacées par une plus
+        récente, puis les retire de l'état en attente.
+        """
+        with self._lock:
+            entries, self._entries = self._entries, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if entries:
+            _write_entries(entries)
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        finally:
+            # Connexions ouvertes par ce thread
+            connections.close_all()
+
+
+def _write_entries(entries):
+    """
+    Écrit en base les entrées {(user_id, item_id, type): (présente, version)}
+    encore à jour dans le cache (version égale, ou bascule expirée), puis retire
+    du cache celles qui n'ont pas changé pendant l'écriture. Une bascule faite
+    entre la relecture et le retrait reste dans le tampon de son processus, qui
+    l'écrit à son tour.
+    """
+    cache = _cache()
+    keys = {
+        _counter_key(user_id, _entry_key(item_id, interaction_type)): key
+        for key in entries
+        for user_id, item_id, interaction_type in [key]
+    }
+    current = cache.get_many(list(keys))
+    written = {}
+    for counter_key, key in keys.items():
+        present, version = entries[key]
+        if current.get(counter_key, version) == version:
+            written[counter_key] = (key, present, version)
+    write_states({key: present for key, present, _ in written.values()})
+
+    settled = cache.get_many(list(written))
+    cache.delete_many([
+        counter_key for counter_key, (_, _, version) in written.items() if settled.get(counter_key) == version
+    ])
+
+
+def flush_user(user_id):
+    """
+    Écrit en base toutes les bascules en attente de l'utilisateur, quel que soit
+    le processus qui les détient (avant de lire ses interactions en base).
+    """
+    user_id = str(user_id)
+    pending = pending_states(user_id)
+    if not pending:
+        return
+    entries = {}
+    for entry, state in pending.items():
+        item_id, interaction_type = entry.rsplit(":", 1)
+        entries[(user_id, item_id, interaction_type)] = state
+    _write_entries(entries)
+
+
+buffer = ToggleBuffer()
+atexit.register(buffer.flush)
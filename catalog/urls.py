@@ -1,5 +1,7 @@
 from rest_framework import routers
-from catalog.views import CategoryViewSet, ItemViewSet, UserInteractionViewSet, ItemSearchView, PersonViewSet
+from catalog.views import (
+    CategoryViewSet, ItemViewSet, UserInteractionViewSet, ItemSearchView, PersonViewSet, ItemFacetsView,
+)
 from django.urls import path, include
 
 router = routers.DefaultRouter()
@@ -11,4 +13,5 @@ router.register(r'person', PersonViewSet)
 urlpatterns = [
     path('', include(router.urls)),
     path('search/', ItemSearchView.as_view(), name='catalog-search'),
+    path('search/facets/', ItemFacetsView.as_view(), name='catalog-search-facets'),
 ]
@@ -1,19 +1,32 @@
-import numpy as np
+import uuid
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets, permissions, status, generics, filters
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework import generics, filters as drf_filters
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 
+from catalog import interactions as bulk_interactions
+from catalog import toggles
 from catalog.filters import ItemFilter
-from catalog.models import Category, Item, UserInteraction, Person
-from catalog.pagination import CustomPageNumberPagination
+from catalog.models import Category, Item, UserInteraction, Person, PrecomputedRecommendation
+from catalog.pagination import CustomPageNumberPagination, KeysetPagination
 from catalog.permissions import IsAdminOrReadOnly, IsOwnerOrAdmin
+from catalog.recommendations import cache as recommendation_cache
+from catalog.recommendations import strategies
+from catalog.recommendations.engines import ENGINES, get_engine
+from catalog.search import facets as search_facets
+from catalog.search.filters import FullTextSearchFilter
 from catalog.serializers.read import (
-    CategorySerializer, ItemSerializer, UserInteractionSerializer, PersonSerializer
+    CategorySerializer, ItemSerializer, UserInteractionSerializer, PersonSerializer,
+    ItemFastSerializer, serialize_items,
 )
 from catalog.serializers.write import (
     CategoryCreateSerializer, CategoryUpdateSerializer,
@@ -21,6 +34,72 @@ from catalog.serializers.write import (
     UserInteractionCreateSerializer, UserInteractionUpdateSerializer, PersonCreateSerializer, PersonUpdateSerializer,
 )
 
+# Identifiants dans les routes : un id qui n'est pas un UUID donne 404 (et non
+# une erreur du filtre sur la clé)
+UUID_PATTERN = "[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}"
+
+
+
+def _positive_int_param(request, name, minimum=1):
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    try:
+        value = int(value)
+    except ValueError:
+        value = minimum - 1
+    if value < minimum:
+        raise ValueError(f"'{name}' must be an integer >= {minimum}.")
+    return value
+
+
+def _items_in_order(queryset, item_ids):
+    """
+    Items (instances ou lignes `listing_values()`) correspondant à `item_ids`,
+    dans le même ordre (les ids disparus sont ignorés).
+    """
+    items = {
+        str(item["id"] if isinstance(item, dict) else item.pk): item
+        for item in queryset.filter(id__in=item_ids)
+    }
+    return [items[str(pk)] for pk in item_ids if str(pk) in items]
+
+
+def _ndjson_items(queryset, serialize, chunk_size=500):
+    """
+    Sérialise un queryset d'items en NDJSON, lot par lot (`.iterator()`),
+    pour que la mémoire reste constante quelle que soit la taille du feed.
+    """
+    renderer = JSONRenderer()
+    batch = []
+    for item in queryset.iterator(chunk_size=chunk_size):
+        batch.append(item)
+        if len(batch) == chunk_size:
+            yield b"".join(renderer.render(row) + b"\n" for row in serialize(batch))
+            batch = []
+    if batch:
+        yield b"".join(renderer.render(row) + b"\n" for row in serialize(batch))
+
+
+class ItemListingMixin:
+    """
+    Sérialisation des listes d'items en lecture seule. Avec
+    `fast_item_serialization`, les listes sont construites par `serialize_items`
+    depuis des lignes `listing_values()` (même JSON qu'`ItemSerializer`,
+    sans instancier de modèles ni de champs DRF).
+    """
+    fast_item_serialization = False
+
+    def listing_queryset(self):
+        if self.fast_item_serialization:
+            return Item.objects.listing_values()
+        return Item.objects.for_listing()
+
+    def listing_data(self, items):
+        if self.fast_item_serialization:
+            return serialize_items(items)
+        return ItemSerializer(items, many=True).data
+
 
 # Gestion des catégories
 class CategoryViewSet(viewsets.ModelViewSet):
@@ -46,10 +125,26 @@ class PersonViewSet(viewsets.ModelViewSet):
             return PersonUpdateSerializer
         return PersonSerializer
 
+    def perform_create(self, serializer):
+        self._save_person(serializer)
+
+    def perform_update(self, serializer):
+        self._save_person(serializer)
+
+    def _save_person(self, serializer):
+        # `validate_name` ne voit pas la personne créée au même moment par une
+        # autre requête : l'index unique sur `name_key` tranche
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            raise ValidationError({"name": ["A person with this name already exists."]})
+
 # Gestion des items
-class ItemViewSet(viewsets.ModelViewSet):
-    queryset = Item.objects.all()
+class ItemViewSet(ItemListingMixin, viewsets.ModelViewSet):
+    queryset = Item.objects.for_listing()
     permission_classes = [IsAdminOrReadOnly]  # seuls admins modifient
+    fast_item_serialization = True  # feed et recommandations
 
     def get_serializer_class(self):
         if self.action == "create":
@@ -59,19 +154,33 @@ class ItemViewSet(viewsets.ModelViewSet):
         return ItemSerializer
 
     # feed
-    @action(detail=False, methods=["get"], url_path="feed")
-    def feed(self,request):
+    @action(detail=False, methods=["get"], url_path="feed", pagination_class=KeysetPagination)
+    def feed(self, request):
         """
         Retourne un "feed" des items, triés par popularité (ou autre critère).
         Plus tard, on pourra ajouter des recommandations personnalisées.
+
+        Paginé par curseur (`?cursor=...&limit=...`, lien `next` dans la réponse).
+        Avec `?stream=ndjson`, renvoie tout le feed (à partir du curseur éventuel)
+        en NDJSON, un item par ligne, sans jamais charger plus d'un lot en mémoire.
         """
-        items = (
-            Item.objects.all()
-            .select_related("category", "created_by")
-            .order_by("-popularity_score", "-created_at") #[:50] pour le top 50
-        )
-        serializer = ItemSerializer(items, many=True)
-        return Response(serializer.data)
+        items = self.listing_queryset()
+
+        if request.query_params.get("stream") == "ndjson":
+            items = self.paginator.filter_queryset(items, request)
+            return StreamingHttpResponse(
+                _ndjson_items(items, self.listing_data), content_type="application/x-ndjson"
+            )
+
+        page = self.paginate_queryset(items)
+        return self.get_paginated_response(self.listing_data(page))
+
+    def _toggle(self, interaction_type):
+        # Existence de l'item vérifiée, l'écriture est différée (catalog.toggles)
+        item_id = self.get_queryset().filter(pk=self.kwargs["pk"]).values_list("pk", flat=True).first()
+        if item_id is None:
+            raise NotFound()
+        return toggles.buffer.toggle(self.request.user.pk, item_id, interaction_type)
 
     @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated], url_path="like")
     def like(self, request, pk=None):
@@ -79,84 +188,90 @@ class ItemViewSet(viewsets.ModelViewSet):
         Toggle like pour l'utilisateur connecté sur l'item pk.
         Retourne l'état de l'interaction.
         """
-        item = self.get_object()
-        user = request.user
-        interaction, created = UserInteraction.objects.get_or_create(user=user, item=item)
-        interaction.liked = not interaction.liked
-        interaction.save()
-        return Response({"liked": interaction.liked}, status=status.HTTP_200_OK)
+        liked = self._toggle(UserInteraction.InteractionType.LIKE)
+        return Response({"liked": liked}, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated], url_path="bookmark")
     def bookmark(self, request, pk=None):
         """
         Toggle bookmark pour l'utilisateur connecté sur l'item pk.
         """
-        item = self.get_object()
-        user = request.user
-        interaction, created = UserInteraction.objects.get_or_create(user=user, item=item)
-        interaction.bookmarked = not interaction.bookmarked
-        interaction.save()
-        return Response({"bookmarked": interaction.bookmarked}, status=status.HTTP_200_OK)
+        bookmarked = self._toggle(UserInteraction.InteractionType.BOOKMARK)
+        return Response({"bookmarked": bookmarked}, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=["get"], url_path="recommendations", permission_classes=[IsAuthenticated])
     def recommendations(self, request):
         """
         Recommande des items similaires à ceux aimés ou enregistrés par l'utilisateur,
         en utilisant la similarité vectorielle (TF-IDF + similarité cosinus).
+
+        Paramètres optionnels :
+        - `strategy` : "content" (TF-IDF, défaut), "cf" (filtrage collaboratif item-item
+          sur les interactions) ou "hybrid" (mélange des deux)
+        - `engine` : "ivf" (approché) ou "exact" (parcours complet, pour validation)
+        - `nprobe` : nombre de listes parcourues par le moteur approché (rappel / latence)
+        - `rerank` : facteur de re-classement exact des candidats approchés (0 = désactivé)
         """
         user = request.user
+        # Likes / favoris encore en attente pris en compte
+        toggles.flush_user(user.pk)
+
+        strategy = request.query_params.get("strategy", strategies.CONTENT)
+        if strategy not in strategies.STRATEGIES:
+            return Response(
+                {"detail": f"Unknown strategy. Choose among: {', '.join(strategies.STRATEGIES)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            engine = get_engine(request.query_params.get("engine"))
+            nprobe = _positive_int_param(request, "nprobe")
+            rerank = _positive_int_param(request, "rerank", minimum=0)
+        except KeyError:
+            return Response(
+                {"detail": f"Unknown engine. Choose among: {', '.join(ENGINES)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Résultat en cache : pas de calcul vectoriel, seulement l'hydratation des ids
+        variant = f"{strategy}:{engine.name}:{nprobe}:{rerank}"
+        cached_ids = recommendation_cache.get_recommendations(user.pk, variant)
+        if cached_ids is not None:
+            return Response(self.listing_data(_items_in_order(self.listing_queryset(), cached_ids)))
+
+        # Recommandations précalculées (calcul exact hors ligne), si fraîches
+        # et si la requête ne demande pas un réglage particulier du moteur
+        if strategy == strategies.CONTENT and not {"engine", "nprobe", "rerank"} & set(request.query_params):
+            precomputed_ids = PrecomputedRecommendation.objects.filter(
+                user=user, computed_at__gte=timezone.now() - settings.RECOMMENDER_PRECOMPUTE_MAX_AGE
+            ).values_list("item_ids", flat=True).first()
+            if precomputed_ids:
+                recommendation_cache.set_recommendations(user.pk, variant, precomputed_ids)
+                return Response(self.listing_data(_items_in_order(self.listing_queryset(), precomputed_ids)))
+
+        # Interactions de l'utilisateur (likes, favoris, notes)
+        interactions = list(
+            UserInteraction.objects.filter(user=user).values_list("item_id", "interaction_type", "rating")
+        )
 
-        # Récupère les items que l'utilisateur a likés ou ajoutés en favoris
-        user_items = Item.objects.filter(
-            userinteraction__user=user,
-            userinteraction__interaction_type__in=["like", "bookmark"]
-        ).distinct()
+        # Index précalculés (chargés une fois par processus)
+        recommended_ids = strategies.recommend(strategy, interactions, 20, engine, nprobe=nprobe, rerank=rerank)
 
         # Si l'utilisateur n'a encore rien aimé, renvoyer les plus populaires
-        if not user_items.exists():
-            fallback = Item.objects.all().order_by("-popularity_score", "-rating")[:10]
-            serializer = ItemSerializer(fallback, many=True)
-            return Response(serializer.data)
-
-        # Crée un corpus textuel pour tous les items (titre, description, tags, catégorie)
-        items = Item.objects.all().select_related("category")
-        corpus = []
-        for item in items:
-            tags_text = " ".join(item.tags or [])
-            category_name = item.category.name if item.category else ""
-            text = f"{item.title} {item.description} {tags_text} {category_name}"
-            corpus.append(text)
-
-        # Convertit le texte en vecteurs numériques avec TF-IDF
-        vectorizer = TfidfVectorizer(stop_words="english", max_features=5000)
-        tfidf_matrix = vectorizer.fit_transform(corpus)
-
-        # Crée un vecteur moyen représentant les préférences de l'utilisateur
-        user_indices = [list(items).index(i) for i in user_items if i in items]
-        if not user_indices:
-            fallback = Item.objects.all().order_by("-popularity_score", "-rating")[:10]
-            serializer = ItemSerializer(fallback, many=True)
-            return Response(serializer.data)
-
-        user_vector = np.mean(tfidf_matrix[user_indices].toarray(), axis=0).reshape(1, -1)
-
-        # Calcule la similarité cosinus entre le vecteur utilisateur et tous les items
-        similarities = cosine_similarity(user_vector, tfidf_matrix)[0]
-
-        # Trie les items selon leur score de similarité
-        scored_items = list(zip(items, similarities))
-        scored_items.sort(key=lambda x: x[1], reverse=True)
-
-        # Exclut les items déjà likés ou favoris et garde les plus proches
-        recommended = [i for i, score in scored_items if i not in user_items][:20]
-
-        # Sérialise et renvoie les résultats
-        serializer = ItemSerializer(recommended, many=True)
-        return Response(serializer.data)
+        if not recommended_ids:
+            fallback = self.listing_queryset().order_by("-popularity_score", "-rating")[:10]
+            return Response(self.listing_data(fallback))
+
+        recommendation_cache.set_recommendations(user.pk, variant, recommended_ids)
+
+        # Sérialise et renvoie les résultats (dans l'ordre du classement)
+        return Response(self.listing_data(_items_in_order(self.listing_queryset(), recommended_ids)))
 
 # Gestion des interactions utilisateur
 class UserInteractionViewSet(viewsets.ModelViewSet):
-    queryset = UserInteraction.objects.all()
+    queryset = UserInteraction.objects.for_listing()
 
     def get_serializer_class(self):
         if self.action == "create":
@@ -167,7 +282,7 @@ class UserInteractionViewSet(viewsets.ModelViewSet):
 
     def get_permissions(self):
         # création = utilisateur connecté requis
-        if self.action == "create":
+        if self.action in ["create", "bulk", "state"]:
             return [permissions.IsAuthenticated()]
         # update/destroy = propriétaire ou admin
         if self.action in ["update", "partial_update", "destroy"]:
@@ -175,45 +290,124 @@ class UserInteractionViewSet(viewsets.ModelViewSet):
         # lecture libre
         return [permissions.AllowAny()]
 
+    # Envoi groupé (file d'interactions hors ligne du client mobile)
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk(self, request):
+        """
+        Enregistre jusqu'à INTERACTION_BULK_MAX_SIZE interactions de l'utilisateur
+        connecté : `[{"item": id, "interaction_type": "like", "rating": null}, ...]`.
+        Une interaction déjà présente voit sa note mise à jour.
+
+        Retourne un résultat par ligne (`created`, `updated`, `unchanged`,
+        `duplicate` ou `invalid` avec ses erreurs) et les totaux par statut.
+        """
+        rows = request.data
+        if not isinstance(rows, list):
+            return Response({"detail": "Expected a list of interactions."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > settings.INTERACTION_BULK_MAX_SIZE:
+            return Response(
+                {"detail": f"At most {settings.INTERACTION_BULK_MAX_SIZE} interactions per request."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        results = bulk_interactions.ingest_interactions(request.user.pk, rows)
+        counts = {}
+        for result in results:
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+        return Response({"counts": counts, "results": results}, status=status.HTTP_200_OK)
+
+    # État de l'utilisateur connecté sur une page d'items (like, favori, note)
+    @action(detail=False, methods=["get"], url_path="state")
+    def state(self, request):
+        """
+        `?items=id1,id2,...` (au plus INTERACTION_STATE_MAX_ITEMS) : retourne
+        `{item_id: {"liked": bool, "bookmarked": bool, "rating": int | null}}`
+        pour chaque item demandé, en une requête au plus.
+        """
+        raw_ids = [value.strip() for value in request.query_params.get("items", "").split(",") if value.strip()]
+        if len(raw_ids) > settings.INTERACTION_STATE_MAX_ITEMS:
+            return Response(
+                {"detail": f"At most {settings.INTERACTION_STATE_MAX_ITEMS} items per request."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            item_ids = list(dict.fromkeys(uuid.UUID(value) for value in raw_ids))
+        except ValueError:
+            return Response({"detail": "items must be a comma-separated list of UUIDs."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(bulk_interactions.user_states(request.user.pk, item_ids))
+
     # Items likés par un utilisateur
-    @action(detail=False, methods=["get"], url_path="liked-items/(?P<user_id>[^/.]+)")
+    @action(detail=False, methods=["get"], url_path=f"liked-items/(?P<user_id>{UUID_PATTERN})")
     def liked_items(self, request, user_id=None):
-        interactions = UserInteraction.objects.filter(
+        toggles.flush_user(user_id)
+        interactions = UserInteraction.objects.for_listing().filter(
             user_id=user_id, interaction_type="like"
-        ).select_related("item")
+        ).order_by("-created_at")
         serializer = UserInteractionSerializer(interactions, many=True)
         return Response(serializer.data)
 
     # Items bookmarkés par un utilisateur
-    @action(detail=False, methods=["get"], url_path="bookmarked-items/(?P<user_id>[^/.]+)")
+    @action(detail=False, methods=["get"], url_path=f"bookmarked-items/(?P<user_id>{UUID_PATTERN})")
     def bookmarked_items(self, request, user_id=None):
-        interactions = UserInteraction.objects.filter(
+        toggles.flush_user(user_id)
+        interactions = UserInteraction.objects.for_listing().filter(
             user_id=user_id, interaction_type="bookmark"
-        ).select_related("item")
+        ).order_by("-created_at")
         serializer = UserInteractionSerializer(interactions, many=True)
         return Response(serializer.data)
 
     # Interactions d'un utilisateur pour un item donné
-    @action(detail=False, methods=["get"], url_path="user/(?P<user_id>[^/.]+)/item/(?P<item_id>[^/.]+)")
+    @action(
+        detail=False, methods=["get"], url_path=f"user/(?P<user_id>{UUID_PATTERN})/item/(?P<item_id>{UUID_PATTERN})"
+    )
     def interactions_for_item(self, request, user_id=None, item_id=None):
         """
         Renvoie toutes les interactions d'un utilisateur pour un item donné.
         """
-        interactions = UserInteraction.objects.filter(user_id=user_id, item_id=item_id)
+        toggles.flush_user(user_id)
+        interactions = UserInteraction.objects.for_listing().filter(user_id=user_id, item_id=item_id)
         serializer = UserInteractionSerializer(interactions, many=True)
         return Response(serializer.data)
 
 
 # API endpoint for catalog search with filters, pagination, sorting
-class ItemSearchView(generics.ListAPIView):
-    queryset = Item.objects.all()
+class ItemSearchView(ItemListingMixin, generics.ListAPIView):
     permission_classes = [permissions.AllowAny]
-
-    serializer_class = ItemSerializer
-    filter_backends = [DjangoFilterBackend, drf_filters.SearchFilter, drf_filters.OrderingFilter]
+    fast_item_serialization = True
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, drf_filters.OrderingFilter]
 
     filterset_class = ItemFilter  # <-- use custom filter
 
-    search_fields = ['title', 'description']  # search by text
+    # ?search= : plein texte (titre, description, tags, catégorie, créateurs), trié par pertinence
     ordering_fields = ['created_at', 'updated_at', 'rating', 'popularity_score', 'number_of_ratings']
-    pagination_class = CustomPageNumberPagination
\ No newline at end of file
+    pagination_class = CustomPageNumberPagination
+
+    def get_queryset(self):
+        return self.listing_queryset()
+
+    def get_serializer_class(self):
+        # Le schéma OpenAPI est décrit par ItemSerializer (même sortie)
+        if self.fast_item_serialization and not getattr(self, "swagger_fake_view", False):
+            return ItemFastSerializer
+        return ItemSerializer
+
+
+class ItemFacetsView(generics.GenericAPIView):
+    """
+    Comptes par facette (catégories, auteurs, producteurs, contributeurs, tags,
+    tranches de notes) des items correspondant aux mêmes filtres que `/search/`.
+    Mis en cache par signature des filtres, invalidé à chaque écriture d'item.
+    """
+    queryset = Item.objects.all()
+    permission_classes = [permissions.AllowAny]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter]
+    filterset_class = ItemFilter
+
+    def get(self, request):
+        signature = search_facets.filter_signature(request.query_params)
+        facets = search_facets.get_facets(signature)
+        if facets is None:
+            facets = search_facets.compute_facets(self.filter_queryset(self.get_queryset()))
+            search_facets.set_facets(signature, facets)
+        return Response(facets)
@@ -1,5 +1,6 @@
 
 
+from datetime import timedelta
 from pathlib import Path
 import environ
 
@@ -99,6 +100,12 @@ MARVEL_PUBLIC_KEY = env("MARVEL_PUBLIC_KEY", default=None)
 MARVEL_PRIVATE_KEY = env("MARVEL_PRIVATE_KEY", default=None)
 MARVEL_BASE_URL = env("MARVEL_BASE_URL", default="https://gateway.marvel.com/v1/public")
 
+# Imports : cache disque des réponses HTTP (revalidées par ETag / Last-Modified après le TTL)
+# et fichier de reprise des imports interrompus
+IMPORTER_CACHE_DIR = env("IMPORTER_CACHE_DIR", default=str(BASE_DIR / "var" / "importers"))
+IMPORTER_CACHE_TTL = env.int("IMPORTER_CACHE_TTL", default=7 * 24 * 3600)  # secondes
+IMPORTER_USER_AGENT = env("IMPORTER_USER_AGENT", default=COMICVINE_USER_AGENT)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -157,6 +164,20 @@ REST_FRAMEWORK = {
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Cache
+# Le cache des recommandations est local au processus par défaut ; avec plusieurs
+# workers, utiliser un backend partagé (fichier, Redis...) pour que l'invalidation
+# d'un utilisateur soit vue par tous.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "recommendations": {
+        "BACKEND": env("RECOMMENDER_CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": env("RECOMMENDER_CACHE_LOCATION", default="recommendations"),
+    },
+}
+
 # ImageField saving locally
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -167,4 +188,67 @@ CORS_ALLOWED_ORIGINS = [
     'https://www.wip.com'
 ]
 
-AUTH_USER_MODEL = "accounts.Account"
\ No newline at end of file
+AUTH_USER_MODEL = "accounts.Account"
+
+# Recommandations
+# Index TF-IDF des items, construit par `python manage.py build_recommendation_index`
+RECOMMENDER_INDEX_DIR = env("RECOMMENDER_INDEX_DIR", default=str(BASE_DIR / "var" / "recommender"))
+# Application des modifications du catalogue à l'index (journal ItemIndexChange)
+RECOMMENDER_SYNC_INTERVAL = env.float("RECOMMENDER_SYNC_INTERVAL", default=5.0)  # secondes
+RECOMMENDER_SYNC_BATCH_SIZE = env.int("RECOMMENDER_SYNC_BATCH_SIZE", default=500)
+# Fenêtre de relecture du journal : doit dépasser la durée de la plus longue transaction
+# qui modifie des items (ses changements peuvent être validés après des ids plus récents)
+RECOMMENDER_SYNC_LOOKBACK = env.float("RECOMMENDER_SYNC_LOOKBACK", default=60.0)  # secondes
+# Refit complet (par `build_recommendation_index --sync`) quand la part de tokens
+# hors vocabulaire augmente de plus de ce seuil
+RECOMMENDER_DRIFT_THRESHOLD = env.float("RECOMMENDER_DRIFT_THRESHOLD", default=0.15)
+RECOMMENDER_DRIFT_MIN_TOKENS = env.int("RECOMMENDER_DRIFT_MIN_TOKENS", default=2000)
+# Moteur de similarité : "ivf" (approché, listes inversées sur embeddings SVD) ou "exact"
+RECOMMENDER_ENGINE = env("RECOMMENDER_ENGINE", default="ivf")
+RECOMMENDER_ANN_MIN_ITEMS = env.int("RECOMMENDER_ANN_MIN_ITEMS", default=1000)
+RECOMMENDER_ANN_DIM = env.int("RECOMMENDER_ANN_DIM", default=128)
+RECOMMENDER_ANN_NPROBE = env.int("RECOMMENDER_ANN_NPROBE", default=8)
+RECOMMENDER_ANN_RERANK = env.int("RECOMMENDER_ANN_RERANK", default=4)
+# Cache des recommandations par utilisateur (ids classés), invalidé à chaque interaction
+RECOMMENDER_CACHE_ALIAS = "recommendations"
+RECOMMENDER_CACHE_TIMEOUT = env.int("RECOMMENDER_CACHE_TIMEOUT", default=3600)  # secondes
+# Recommandations précalculées (`precompute_recommendations`) servies tant qu'elles ont moins de
+RECOMMENDER_PRECOMPUTE_MAX_AGE = timedelta(hours=env.int("RECOMMENDER_PRECOMPUTE_MAX_AGE_HOURS", default=24))
+# Filtrage collaboratif item-item (`build_recommendation_index --collaborative`) et stratégie hybride
+RECOMMENDER_CF_NEIGHBOURS = env.int("RECOMMENDER_CF_NEIGHBOURS", default=50)
+# Voisins reconstruits par `build_recommendation_index` (même sans --collaborative) passé cet âge
+RECOMMENDER_CF_MAX_AGE = timedelta(hours=env.int("RECOMMENDER_CF_MAX_AGE_HOURS", default=24))
+RECOMMENDER_HYBRID_ALPHA = env.float("RECOMMENDER_HYBRID_ALPHA", default=0.5)  # poids du contenu
+RECOMMENDER_HYBRID_POOL = env.int("RECOMMENDER_HYBRID_POOL", default=3)  # candidats par stratégie = k x pool
+
+# Recherche plein texte (catalog.search) : backend déduit de la base si vide
+# ("postgresql" : tsvector + GIN, "sqlite" : FTS5, "inverted" : index en mémoire),
+# configuration PostgreSQL du texte
+SEARCH_BACKEND = env("SEARCH_BACKEND", default="")
+SEARCH_CONFIG = env("SEARCH_CONFIG", default="english")
+# Index inversé : instantané dans RECOMMENDER_INDEX_DIR/search, résultats par requête
+SEARCH_INVERTED_MAX_RESULTS = env.int("SEARCH_INVERTED_MAX_RESULTS", default=1000)
+# Retard (changements du journal) au-delà duquel `build_recommendation_index` écrit un nouvel instantané
+SEARCH_INVERTED_MAX_LAG = env.int("SEARCH_INVERTED_MAX_LAG", default=5000)
+# Facettes de `/search/facets/` : valeurs par facette et cache par signature de filtres
+SEARCH_FACETS_LIMIT = env.int("SEARCH_FACETS_LIMIT", default=20)
+SEARCH_FACETS_CACHE_ALIAS = env("SEARCH_FACETS_CACHE_ALIAS", default=RECOMMENDER_CACHE_ALIAS)
+SEARCH_FACETS_CACHE_TIMEOUT = env.int("SEARCH_FACETS_CACHE_TIMEOUT", default=600)
+
+# Popularité : un like, un favori ou une note perd la moitié de son poids toutes les N jours
+POPULARITY_HALF_LIFE = timedelta(days=env.float("POPULARITY_HALF_LIFE_DAYS", default=7))
+
+# Likes / favoris : bascules écrites par lots (taille max, délai max en secondes ; 0 = écriture immédiate)
+INTERACTION_BUFFER_SIZE = env.int("INTERACTION_BUFFER_SIZE", default=500)
+INTERACTION_BUFFER_MAX_DELAY = env.float("INTERACTION_BUFFER_MAX_DELAY", default=1.0)
+# Cache des bascules en attente : avec plusieurs processus (workers gunicorn...), il doit
+# être partagé (Redis, Memcached) ; sinon, INTERACTION_BUFFER_MAX_DELAY=0
+INTERACTION_BUFFER_CACHE_ALIAS = env("INTERACTION_BUFFER_CACHE_ALIAS", default=RECOMMENDER_CACHE_ALIAS)
+# Durée de vie des bascules en attente dans le cache partagé (doit dépasser le délai max)
+INTERACTION_BUFFER_PENDING_TIMEOUT = env.int("INTERACTION_BUFFER_PENDING_TIMEOUT", default=300)
+# Interactions par requête sur `POST /api/catalog/interaction/bulk/`
+INTERACTION_BULK_MAX_SIZE = env.int("INTERACTION_BULK_MAX_SIZE", default=5000)
+# `GET /api/catalog/interaction/state/?items=...` : items par requête, ensemble des items
+# avec interaction de chaque utilisateur gardé en cache (évite la requête des pages sans interaction)
+INTERACTION_STATE_MAX_ITEMS = env.int("INTERACTION_STATE_MAX_ITEMS", default=100)
+INTERACTION_STATE_CACHE = env.bool("INTERACTION_STATE_CACHE", default=True)